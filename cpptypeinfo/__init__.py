@@ -43,7 +43,26 @@ VERSION = '0.3.0'
 from .basictype import *
 from .usertype import Enum, EnumValue
 from .typeparser import TypeParser
-from .decl_map import DeclMap
-from .get_tu import *
-from .cursor import parse_files, parse_source
+from .snapshot import (Snapshot, get_snapshot_key, save_snapshot,
+                       load_snapshot)
+from .symbol_db import (DeclRow, write_symbol_db, open_symbol_db, find_decls,
+                        find_enum_values, find_usages, get_layout)
+from .ndjson import NdjsonWriter, dump_ndjson
+from .failure import ParseFailure, format_failures
+try:
+    import clang.cindex
+    HAS_LIBCLANG = True
+except ImportError:
+    # snapshot を読んで generate するだけなら libclang は要らない
+    HAS_LIBCLANG = False
+if HAS_LIBCLANG:
+    from .decl_map import DeclMap
+    from .session import ParseSession
+    from .profile import ParseProfile, PARSE_PROFILES
+    from .get_tu import *
+    from .pch import PchPrefix
+    from .cursor import parse_files, parse_source, parse_sources, parse_many
+    from .watch import Watcher
+    from .shard import parse_sharded, merge_decl_maps
+    from .matrix import ParseConfig, parse_matrix, diff_decl_maps, format_diffs
 from . import languages
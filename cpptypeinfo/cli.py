@@ -1,6 +1,8 @@
 import argparse
 import os
 import pathlib
+import sys
+from typing import Callable, List, Optional, Set, Tuple
 import cpptypeinfo
 
 
@@ -14,21 +16,36 @@ def get_windowskits() -> pathlib.Path:
 
 def debug(args):
     parser = cpptypeinfo.TypeParser()
-    cpptypeinfo.parse_files(parser, pathlib.Path(args.header), debug=True)
+    cpptypeinfo.parse_files(parser,
+                            pathlib.Path(args.header),
+                            debug=True,
+                            profile=args.profile)
+
+
+def profile_args(parser: argparse.ArgumentParser):
+    # libclang が無ければ parse しないので、名前は確かめない
+    choices = list(cpptypeinfo.PARSE_PROFILES.keys()
+                   ) if cpptypeinfo.HAS_LIBCLANG else None
+    parser.add_argument('--profile',
+                        choices=choices,
+                        default='default',
+                        help='libclang parse options')
 
 
 def debug_args(subparsers: argparse._SubParsersAction):
     parser = subparsers.add_parser('debug', help='debug print')
     parser.set_defaults(func=debug)
+    profile_args(parser)
     parser.add_argument('header')
 
 
-def gen(args):
-    parser = cpptypeinfo.TypeParser()
-    includes = [pathlib.Path(x) for x in args.include]
-    headers = [pathlib.Path(x) for x in args.header]
+def get_headers(
+        args) -> Tuple[List[pathlib.Path], Optional['cpptypeinfo.PchPrefix']]:
+    headers = [pathlib.Path(x) for x in args.header or []]
+    pch = None
     if args.d3d11:
         dir = get_windowskits()
+        user_headers = len(headers)
         headers.append(dir / 'shared/ntdef.h')
         headers.append(dir / 'shared/basetsd.h')
         headers.append(dir / 'shared/wtypes.h')
@@ -43,14 +60,21 @@ def gen(args):
         headers.append(dir / 'um/dxgicommon.h')
         headers.append(dir / 'um/dxgiformat.h')
         headers.append(dir / 'shared/dxgitype.h')
+        if args.pch and cpptypeinfo.HAS_LIBCLANG:
+            pch = cpptypeinfo.PchPrefix('d3d11', headers[user_headers:])
+    return headers, pch
 
-    decl_map = cpptypeinfo.parse_files(parser, includes=includes, *headers)
 
+def generate(args,
+             parser: cpptypeinfo.TypeParser,
+             decl_map: 'cpptypeinfo.DeclMap',
+             headers: List[pathlib.Path],
+             files: Optional[Set[pathlib.Path]] = None):
     if args.lang == 'dlang':
         cpptypeinfo.languages.dlang.generate(parser, decl_map, headers,
                                              pathlib.Path(args.dst).absolute(),
-                                             ['windowskits', 'd3d11'])
-    elif args.clang == 'csharp':
+                                             ['windowskits', 'd3d11'], files)
+    elif args.lang == 'csharp':
         cpptypeinfo.languages.csharp.generate(
             parser, decl_map,
             pathlib.Path(args.dst).absolute())
@@ -58,17 +82,268 @@ def gen(args):
         raise NotImplementedError()
 
 
-def gen_args(subparsers: argparse._SubParsersAction):
-    parser = subparsers.add_parser('gen', help='generate code')
-    parser.set_defaults(func=gen)
+def get_snapshot_key(args, headers: List[pathlib.Path]) -> str:
+    '''
+    parse の結果を変える option
+    '''
+    return cpptypeinfo.get_snapshot_key({
+        'version': cpptypeinfo.VERSION,
+        'headers': headers,
+        'includes': args.include or [],
+        'pch': args.pch and args.d3d11,
+        'profile': args.profile,
+        'macros': args.macros,
+        'keep_going': args.keep_going,
+    })
+
+
+def load_or_parse(args,
+                  headers: List[pathlib.Path],
+                  pch: Optional['cpptypeinfo.PchPrefix'],
+                  on_decl: Optional[Callable] = None):
+    '''
+    --snapshot が有効なら読み込み、無ければ parse して保存する。
+    DeclMap か Snapshot を返す。
+    on_decl: --jobs 無しで parse するときの DeclMap.on_decl
+    '''
+    includes = [pathlib.Path(x) for x in args.include or []]
+    snapshot = pathlib.Path(args.snapshot) if args.snapshot else None
+    key = get_snapshot_key(args, headers)
+    if snapshot:
+        loaded = cpptypeinfo.load_snapshot(snapshot, files=headers, key=key)
+        if loaded:
+            print(f'load {snapshot}', file=sys.stderr)
+            return loaded
+    if not cpptypeinfo.HAS_LIBCLANG:
+        raise Exception('libclang is required to parse the headers '
+                        '(no valid --snapshot)')
+
+    cache_dir = pathlib.Path(args.cache) if args.cache else None
+    session = cpptypeinfo.ParseSession(cache_dir=cache_dir, strict=args.strict)
+    if args.jobs:
+        decl_map = cpptypeinfo.parse_sharded(*headers,
+                                             includes=includes,
+                                             pch=pch,
+                                             session=session,
+                                             profile=args.profile,
+                                             jobs=args.jobs,
+                                             macros=args.macros,
+                                             keep_going=args.keep_going)
+    else:
+        decl_map = cpptypeinfo.parse_files(cpptypeinfo.TypeParser(),
+                                           includes=includes,
+                                           pch=pch,
+                                           session=session,
+                                           profile=args.profile,
+                                           macros=args.macros,
+                                           on_decl=on_decl,
+                                           keep_going=args.keep_going,
+                                           *headers)
+    if decl_map.failures:
+        print(cpptypeinfo.format_failures(decl_map.failures),
+              file=sys.stderr)
+        print(f'{len(decl_map.failures)} declarations failed to parse',
+              file=sys.stderr)
+    if snapshot:
+        cpptypeinfo.save_snapshot(decl_map, snapshot, key)
+    return decl_map
+
+
+def gen(args):
+    headers, pch = get_headers(args)
+    decl_map = load_or_parse(args, headers, pch)
+    generate(args, decl_map.parser, decl_map, headers)
+
+
+def header_args(parser: argparse.ArgumentParser):
+    profile_args(parser)
     parser.add_argument('--d3d11', action='store_true')
     parser.add_argument('--windows', action='store_true')
     parser.add_argument('--header', action='append')
     parser.add_argument('--include', '-I', action='append')
+    parser.add_argument('--pch',
+                        action='store_true',
+                        help='precompile the --d3d11 headers')
+    parser.add_argument('--strict',
+                        action='store_true',
+                        help='stop on error diagnostics')
+
+
+def parse_args(parser: argparse.ArgumentParser):
+    header_args(parser)
+    parser.add_argument('--cache', help='translation unit cache folder')
+    parser.add_argument('--jobs',
+                        '-j',
+                        type=int,
+                        help='split headers and parse in processes')
+    parser.add_argument('--macros',
+                        action='store_true',
+                        help='collect #define constants from the headers')
+    parser.add_argument('--keep-going',
+                        '-k',
+                        action='store_true',
+                        help='record unsupported declarations and continue')
+    parser.add_argument('--snapshot',
+                        help='save the parsed types and reuse them '
+                        'while the headers are unchanged')
+
+
+def gen_args(subparsers: argparse._SubParsersAction):
+    parser = subparsers.add_parser('gen', help='generate code')
+    parser.set_defaults(func=gen)
+    parse_args(parser)
     parser.add_argument('lang', choices=['csharp', 'dlang'])
     parser.add_argument('dst', help='output folder')
 
 
+def index(args):
+    headers, pch = get_headers(args)
+    decl_map = load_or_parse(args, headers, pch)
+    dst = pathlib.Path(args.db)
+    cpptypeinfo.write_symbol_db(decl_map, dst)
+    print(f'create {dst}')
+
+
+def index_args(subparsers: argparse._SubParsersAction):
+    parser = subparsers.add_parser(
+        'index', help='write the declarations to a sqlite database')
+    parser.set_defaults(func=index)
+    parse_args(parser)
+    parser.add_argument('db', help='sqlite database')
+
+
+def dump(args):
+    headers, pch = get_headers(args)
+    out = open(args.output, 'w', encoding='utf-8',
+               newline='\n') if args.output else sys.stdout
+    try:
+        if args.format == 'ndjson':
+            writer = cpptypeinfo.NdjsonWriter(out)
+            decl_map = load_or_parse(args, headers, pch, writer.on_decl)
+            writer.write_rest(decl_map)
+        else:
+            raise NotImplementedError()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def dump_args(subparsers: argparse._SubParsersAction):
+    parser = subparsers.add_parser(
+        'dump', help='write the declarations while parsing')
+    parser.set_defaults(func=dump)
+    parse_args(parser)
+    parser.add_argument('--format', choices=['ndjson'], default='ndjson')
+    parser.add_argument('--output', '-o', help='output file(default stdout)')
+
+
+def format_decl(decl: cpptypeinfo.DeclRow) -> str:
+    location = f'{decl.file}:{decl.line}' if decl.file else '-'
+    if decl.kind in ('function', 'method'):
+        return f'{decl.kind} {decl.signature} ({location})'
+    return f'{decl.kind} {decl.name} ({location})'
+
+
+def query(args):
+    db = cpptypeinfo.open_symbol_db(pathlib.Path(args.db))
+    try:
+        if args.type == 'name':
+            for decl in cpptypeinfo.find_decls(db, args.name):
+                print(format_decl(decl))
+            for value in cpptypeinfo.find_enum_values(db, args.name):
+                print(f'enum {value.enum}::{value.name} = {value.value}')
+        elif args.type == 'usage':
+            for usage in cpptypeinfo.find_usages(db, args.name):
+                print(f'{usage.role} {usage.detail}: '
+                      f'{format_decl(usage.decl)}')
+        elif args.type == 'layout':
+            for decl in cpptypeinfo.find_decls(db, args.name):
+                print(format_decl(decl))
+                for f in cpptypeinfo.get_layout(db, decl.id):
+                    offset = f.offset if f.offset >= 0 else '?'
+                    print(f'  {offset}: {f.type} {f.name}')
+        else:
+            raise NotImplementedError()
+    finally:
+        db.close()
+
+
+def query_args(subparsers: argparse._SubParsersAction):
+    parser = subparsers.add_parser(
+        'query', help='look up declarations in the sqlite database')
+    parser.set_defaults(func=query)
+    parser.add_argument('db', help='sqlite database')
+    parser.add_argument('type', choices=['name', 'usage', 'layout'])
+    parser.add_argument('name', help='name or ns::name')
+
+
+def watch(args):
+    includes = [pathlib.Path(x) for x in args.include or []]
+    headers, pch = get_headers(args)
+    session = cpptypeinfo.ParseSession(strict=args.strict)
+    watcher = cpptypeinfo.Watcher(*headers,
+                                  includes=includes,
+                                  pch=pch,
+                                  session=session,
+                                  profile=args.profile)
+    decl_map = watcher.parse()
+    generate(args, decl_map.parser, decl_map, headers)
+
+    def on_update(parser: cpptypeinfo.TypeParser,
+                  decl_map: 'cpptypeinfo.DeclMap',
+                  changed: List[pathlib.Path]):
+        for x in changed:
+            print(f'changed: {x}')
+        generate(args, parser, decl_map, headers, set(changed))
+
+    print('watching...')
+    watcher.run(on_update, args.interval)
+
+
+def watch_args(subparsers: argparse._SubParsersAction):
+    parser = subparsers.add_parser('watch',
+                                   help='generate code when headers changed')
+    parser.set_defaults(func=watch)
+    header_args(parser)
+    parser.add_argument('--interval',
+                        type=float,
+                        default=0.5,
+                        help='polling interval(sec)')
+    parser.add_argument('lang', choices=['csharp', 'dlang'])
+    parser.add_argument('dst', help='output folder')
+
+
+def matrix(args):
+    includes = [pathlib.Path(x) for x in args.include or []]
+    headers, pch = get_headers(args)
+    configs = [cpptypeinfo.ParseConfig.parse(x) for x in args.config]
+    cache_dir = pathlib.Path(args.cache) if args.cache else None
+    session = cpptypeinfo.ParseSession(cache_dir=cache_dir, strict=args.strict)
+    decl_maps = cpptypeinfo.parse_matrix(*headers,
+                                         configs=configs,
+                                         includes=includes,
+                                         pch=pch,
+                                         session=session,
+                                         profile=args.profile,
+                                         max_workers=args.jobs)
+    for k, v in decl_maps.items():
+        print(f'{k}: {len(v.decl_map)} decls')
+    print(cpptypeinfo.format_diffs(cpptypeinfo.diff_decl_maps(decl_maps)))
+
+
+def matrix_args(subparsers: argparse._SubParsersAction):
+    parser = subparsers.add_parser(
+        'matrix', help='parse with some configurations and compare')
+    parser.set_defaults(func=matrix)
+    header_args(parser)
+    parser.add_argument('--cache', help='translation unit cache folder')
+    parser.add_argument('--config',
+                        action='append',
+                        required=True,
+                        help='NAME[@TARGET]=FLAG,FLAG...')
+    parser.add_argument('--jobs', '-j', type=int, help='max workers')
+
+
 def main():
     '''
     cpptypeinfo gen -lib d3d11 -g dlang
@@ -76,8 +351,16 @@ def main():
     parser = argparse.ArgumentParser(description='cpptypeinfo')
     subparsers = parser.add_subparsers()
 
-    debug_args(subparsers)
+    if cpptypeinfo.HAS_LIBCLANG:
+        debug_args(subparsers)
+        watch_args(subparsers)
+        matrix_args(subparsers)
+    # --snapshot があれば libclang 無しで使える
     gen_args(subparsers)
+    index_args(subparsers)
+    dump_args(subparsers)
+    # query は sqlite だけ読むので libclang が無くても使える
+    query_args(subparsers)
 
     args = parser.parse_args()
     args.func(args)
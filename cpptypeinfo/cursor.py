@@ -1,12 +1,29 @@
 import pathlib
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Union, Tuple
 from clang import cindex
 from .typeparser import TypeParser
-from .get_tu import get_tu, tmp_from_source
+from .get_tu import get_tu, get_source_path, persist_source
 from .decl_map import DeclMap
+from .pch import PchPrefix
+from .session import ParseSession, SourceReader
+from .include_graph import get_include_graph
+from .profile import ParseProfile, get_profile
+from .macro_scan import scan_macros
+from .visitor import ChildFilter, get_children
 
 
-def debug_print(c, files: List[pathlib.Path], level=''):
+def debug_print(c,
+                files: List[pathlib.Path],
+                level='',
+                source_reader: Optional[SourceReader] = None,
+                child_filter: Optional[ChildFilter] = None):
+    '''
+    source_reader があれば token ではなく source を直接見る。
+    files の外の子孫は Cursor を作らずに飛ばす。
+    '''
+    if files and child_filter is None:
+        child_filter = ChildFilter(files=files, no_file=True)
     if (files and c.location.file
             and pathlib.Path(c.location.file.name) not in files):
         return
@@ -14,8 +31,15 @@ def debug_print(c, files: List[pathlib.Path], level=''):
     display = c.type.spelling
     if not display:
         if c.kind == cindex.CursorKind.UNEXPOSED_DECL:
-            tokens = [x.spelling for x in c.get_tokens()]
-            if tokens and tokens[0] == 'extern':
+            if source_reader and c.location.file:
+                start = c.extent.start
+                is_extern = source_reader.slice(
+                    pathlib.Path(start.file.name), start.offset,
+                    start.offset + 6) == b'extern'
+            else:
+                tokens = [x.spelling for x in c.get_tokens()]
+                is_extern = bool(tokens) and tokens[0] == 'extern'
+            if is_extern:
                 # https://stackoverflow.com/questions/11865486/clang-ast-extern-linkagespec-issue/12526555#12526555
                 display = 'extern "C"'
 
@@ -75,43 +99,189 @@ def debug_print(c, files: List[pathlib.Path], level=''):
         print(text)
 
         if go_children:
-            for child in c.get_children():
-                debug_print(child, files, level + '  ')
+            for child in get_children(c, child_filter):
+                debug_print(child, files, level + '  ', source_reader,
+                            child_filter)
 
 
-def parse_files(parser: TypeParser,
-                *paths: pathlib.Path,
-                includes=None,
-                cpp_flags=None,
-                debug=False) -> DeclMap:
-    if cpp_flags is None:
-        cpp_flags = []
+def get_tu_from_files(*paths: pathlib.Path,
+                      includes=None,
+                      cpp_flags=None,
+                      cache_dir: Optional[pathlib.Path] = None,
+                      pch: Optional[PchPrefix] = None,
+                      session: Optional[ParseSession] = None,
+                      profile: Union[str, ParseProfile, None] = None
+                      ) -> Tuple[cindex.TranslationUnit, pathlib.Path,
+                                 Optional[str]]:
+    '''
+    paths を #include する wrapper を parse する。
+
+    return tu, wrapper path, wrapper source(unsaved_files の場合)
+    '''
+    if not session:
+        session = ParseSession(cache_dir=cache_dir)
+    if not cache_dir:
+        cache_dir = session.cache_dir
+    # 呼び出し側の list を変更しない
+    cpp_flags = list(cpp_flags) if cpp_flags else []
+    pch_path = None
+    if pch:
+        pch_path = pch.build(cache_dir, includes, cpp_flags, session)
     cpp_flags += [f'-I{x.parent}' for x in paths]
     if includes:
         cpp_flags += [f'-I{x}' for x in includes]
-    with tmp_from_source(''.join([f'#include <{x.name}>\n'
-                                  for x in paths])) as path:
-        tu = get_tu(path, cpp_flags=cpp_flags)
-        include_path_list = [x for x in paths]
-        include_path_list.append(path)
-        decl_map = DeclMap(parser, include_path_list)
-        if debug:
-            debug_print(tu.cursor, include_path_list)
-        else:
-            decl_map.parse_cursor(tu.cursor)
-        return decl_map
+    src = ''.join(
+        [f'#include <{x.name}>\n' for x in (pch.strip(paths) if pch else paths)])
+    if cache_dir:
+        path = persist_source(src, cache_dir)
+        source = None
+    else:
+        # 一時ファイルを作らずに unsaved_files で渡す
+        path = get_source_path(src)
+        source = src
+    tu = get_tu(path,
+                cpp_flags=cpp_flags,
+                cache_dir=cache_dir,
+                pch=pch_path,
+                session=session,
+                profile=profile,
+                source=source)
+    return tu, path, source
 
 
-def parse_source(parser: TypeParser, source: str, cpp_flags=None,
-                 debug=False) -> DeclMap:
-    decl_map = DeclMap(parser, [])
+def add_macros(decl_map: DeclMap, tu: cindex.TranslationUnit,
+               paths: List[pathlib.Path], macros: Union[bool,
+                                                        List[str]]) -> None:
+    if not macros:
+        return
+    names = None if macros is True else macros
+    found = {x.name for x in decl_map.macro_definitions}
+    for macro in scan_macros(tu, paths, decl_map.token_cache, names):
+        if macro.name not in found:
+            decl_map.macro_definitions.append(macro)
 
+
+def parse_files(parser: TypeParser,
+                *paths: pathlib.Path,
+                includes=None,
+                cpp_flags=None,
+                debug=False,
+                cache_dir: Optional[pathlib.Path] = None,
+                pch: Optional[PchPrefix] = None,
+                session: Optional[ParseSession] = None,
+                profile: Union[str, ParseProfile, None] = None,
+                macros: Union[bool, List[str]] = False,
+                on_decl: Optional[Callable] = None,
+                keep_going: bool = False) -> DeclMap:
+    '''
+    macros: paths の #define を token から集める(list なら指定した名前だけ)。
+            profile の use_macro と違い、detailed processing record が要らない。
+    on_decl: DeclMap.on_decl。parse が終わった宣言から順に呼ぶ
+    keep_going: parse できない宣言を DeclMap.failures に記録して続ける
+    '''
+    profile = get_profile(profile)
+    if not session:
+        session = ParseSession(cache_dir=cache_dir)
+    tu, path, _ = get_tu_from_files(*paths,
+                                    includes=includes,
+                                    cpp_flags=cpp_flags,
+                                    cache_dir=cache_dir,
+                                    pch=pch,
+                                    session=session,
+                                    profile=profile)
+    include_path_list = [x for x in paths]
+    include_path_list.append(path)
+    decl_map = DeclMap(parser, include_path_list, session, profile,
+                       keep_going)
+    decl_map.on_decl = on_decl
+    decl_map.include_graph = get_include_graph(tu)
+    if debug:
+        debug_print(tu.cursor, include_path_list, '',
+                    session.source_reader)
+    else:
+        decl_map.parse_cursor(tu.cursor)
+    add_macros(decl_map, tu, include_path_list, macros)
+    return decl_map
+
+
+def parse_source(parser: TypeParser,
+                 source: str,
+                 cpp_flags=None,
+                 debug=False,
+                 session: Optional[ParseSession] = None,
+                 profile: Union[str, ParseProfile, None] = None,
+                 macros: Union[bool, List[str]] = False,
+                 keep_going: bool = False) -> DeclMap:
+    profile = get_profile(profile)
+    if not session:
+        session = ParseSession()
     if cpp_flags is None:
         cpp_flags = []
-    with tmp_from_source(source) as path:
-        tu = get_tu(path, cpp_flags=cpp_flags)
+    path = get_source_path(source)
+    # demand では source の宣言を parse する
+    decl_map = DeclMap(parser, [path], session, profile, keep_going)
+    # for extract
+    session.source_reader.set(path, source.encode('utf-8'))
+    try:
+        tu = get_tu(path,
+                    cpp_flags=cpp_flags,
+                    session=session,
+                    profile=profile,
+                    source=source)
+        decl_map.include_graph = get_include_graph(tu)
         if debug:
-            debug_print(tu.cursor, [])
+            debug_print(tu.cursor, [], '', session.source_reader)
         decl_map.parse_cursor(tu.cursor)
+        add_macros(decl_map, tu, [path], macros)
+    finally:
+        # session を使いまわしても source が溜まらないようにする
+        session.source_reader.pop(path)
 
     return decl_map
+
+
+def parse_sources(sources: List[str],
+                  cpp_flags=None,
+                  session: Optional[ParseSession] = None,
+                  profile: Union[str, ParseProfile, None] = None
+                  ) -> List[DeclMap]:
+    '''
+    独立した複数の source を parse する。
+    session の Index を使いまわして、source ごとに TypeParser と DeclMap を作る。
+    '''
+    if not session:
+        session = ParseSession()
+    return [
+        parse_source(TypeParser(),
+                     source,
+                     cpp_flags,
+                     session=session,
+                     profile=profile) for source in sources
+    ]
+
+
+def parse_many(header_sets: List[List[pathlib.Path]],
+               includes=None,
+               cpp_flags=None,
+               pch: Optional[PchPrefix] = None,
+               session: Optional[ParseSession] = None,
+               profile: Union[str, ParseProfile, None] = None,
+               max_workers: Optional[int] = None) -> List[DeclMap]:
+    '''
+    header の組ごとに別の thread で parse する。
+    session(Index 以外)を共有し、組ごとに TypeParser と DeclMap を作る。
+    '''
+    if not session:
+        session = ParseSession()
+
+    def parse(headers: List[pathlib.Path]) -> DeclMap:
+        return parse_files(TypeParser(),
+                           *headers,
+                           includes=includes,
+                           cpp_flags=cpp_flags,
+                           pch=pch,
+                           session=session,
+                           profile=profile)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(parse, header_sets))
@@ -0,0 +1,110 @@
+'''
+cursor の情報の cache。
+cindex.Cursor の property はそれぞれ libclang を呼び出すので、
+同じ cursor に何度も問い合わせる場合に使う。
+'''
+import pathlib
+from typing import Dict, List, Optional
+from clang import cindex
+
+
+class CursorFacts:
+    __slots__ = ['key', 'children', 'path', 'line']
+
+    def __init__(self) -> None:
+        self.key: Optional[str] = None
+        self.children: Optional[List[cindex.Cursor]] = None
+        self.path: Optional[pathlib.Path] = None
+        self.line = -1
+
+
+def get_canonical(c: cindex.Cursor) -> cindex.Cursor:
+    while c.hash != c.canonical.hash:
+        if c.spelling != c.canonical.spelling:
+            raise Exception()
+        c = c.canonical
+    return c
+
+
+def get_key(c: cindex.Cursor) -> str:
+    '''
+    TranslationUnit をまたいで同じ宣言を指す key(USR)。
+    USR が無い場合は canonical な宣言の位置を使う。
+    '''
+    usr = c.get_usr()
+    if usr:
+        return usr
+    c = get_canonical(c)
+    return f'{c.kind.name}@{c.location.file}@{c.location.offset}'
+
+
+class CursorCache:
+    '''
+    cursor.hash をキーにする。
+    hash は TranslationUnit の中でしか意味が無いので、TranslationUnit ごとに作る。
+
+    hits, misses: 問い合わせのうち cache にあった回数、無かった回数
+    '''
+    def __init__(self) -> None:
+        self.facts: Dict[int, CursorFacts] = {}
+        # 同じファイルの宣言は同じ Path を共有する(pickle が小さくなる)
+        self.paths: Dict[str, pathlib.Path] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self) -> str:
+        return (f'cursor cache: {len(self.facts)} cursors, '
+                f'{self.hits} hits, {self.misses} misses '
+                f'({self.hit_rate():.0%})')
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _get(self, c: cindex.Cursor) -> CursorFacts:
+        facts = self.facts.get(c.hash)
+        if not facts:
+            facts = CursorFacts()
+            self.facts[c.hash] = facts
+        return facts
+
+    def get_key(self, c: cindex.Cursor) -> str:
+        facts = self._get(c)
+        if facts.key is None:
+            self.misses += 1
+            facts.key = get_key(c)
+        else:
+            self.hits += 1
+        return facts.key
+
+    def get_children(self, c: cindex.Cursor) -> List[cindex.Cursor]:
+        facts = self._get(c)
+        if facts.children is None:
+            self.misses += 1
+            facts.children = list(c.get_children())
+        else:
+            self.hits += 1
+        return facts.children
+
+    def _get_location(self, c: cindex.Cursor) -> CursorFacts:
+        facts = self._get(c)
+        if facts.line < 0:
+            self.misses += 1
+            location = c.location
+            if location.file:
+                name = location.file.name
+                path = self.paths.get(name)
+                if not path:
+                    path = pathlib.Path(name)
+                    self.paths[name] = path
+                facts.path = path
+            facts.line = location.line
+        else:
+            self.hits += 1
+        return facts
+
+    def get_path(self, c: cindex.Cursor) -> Optional[pathlib.Path]:
+        return self._get_location(c).path
+
+    def get_line(self, c: cindex.Cursor) -> int:
+        return self._get_location(c).line
@@ -0,0 +1,139 @@
+'''
+DeclMap の宣言を file, class, 名前で引く
+'''
+import pathlib
+from typing import Dict, List, Set, Optional, Iterable, Type, Any
+from .usertype import UserType
+
+
+class DeclIndex:
+    '''
+    同じ宣言が DeclMap の複数の key に登録されることがあるので、一つにまとめる。
+
+    decls: 登録順の宣言
+    keys: 最初に登録した DeclMap の key(USR)
+    by_file, by_kind, by_name: decls の位置
+    結果は登録順(DeclMap.decl_map をたどる順)に返す。
+    '''
+    def __init__(self) -> None:
+        self.decls: List[UserType] = []
+        self.keys: List[Optional[str]] = []
+        # decls に登録したときの file
+        self.files: List[Optional[pathlib.Path]] = []
+        self.by_file: Dict[Optional[pathlib.Path], Set[int]] = {}
+        self.by_kind: Dict[type, Set[int]] = {}
+        self.by_name: Dict[str, Set[int]] = {}
+        # id => decls の位置
+        self.positions: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.decls)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        '''
+        id は process をまたぐと変わる
+        '''
+        state = self.__dict__.copy()
+        del state['positions']
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.positions = {id(v): i for i, v in enumerate(self.decls)}
+
+    def add(self,
+            usertype: UserType,
+            name: Optional[str] = None,
+            key: Optional[str] = None) -> None:
+        i = self.positions.get(id(usertype))
+        if i is None:
+            i = len(self.decls)
+            self.positions[id(usertype)] = i
+            self.decls.append(usertype)
+            self.keys.append(key)
+            self.files.append(usertype.file)
+            self.by_file.setdefault(usertype.file, set()).add(i)
+            self.by_kind.setdefault(type(usertype), set()).add(i)
+        if name:
+            self.by_name.setdefault(name, set()).add(i)
+
+    def update(self, usertype: UserType) -> None:
+        '''
+        登録した後で file が変わった(前方宣言の後の定義など)
+        '''
+        i = self.positions.get(id(usertype))
+        if i is None or self.files[i] == usertype.file:
+            return
+        self.by_file[self.files[i]].discard(i)
+        self.files[i] = usertype.file
+        self.by_file.setdefault(usertype.file, set()).add(i)
+
+    def merge(self, other: 'DeclIndex', remap: Dict[int, UserType]) -> None:
+        '''
+        remap: other の宣言の id => 置き換える宣言
+        '''
+        for v, key in zip(other.decls, other.keys):
+            self.add(remap.get(id(v), v), key=key)
+        for name, positions in other.by_name.items():
+            for i in positions:
+                v = other.decls[i]
+                self.add(remap.get(id(v), v), name)
+
+    def get_key(self, usertype: UserType) -> Optional[str]:
+        i = self.positions.get(id(usertype))
+        if i is None:
+            return None
+        return self.keys[i]
+
+    def _get(self, positions: Iterable[int],
+             kind: Optional[Type[UserType]] = None) -> List[UserType]:
+        decls = [self.decls[i] for i in sorted(positions)]
+        if kind:
+            decls = [v for v in decls if isinstance(v, kind)]
+        return decls
+
+    def in_files(self,
+                 files: Iterable[Optional[pathlib.Path]],
+                 kind: Optional[Type[UserType]] = None) -> List[UserType]:
+        positions: Set[int] = set()
+        for f in files:
+            positions |= self.by_file.get(f, set())
+        return self._get(positions, kind)
+
+    def of_kind(self, kind: Type[UserType]) -> List[UserType]:
+        positions: Set[int] = set()
+        for k, v in self.by_kind.items():
+            if issubclass(k, kind):
+                positions |= v
+        return self._get(positions)
+
+    def named(self,
+              name: str,
+              kind: Optional[Type[UserType]] = None) -> List[UserType]:
+        return self._get(self.by_name.get(name, set()), kind)
+
+
+class DeclQuery:
+    '''
+    index を持つ class(DeclMap, Snapshot) の検索
+    '''
+    index: DeclIndex
+
+    def decls_in(self,
+                 *files: Optional[pathlib.Path],
+                 kind: Optional[Type[UserType]] = None) -> List[UserType]:
+        '''
+        files で宣言したもの。kind があればその class だけ
+        '''
+        return self.index.in_files(files, kind)
+
+    def decls_of(self, kind: Type[UserType]) -> List[UserType]:
+        return self.index.of_kind(kind)
+
+    def decls_named(self,
+                    name: str,
+                    kind: Optional[Type[UserType]] = None) -> List[UserType]:
+        '''
+        name: ns::Struct のような修飾した名前
+        '''
+        return self.index.named(name, kind)
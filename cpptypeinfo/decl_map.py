@@ -1,120 +1,119 @@
 import uuid
-from typing import Dict, Optional, List, Set, NamedTuple, Union, Tuple
+from typing import (Dict, Optional, List, Set, NamedTuple, Union, Tuple,
+                    Generator, Any, TypeVar, Callable)
 from enum import IntEnum, auto
 import pathlib
 from clang import cindex
 import cpptypeinfo
+from cpptypeinfo.session import ParseSession, SourceReader
+from cpptypeinfo.profile import ParseProfile, get_profile
 from cpptypeinfo.usertype import (TypeRef, Typedef, Pointer, Array, UserType,
                                   StructType, Struct, Field, Function, Param,
-                                  Enum, EnumValue)
+                                  Enum, EnumValue, get_references)
+from cpptypeinfo.include_graph import IncludeGraph
+from cpptypeinfo.token_table import TokenCache
+from cpptypeinfo.macro_scan import is_constant
+from cpptypeinfo.visitor import ChildFilter, get_children
+from cpptypeinfo.decl_index import DeclIndex, DeclQuery
+from cpptypeinfo.failure import ParseFailure
+from cpptypeinfo.cursor_cache import (CursorCache, get_canonical,  # noqa
+                                      get_key)
 
 d3d11_key = 'MIDL_INTERFACE("'
 d2d1_key = 'DX_DECLARE_INTERFACE("'
 dwrite_key = 'DWRITE_DECLARE_INTERFACE("'
 
-extract_bytes_cache: Dict[pathlib.Path, bytes] = {}
 
-
-def extract(x: cindex.Cursor) -> str:
+def extract(x: cindex.Cursor, source_reader: SourceReader) -> str:
     '''
     get str for cursor
     '''
     start = x.extent.start
     p = pathlib.Path(start.file.name)
-    b = extract_bytes_cache.get(p)
-    if not b:
-        b = p.read_bytes()
-        extract_bytes_cache[p] = b
-
     end = x.extent.end
-    text = b[start.offset:end.offset]
+    text = source_reader.slice(p, start.offset, end.offset)
     return text.decode('ascii')
 
 
-def get_primitive_type(t: cindex.Type) -> Optional[TypeRef]:
+class PrimitiveEntry(NamedTuple):
     '''
-    TypeKind.VOID = TypeKind(2)
-    TypeKind.BOOL = TypeKind(3)
-    TypeKind.CHAR_U = TypeKind(4)
-    TypeKind.UCHAR = TypeKind(5)
-    TypeKind.CHAR16 = TypeKind(6)
-    TypeKind.CHAR32 = TypeKind(7)
-    TypeKind.USHORT = TypeKind(8)
-    TypeKind.UINT = TypeKind(9)
-    TypeKind.ULONG = TypeKind(10)
-    TypeKind.ULONGLONG = TypeKind(11)
-    TypeKind.UINT128 = TypeKind(12)
-    TypeKind.CHAR_S = TypeKind(13)
-    TypeKind.SCHAR = TypeKind(14)
-    TypeKind.WCHAR = TypeKind(15)
-    TypeKind.SHORT = TypeKind(16)
-    TypeKind.INT = TypeKind(17)
-    TypeKind.LONG = TypeKind(18)
-    TypeKind.LONGLONG = TypeKind(19)
-    TypeKind.INT128 = TypeKind(20)
-    TypeKind.FLOAT = TypeKind(21)
-    TypeKind.DOUBLE = TypeKind(22)
-    TypeKind.LONGDOUBLE = TypeKind(23)
-    TypeKind.NULLPTR = TypeKind(24)
+    TypeRef は immutable なので共有する
+    size: target によって違うかもしれない(long など)。None は確かめない
     '''
-    # void
-    if t.kind == cindex.TypeKind.VOID:  # void
-        return TypeRef(cpptypeinfo.Void(), t.is_const_qualified())
-    # bool
-    elif t.kind == cindex.TypeKind.BOOL:  # void
-        assert (t.get_size() == 1)
-        return TypeRef(cpptypeinfo.Bool(), t.is_const_qualified())
+    typeref: TypeRef
+    const_typeref: TypeRef
+    size: Optional[int]
+
+
+def primitive_entry(t: cpptypeinfo.PrimitiveType,
+                    size: Optional[int]) -> PrimitiveEntry:
+    return PrimitiveEntry(TypeRef(t), TypeRef(t, True), size)
+
+
+PRIMITIVE_TYPE_MAP: Dict[cindex.TypeKind, PrimitiveEntry] = {
+    cindex.TypeKind.VOID: primitive_entry(cpptypeinfo.Void(), None),
+    cindex.TypeKind.BOOL: primitive_entry(cpptypeinfo.Bool(), 1),
     # int
-    elif t.kind == cindex.TypeKind.CHAR_S:  # char
-        assert (t.get_size() == 1)
-        return TypeRef(cpptypeinfo.Int8(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.SCHAR:  # signed char
-        assert (t.get_size() == 1)
-        return TypeRef(cpptypeinfo.Int8(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.SHORT:  # short
-        assert (t.get_size() == 2)
-        return TypeRef(cpptypeinfo.Int16(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.INT:  # int
-        assert (t.get_size() == 4)
-        return TypeRef(cpptypeinfo.Int32(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.LONG:  # long
-        assert (t.get_size() == 4)
-        return TypeRef(cpptypeinfo.Int32(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.LONGLONG:  # long long
-        assert (t.get_size() == 8)
-        return TypeRef(cpptypeinfo.Int64(), t.is_const_qualified())
+    cindex.TypeKind.CHAR_S: primitive_entry(cpptypeinfo.Int8(), 1),  # char
+    cindex.TypeKind.SCHAR: primitive_entry(cpptypeinfo.Int8(),
+                                           1),  # signed char
+    cindex.TypeKind.SHORT: primitive_entry(cpptypeinfo.Int16(), 2),
+    cindex.TypeKind.INT: primitive_entry(cpptypeinfo.Int32(), 4),
+    cindex.TypeKind.LONG: primitive_entry(cpptypeinfo.Int32(), 4),
+    cindex.TypeKind.LONGLONG: primitive_entry(cpptypeinfo.Int64(), 8),
     # unsigned
-    elif t.kind == cindex.TypeKind.UCHAR:  # unsigned char
-        assert (t.get_size() == 1)
-        return TypeRef(cpptypeinfo.UInt8(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.WCHAR:  # wchar_t
-        assert (t.get_size() == 2)
-        return TypeRef(cpptypeinfo.UInt16(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.USHORT:  # unsigned short
-        assert (t.get_size() == 2)
-        return TypeRef(cpptypeinfo.UInt16(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.UINT:  # unsigned int
-        assert (t.get_size() == 4)
-        return TypeRef(cpptypeinfo.UInt32(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.ULONG:  # unsigned long
-        assert (t.get_size() == 4)
-        return TypeRef(cpptypeinfo.UInt32(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.ULONGLONG:  # unsigned __int64
-        assert (t.get_size() == 8)
-        return TypeRef(cpptypeinfo.UInt64(), t.is_const_qualified())
+    cindex.TypeKind.UCHAR: primitive_entry(cpptypeinfo.UInt8(), 1),
+    cindex.TypeKind.WCHAR: primitive_entry(cpptypeinfo.UInt16(),
+                                           2),  # wchar_t
+    cindex.TypeKind.USHORT: primitive_entry(cpptypeinfo.UInt16(), 2),
+    cindex.TypeKind.UINT: primitive_entry(cpptypeinfo.UInt32(), 4),
+    cindex.TypeKind.ULONG: primitive_entry(cpptypeinfo.UInt32(), 4),
+    cindex.TypeKind.ULONGLONG: primitive_entry(cpptypeinfo.UInt64(),
+                                               8),  # unsigned __int64
     # float
-    elif t.kind == cindex.TypeKind.FLOAT:  # float
-        assert (t.get_size() == 4)
-        return TypeRef(cpptypeinfo.Float(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.DOUBLE:  # double
-        assert (t.get_size() == 8)
-        return TypeRef(cpptypeinfo.Double(), t.is_const_qualified())
-    elif t.kind == cindex.TypeKind.LONGDOUBLE:  # double
-        size = t.get_size()
-        assert (size == 8)
-        return TypeRef(cpptypeinfo.Double(), t.is_const_qualified())
-
-    return None
+    cindex.TypeKind.FLOAT: primitive_entry(cpptypeinfo.Float(), 4),
+    cindex.TypeKind.DOUBLE: primitive_entry(cpptypeinfo.Double(), 8),
+    cindex.TypeKind.LONGDOUBLE: primitive_entry(cpptypeinfo.Double(), 8),
+}
+
+
+# target によって size が違う型(x86_64-linux-gnu の long, wchar_t など)
+RESIZED_PRIMITIVE_MAP: Dict[Tuple[cindex.TypeKind, int], PrimitiveEntry] = {
+    (cindex.TypeKind.LONG, 8): primitive_entry(cpptypeinfo.Int64(), 8),
+    (cindex.TypeKind.ULONG, 8): primitive_entry(cpptypeinfo.UInt64(), 8),
+    (cindex.TypeKind.WCHAR, 4): primitive_entry(cpptypeinfo.UInt32(), 4),
+    (cindex.TypeKind.LONGDOUBLE, 12): primitive_entry(cpptypeinfo.LongDouble(),
+                                                      12),
+    (cindex.TypeKind.LONGDOUBLE, 16): primitive_entry(cpptypeinfo.LongDouble(),
+                                                      16),
+}
+
+
+def get_primitive_type(
+        t: cindex.Type,
+        checked: Optional[Dict[cindex.TypeKind, PrimitiveEntry]] = None
+) -> Optional[TypeRef]:
+    '''
+    checked: size を確かめた TypeKind の entry。
+    同じ TranslationUnit では size が変わらないので、一度だけ確かめる。
+    '''
+    entry = checked.get(t.kind) if checked is not None else None
+    if not entry:
+        entry = PRIMITIVE_TYPE_MAP.get(t.kind)
+        if not entry:
+            return None
+        if entry.size is not None:
+            size = t.get_size()
+            if size != entry.size:
+                # target の size に合わせる
+                resized = RESIZED_PRIMITIVE_MAP.get((t.kind, size))
+                if not resized:
+                    raise Exception(
+                        f'{t.spelling}: unsupported size {size}')
+                entry = resized
+        if checked is not None:
+            checked[t.kind] = entry
+    return entry.const_typeref if t.is_const_qualified() else entry.typeref
 
 
 class NestType(IntEnum):
@@ -226,204 +225,377 @@ def is_nest_typedef(typedef: Typedef) -> bool:
     return True
 
 
-def get_canonical(c: cindex.Cursor) -> cindex.Cursor:
-    while c.hash != c.canonical.hash:
-        if c.spelling != c.canonical.spelling:
-            raise Exception()
-        c = c.canonical
-    return c
+T = TypeVar('T')
+# yield した Task の結果を受け取り、最後に T を返す generator
+Task = Generator[Any, Any, T]
+
+
+def run(task: Task[T]) -> T:
+    '''
+    task が yield した task を先に実行して、結果を send する。
+    再帰呼び出しの代わりに明示的な stack を使うので、
+    入れ子の深い header でも Python の stack を消費しない。
+    '''
+    stack: List[Task] = [task]
+    value: Any = None
+    error: Optional[Exception] = None
+    while True:
+        try:
+            if error:
+                current = error
+                error = None
+                sub = stack[-1].throw(current)
+            else:
+                sub = stack[-1].send(value)
+        except StopIteration as ex:
+            stack.pop()
+            if not stack:
+                return ex.value
+            value = ex.value
+            continue
+        except Exception as ex:
+            stack.pop()
+            if not stack:
+                raise
+            # 呼び出し元の task に伝える
+            error = ex
+            continue
+        stack.append(sub)
+        value = None
+
+
+def get_namespaces(c: cindex.Cursor) -> List[str]:
+    '''
+    cursor を囲む namespace の名前
+    '''
+    names: List[str] = []
+    current = c.semantic_parent
+    while current and current.kind != cindex.CursorKind.TRANSLATION_UNIT:
+        if current.kind == cindex.CursorKind.NAMESPACE:
+            names.insert(0, current.spelling)
+        current = current.semantic_parent
+    return names
+
 
+QUALIFIER_KINDS = {
+    cindex.CursorKind.NAMESPACE,
+    cindex.CursorKind.STRUCT_DECL,
+    cindex.CursorKind.CLASS_DECL,
+    cindex.CursorKind.UNION_DECL,
+}
 
-class DeclMap:
-    def __init__(self, parser: cpptypeinfo.TypeParser, files):
+
+def get_qualified_name(c: cindex.Cursor) -> Optional[str]:
+    '''
+    ns::Struct::Inner。無名の場合は None
+    '''
+    if not c.spelling.isidentifier():
+        return None
+    names = [c.spelling]
+    current = c.semantic_parent
+    while current and current.kind != cindex.CursorKind.TRANSLATION_UNIT:
+        if current.kind in QUALIFIER_KINDS:
+            names.insert(0, current.spelling)
+        current = current.semantic_parent
+    return '::'.join(names)
+
+
+class DeclMap(DeclQuery):
+    def __init__(self,
+                 parser: cpptypeinfo.TypeParser,
+                 files,
+                 session: Optional[ParseSession] = None,
+                 profile: Optional[ParseProfile] = None,
+                 keep_going: bool = False):
         self.parser = parser
-        self.decl_map: Dict[int, UserType] = {}
+        self.profile = get_profile(profile)
+        # session が無い場合はこの DeclMap と一緒に破棄する
+        self.source_reader = session.source_reader if session else SourceReader()
+        # この TranslationUnit の token
+        self.token_cache = TokenCache(self.source_reader)
+        # この TranslationUnit の cursor の情報
+        self.cursor_cache = CursorCache()
+        # get_primitive_type で size を確かめた TypeKind
+        self.checked_primitives: Dict[cindex.TypeKind, PrimitiveEntry] = {}
+        # convert_type の結果
+        self.type_memo: Dict[Tuple, TypeRef] = {}
+        self.type_memo_hits = 0
+        # key は get_key(USR)
+        self.decl_map: Dict[str, UserType] = {}
+        # decl_map の値を file, class, 名前で引く
+        self.index = DeclIndex()
+        # parse が終わった宣言を index, key と一緒に受け取る
+        self.on_decl: Optional[Callable[[DeclIndex, Optional[str], UserType],
+                                        None]] = None
+        # on_decl に渡した index.decls の位置
+        self.flushed = 0
+        # 定義を待っている前方宣言の位置
+        self.pending: List[int] = []
         self.used: Set[int] = set()
         self.files = files
+        # translation unit, namespace, extern "C" の子を native で選ぶ
+        skip_kinds = set(IGNORE_CURSOR_KINDS)
+        if not self.profile.use_macro:
+            skip_kinds.add(cindex.CursorKind.MACRO_DEFINITION)
+        self.child_filter = ChildFilter(skip_kinds)
+        # demand では translation unit 直下を指定した header の宣言に絞る
+        self.top_filter = ChildFilter(
+            skip_kinds, files) if self.profile.demand else self.child_filter
         self.extern_c: List[bool] = [False]
         self.macro_definitions: List[cpptypeinfo.MacroDefinition] = []
+        # parse した TranslationUnit の include 関係
+        self.include_graph: Optional[IncludeGraph] = None
+        # parse できない宣言があっても、記録して placeholder で続ける
+        self.keep_going = keep_going
+        self.failures: List[ParseFailure] = []
 
-    def has(self, _c: cindex.Cursor) -> bool:
-        c = get_canonical(_c)
-        return c.hash in self.decl_map
-
-    def get(self, _c: cindex.Cursor) -> UserType:
-        c = get_canonical(_c)
-        return self.decl_map[c.hash]
-
-    def add(self, _c: cindex.Cursor, usertype: UserType) -> None:
-        c = get_canonical(_c)
-        if c.hash in self.decl_map:
+    def __getstate__(self):
+        '''
+        process をまたいで渡す(pickle)ときは cache を外す
+        '''
+        state = self.__dict__.copy()
+        del state['source_reader']
+        # cursor.hash, TypeKind は TranslationUnit の中でしか意味が無い
+        state['used'] = set()
+        state['checked_primitives'] = {}
+        state['cursor_cache'] = CursorCache()
+        del state['token_cache']
+        state['type_memo'] = {}
+        state['on_decl'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.source_reader = SourceReader()
+        self.token_cache = TokenCache(self.source_reader)
+
+    def has(self, c: cindex.Cursor) -> bool:
+        return self.cursor_cache.get_key(c) in self.decl_map
+
+    def get(self, c: cindex.Cursor) -> UserType:
+        return self.decl_map[self.cursor_cache.get_key(c)]
+
+    def get_or_parse(self, c: cindex.Cursor) -> Task[UserType]:
+        '''
+        まだ parse していない宣言なら parse する
+        '''
+        if not self.has(c):
+            if self.profile.demand:
+                # 前方宣言ではなく定義を parse する
+                definition = c.get_definition()
+                if definition:
+                    c = definition
+            # 参照元ではなく、宣言の namespace に登録する
+            stack = self.parser.stack
+            self.parser.stack = [self.parser.root_namespace]
+            for name in get_namespaces(c):
+                self.parser.push_namespace(name)
+            try:
+                yield self._parse_cursor(c)
+            finally:
+                self.parser.stack = stack
+        return self.get(c)
+
+    def add(self, c: cindex.Cursor, usertype: UserType) -> None:
+        key = self.cursor_cache.get_key(c)
+        if key in self.decl_map:
             raise Exception()
         concrete_type, stack = strip_pointer(usertype)
         inner_type = deref_typedef(concrete_type)
         restore = restore_nest_type(inner_type, stack).ref
-        self.decl_map[c.hash] = restore
+        self.decl_map[key] = restore
+        # primitive は共有しているので、typedef ごとに別の宣言として引く
+        indexed = restore if isinstance(restore, UserType) else usertype
+        self.index.add(indexed, get_qualified_name(c), key)
 
     def resolve_typedef(self) -> None:
         pass
 
-    def parse_cursor(self, c: cindex.Cursor):
+    def add_failure(self, c: cindex.Cursor, ex: Exception) -> None:
+        message = f'{type(ex).__name__}: {ex}' if str(
+            ex) else type(ex).__name__
+        self.failures.append(
+            ParseFailure(c.kind.name, c.spelling,
+                         self.cursor_cache.get_path(c),
+                         self.cursor_cache.get_line(c), message))
+
+    def add_placeholder(self, c: cindex.Cursor) -> None:
         '''
-        namespaceレベルの要素。
-        各種宣言が期待される。
+        parse できなかった宣言の代わりに、中身の無い struct を登録する
         '''
-        if c.hash in self.used:
+        if c.kind not in PLACEHOLDER_CURSOR_KINDS or self.has(c):
             return
-        self.used.add(c.hash)
-
-        # if files and pathlib.Path(c.location.file.name) not in files:
-        #     return
-        if c.kind == cindex.CursorKind.TRANSLATION_UNIT:
-
-            for child in c.get_children():
-                self.parse_cursor(child)
-
-        elif c.kind == cindex.CursorKind.NAMESPACE:
-            # nested
-            self.parser.push_namespace(c.spelling)
-            for child in c.get_children():
-                self.parse_cursor(child)
-            self.parser.pop_namespace()
-
-        elif c.kind == cindex.CursorKind.UNEXPOSED_DECL:
-            extern_c = False
-            try:
-                it = c.get_tokens()
-                t0 = next(it)
-                t1 = next(it)
-                if t0.spelling == 'extern' and t1.spelling == '"C"':
-                    extern_c = True
-            except StopIteration:
-                pass
-            if extern_c:
-                self.extern_c.append(True)
-            for child in c.get_children():
-                self.parse_cursor(child)
-            if extern_c:
-                self.extern_c.pop()
-
-        elif c.kind == cindex.CursorKind.UNION_DECL:
-            self.parse_struct(c, StructType.UNION)
-
-        elif c.kind == cindex.CursorKind.STRUCT_DECL:
-            self.parse_struct(c, StructType.STRUCT)
-
-        elif c.kind == cindex.CursorKind.CLASS_DECL:
-            self.parse_struct(c, StructType.CLASS)
-
-        elif c.kind == cindex.CursorKind.TYPEDEF_DECL:
-            self.parse_typedef(c)
-
-        elif c.kind == cindex.CursorKind.FUNCTION_DECL:
-            function = self.parse_function(c)
-            self.parser.get_current_namespace().functions.append(function)
-            if not self.has(c):
-                self.add(c, function)
-
-        elif c.kind == cindex.CursorKind.ENUM_DECL:
-            self.parse_enum(c)
-
-        elif c.kind == cindex.CursorKind.VAR_DECL:
-            # static variable
-            pass
-
-        elif c.kind == cindex.CursorKind.ENUM_CONSTANT_DECL:
-            # enum_type hoge = 0;
-            pass
-
-        elif c.kind == cindex.CursorKind.CXX_UNARY_EXPR:
-            pass
-
-        elif c.kind == cindex.CursorKind.UNEXPOSED_EXPR:
-            pass
-
-        elif c.kind == cindex.CursorKind.UNEXPOSED_ATTR:
-            pass
-
-        elif c.kind == cindex.CursorKind.USING_DECLARATION:
-            pass
-
-        elif c.kind == cindex.CursorKind.FUNCTION_TEMPLATE:
-            pass
-
-        elif c.kind == cindex.CursorKind.CLASS_TEMPLATE:
-            pass
-            # parse_struct(c)
+        decl = Struct(c.spelling or c.type.spelling)
+        decl.file = self.cursor_cache.get_path(c)
+        decl.line = self.cursor_cache.get_line(c)
+        self.add(c, decl)
 
-        elif c.kind == cindex.CursorKind.CLASS_TEMPLATE_PARTIAL_SPECIALIZATION:
-            pass
+    def _get_include_graph(self) -> IncludeGraph:
+        if not self.include_graph:
+            raise Exception('no include graph')
+        return self.include_graph
 
-        elif c.kind == cindex.CursorKind.MACRO_DEFINITION:
-            if not c.location.file:
-                # __llvm = 1
-                return
+    def headers_affecting(self, usertype: UserType) -> Set[pathlib.Path]:
+        '''
+        usertype と、それが参照する型の宣言に影響する header
+        '''
+        graph = self._get_include_graph()
+        files: Set[pathlib.Path] = set()
+        used: Set[int] = set()
+        stack = [usertype]
+        while stack:
+            current = stack.pop()
+            if id(current) in used:
+                continue
+            used.add(id(current))
+            if current.file and current.file not in files:
+                files.add(current.file)
+                files |= graph.includes_of(current.file)
+            stack += get_references(current)
+        return files
+
+    def decls_affected_by(self, path: pathlib.Path) -> List[UserType]:
+        '''
+        path の変更で変わりうる宣言
+        '''
+        graph = self._get_include_graph()
+        files = graph.includers_of(path)
+        files.add(path)
+        return self.decls_in(*files)
 
-            tokens = [t.spelling for t in c.get_tokens()]
+    def parse_cursor(self, c: cindex.Cursor) -> None:
+        '''
+        namespaceレベルの要素。
+        各種宣言が期待される。
+        '''
+        run(self._parse_cursor(c))
+        self.flush_decls(True)
 
-            if len(tokens) == 1:
-                # ex. #define __header__
-                return
+    def flush_decls(self, final: bool = False) -> None:
+        '''
+        parse が終わった宣言を on_decl に渡す。
+        前方宣言だけの struct は、定義を parse するまで待つ(final なら渡す)。
+        '''
+        if not self.on_decl:
+            return
+        decls = self.index.decls
+        pending = self.pending + list(range(self.flushed, len(decls)))
+        self.flushed = len(decls)
+        self.pending = []
+        for i in pending:
+            v = decls[i]
+            if (not final and isinstance(v, Struct) and v.is_forward_decl()
+                    and not v.methods):
+                self.pending.append(i)
+                continue
+            self.on_decl(self.index, self.index.keys[i], v)
+
+    def _parse_cursor(self, c: cindex.Cursor) -> Task[None]:
+        '''
+        parse_* は Task を返す。
+        他の宣言を parse する場合は、呼び出す代わりに yield する。
+        '''
+        if c.hash in self.used:
+            return
+        self.used.add(c.hash)
 
-            if tokens in [
-                ['IID_ID3DBlob', 'IID_ID3D10Blob'],
-                ['INTERFACE', 'ID3DInclude'],
-                ['D2D1_INVALID_TAG', 'ULONGLONG_MAX'],
-                ['D2D1FORCEINLINE', 'FORCEINLINE'],
-            ]:
-                #define IID_ID3DBlob IID_ID3D10Blob
-                #define INTERFACE ID3DInclude
-                #define D2D1_INVALID_TAG ULONGLONG_MAX
-                #define D2D1FORCEINLINE FORCEINLINE
-                return
+        stack = list(self.parser.stack)
+        extern_c = len(self.extern_c)
+        try:
+            handler = CURSOR_HANDLERS.get(c.kind)
+            if handler:
+                task = handler(self, c)
+                if task:
+                    yield task
+            elif c.kind not in IGNORE_CURSOR_KINDS:
+                tokens = self.token_cache.get_spellings(c)
+                raise NotImplementedError(f'{c.kind}: {tokens}')
+        except Exception as ex:
+            if not self.keep_going:
+                raise
+            self.add_failure(c, ex)
+            # 途中で抜けた push_namespace, extern "C" を戻す
+            self.parser.stack = stack
+            del self.extern_c[extern_c:]
+            self.add_placeholder(c)
+
+    def parse_translation_unit(self, c: cindex.Cursor) -> Task[None]:
+        # demand では指定した header の宣言だけ。
+        # 他の宣言は get_or_parse で必要になったら parse する
+        for child in get_children(c, self.top_filter):
+            yield self._parse_cursor(child)
+            self.flush_decls()
+
+    def parse_namespace(self, c: cindex.Cursor) -> Task[None]:
+        # nested
+        self.parser.push_namespace(c.spelling)
+        for child in get_children(c, self.child_filter):
+            yield self._parse_cursor(child)
+        self.parser.pop_namespace()
 
-            if len(tokens) >= 3 and tokens[1] == '(' and tokens[2][0].isalpha(
-            ):
-                # maybe macro function
-                return
+    def parse_unexposed_decl(self, c: cindex.Cursor) -> Task[None]:
+        extern_c = self.token_cache.get_spellings(c, 2) == ['extern', '"C"']
+        if extern_c:
+            self.extern_c.append(True)
+        for child in get_children(c, self.child_filter):
+            yield self._parse_cursor(child)
+        if extern_c:
+            self.extern_c.pop()
+
+    def parse_function_decl(self, c: cindex.Cursor) -> Task[None]:
+        function = yield self.parse_function(c)
+        self.parser.get_current_namespace().functions.append(function)
+        if not self.has(c):
+            self.add(c, function)
+
+    def parse_enum_decl(self, c: cindex.Cursor) -> None:
+        self.parse_enum(c)
+
+    def parse_macro_definition(self, c: cindex.Cursor) -> None:
+        if not self.profile.use_macro:
+            return
 
-            # if c.spelling == 'D3D11_SDK_VERSION':
-            #     raise Exception()
+        if not self.cursor_cache.get_path(c):
+            # __llvm = 1
+            return
 
-            self.macro_definitions.append(
-                cpptypeinfo.MacroDefinition(c.spelling,
-                                            ' '.join(x for x in tokens[1:]),
-                                            pathlib.Path(c.location.file.name),
-                                            c.location.line))
+        tokens = self.token_cache.get_spellings(c)
 
-        elif c.kind == cindex.CursorKind.MACRO_INSTANTIATION:
-            pass
+        if not is_constant(tokens):
+            return
 
-        elif c.kind == cindex.CursorKind.INCLUSION_DIRECTIVE:
-            pass
+        if len(tokens) >= 3 and tokens[1] == '(' and tokens[2][0].isalpha():
+            # maybe macro function
+            return
 
-        elif c.kind == cindex.CursorKind.STATIC_ASSERT:
-            pass
+        # if c.spelling == 'D3D11_SDK_VERSION':
+        #     raise Exception()
 
-        else:
-            tokens = [x.spelling for x in c.get_tokens()]
-            raise NotImplementedError(f'{c.kind}: {tokens}')
+        self.macro_definitions.append(
+            cpptypeinfo.MacroDefinition(c.spelling,
+                                        ' '.join(x for x in tokens[1:]),
+                                        self.cursor_cache.get_path(c),
+                                        self.cursor_cache.get_line(c)))
 
-    def get_type_from_hash(self, t: cindex.Type, c: cindex.Cursor) -> TypeRef:
+    def get_type_from_hash(self, t: cindex.Type,
+                           c: cindex.Cursor) -> Task[TypeRef]:
         '''
         登録済みの型をhashから取得する
         '''
         if t.kind in (cindex.TypeKind.ELABORATED, cindex.TypeKind.RECORD,
                       cindex.TypeKind.TYPEDEF, cindex.TypeKind.ENUM):
             # structなど
-            children = [child for child in c.get_children()]
+            children = self.cursor_cache.get_children(c)
             for child in children:
                 if child.kind in (cindex.CursorKind.STRUCT_DECL,
                                   cindex.CursorKind.UNION_DECL):
-                    decl = self.get(child)
+                    decl = yield self.get_or_parse(child)
                     if decl:
                         return TypeRef(decl, t.is_const_qualified())
                     raise Exception()
 
                 elif child.kind == cindex.CursorKind.TYPE_REF:
-                    if not self.has(child.referenced):
-                        self.parse_cursor(child.referenced)
-                    decl = self.get(child.referenced)
+                    decl = yield self.get_or_parse(child.referenced)
                     if decl:
                         return TypeRef(decl, t.is_const_qualified())
                     raise Exception()
@@ -439,58 +611,93 @@ class DeclMap:
         if t.kind == cindex.TypeKind.FUNCTIONPROTO:
             return TypeRef(cpptypeinfo.Void(), t.is_const_qualified())
 
-        children = [child for child in c.get_children()]
+        children = self.cursor_cache.get_children(c)
         raise Exception()
 
+    def get_type_key(self, base_type: cindex.Type,
+                     stack: List[NestInfo]) -> Optional[Tuple]:
+        '''
+        型の宣言と pointer, array の入れ子が同じなら同じ key
+        '''
+        if base_type.kind in PRIMITIVE_TYPE_MAP:
+            decl_key: Any = base_type.kind
+        else:
+            decl = base_type.get_declaration()
+            if decl.kind == cindex.CursorKind.NO_DECL_FOUND:
+                return None
+            decl_key = self.cursor_cache.get_key(decl)
+        return (decl_key, base_type.is_const_qualified(), tuple(stack))
+
     def cindex_type_to_cpptypeinfo(self, t: cindex.Type,
-                                   c: cindex.Cursor) -> TypeRef:
+                                   c: cindex.Cursor) -> Task[TypeRef]:
         # remove pointer
         base_type, stack = strip_nest_type(t)
+        typeref = yield self.convert_type(base_type, stack, c)
+        return typeref
 
-        primitive = get_primitive_type(base_type)
+    def convert_type(self, base_type: cindex.Type, stack: List[NestInfo],
+                     c: cindex.Cursor) -> Task[TypeRef]:
+        '''
+        同じ型が何度も出てくるので、変換した TypeRef を共有する
+        '''
+        key = self.get_type_key(base_type, stack)
+        if key:
+            found = self.type_memo.get(key)
+            if found:
+                self.type_memo_hits += 1
+                return found
+
+        primitive = get_primitive_type(base_type,
+                                       self.checked_primitives)
         if primitive:
-            return restore_nest_type(primitive, stack)
-
-        nest = self.get_type_from_hash(base_type, c)
-        if nest:
-            return restore_nest_type(nest, stack)
-
-        raise Exception(f'unknown type: {t.kind}')
-        return None
-
-    def parse_functionproto(self, c: cindex.Cursor) -> Function:
-        children = [child for child in c.get_children()]
-
-        def to_param(child):
-            decl = self.cindex_type_to_cpptypeinfo(child.type, child)
-            ref = TypeRef(decl, child.type.is_const_qualified())
-            return Param(child.spelling, ref)
+            typeref = restore_nest_type(primitive, stack)
+        else:
+            try:
+                nest = yield self.get_type_from_hash(base_type, c)
+                if not nest:
+                    raise Exception(f'unknown type: {base_type.kind}')
+            except Exception as ex:
+                if not self.keep_going:
+                    raise
+                self.add_failure(c, ex)
+                nest = TypeRef(Struct(base_type.spelling),
+                               base_type.is_const_qualified())
+            typeref = restore_nest_type(nest, stack)
+
+        if key:
+            self.type_memo[key] = typeref
+        return typeref
+
+    def parse_functionproto(self, c: cindex.Cursor) -> Task[Function]:
+        children = self.cursor_cache.get_children(c)
 
         params = []
         result: cpptypeinfo.Type = cpptypeinfo.Void()
         for child in children:
             if child.kind == cindex.CursorKind.TYPE_REF:
-                result = self.get(child.referenced)
+                result = yield self.get_or_parse(child.referenced)
             elif child.kind == cindex.CursorKind.PARM_DECL:
-                params.append(to_param(child))
+                decl = yield self.cindex_type_to_cpptypeinfo(child.type, child)
+                ref = TypeRef(decl, child.type.is_const_qualified())
+                params.append(Param(child.spelling, ref))
 
         return Function(result, params)
 
     def typedef_elaborated_type(self, underlying: cindex.Type,
-                                c: cindex.Cursor) -> Optional[TypeRef]:
+                                c: cindex.Cursor) -> Task[Optional[TypeRef]]:
         '''
         Typedefとともに型定義(struct, enum....)
         '''
         if underlying.kind != cindex.TypeKind.ELABORATED:
             return None
 
-        children = [child for child in c.get_children()]
+        children = self.cursor_cache.get_children(c)
         for child in children:
             if child.kind in [
                     cindex.CursorKind.STRUCT_DECL,
                     cindex.CursorKind.UNION_DECL,
             ]:
-                struct = self.get(child)
+                struct = yield self.get_or_parse(child)
                 if struct:
                     # decl = self.parser.typedef(c.spelling, struct)
                     # decl.file = pathlib.Path(c.location.file.name)
@@ -500,7 +707,7 @@ class DeclMap:
                 raise Exception()
 
             if child.kind == cindex.CursorKind.ENUM_DECL:
-                enum = self.get(child)
+                enum = yield self.get_or_parse(child)
                 if enum:
                     # decl = self.parser.typedef(c.spelling, enum)
                     # decl.file = pathlib.Path(c.location.file.name)
@@ -510,7 +717,7 @@ class DeclMap:
                 raise Exception()
 
             if child.kind == cindex.CursorKind.TYPE_REF:
-                ref = self.get(child.referenced)
+                ref = yield self.get_or_parse(child.referenced)
                 if ref:
                     # decl = self.parser.typedef(c.spelling, ref)
                     # decl.file = pathlib.Path(c.location.file.name)
@@ -521,64 +728,63 @@ class DeclMap:
             raise Exception()
         raise Exception()
 
-    def parse_typedef(self, c: cindex.Cursor) -> None:
+    def parse_typedef(self, c: cindex.Cursor) -> Task[None]:
         if self.has(c):
             # already exists
             return
 
         underlying, stack = strip_nest_type(c.underlying_typedef_type)
-        primitive = get_primitive_type(underlying)
+        primitive = get_primitive_type(underlying,
+                                       self.checked_primitives)
         if primitive:
             typedef = self.parser.typedef(c.spelling,
                                           restore_nest_type(primitive, stack))
-            typedef.file = pathlib.Path(c.location.file.name)
-            typedef.line = c.location.line
+            typedef.file = self.cursor_cache.get_path(c)
+            typedef.line = self.cursor_cache.get_line(c)
             self.add(c, typedef)
             return
 
-        elaborated = self.typedef_elaborated_type(underlying, c)
+        elaborated = yield self.typedef_elaborated_type(underlying, c)
         if elaborated:
             typedef = self.parser.typedef(c.spelling,
                                           restore_nest_type(elaborated, stack))
-            typedef.file = pathlib.Path(c.location.file.name)
-            typedef.line = c.location.line
+            typedef.file = self.cursor_cache.get_path(c)
+            typedef.line = self.cursor_cache.get_line(c)
             self.add(c, typedef)
             return
 
         if underlying.kind == cindex.TypeKind.TYPEDEF:
-            children = [child for child in c.get_children()]
+            children = self.cursor_cache.get_children(c)
             for child in children:
                 if child.kind == cindex.CursorKind.TYPE_REF:
-                    if not self.has(child.referenced):
-                        self.parse_cursor(child.referenced)
-                    usertype = self.get(child.referenced)
+                    usertype = yield self.get_or_parse(child.referenced)
                     if usertype:
                         typedef = self.parser.typedef(
                             c.spelling, restore_nest_type(usertype, stack))
-                        typedef.file = pathlib.Path(c.location.file.name)
-                        typedef.line = c.location.line
+                        typedef.file = self.cursor_cache.get_path(c)
+                        typedef.line = self.cursor_cache.get_line(c)
                         self.add(c, typedef)
                         return
 
             raise Exception()
 
         if underlying.kind == cindex.TypeKind.FUNCTIONPROTO:
-            function = self.parse_functionproto(c)
+            function = yield self.parse_functionproto(c)
             typedef = self.parser.typedef(
                 c.spelling, TypeRef(function, c.type.is_const_qualified()))
-            typedef.file = pathlib.Path(c.location.file.name)
-            typedef.line = c.location.line
+            typedef.file = self.cursor_cache.get_path(c)
+            typedef.line = self.cursor_cache.get_line(c)
             self.add(c, typedef)
             return
 
         if underlying.kind == cindex.TypeKind.UNEXPOSED:
             # typedef decltype(__nullptr) nullptr_t;
-            children = [child for child in c.get_children()]
+            children = self.cursor_cache.get_children(c)
             if c.spelling == 'nullptr_t':
                 typedef = self.parser.typedef(c.spelling,
                                               TypeRef(cpptypeinfo.Void()))
-                typedef.file = pathlib.Path(c.location.file.name)
-                typedef.line = c.location.line
+                typedef.file = self.cursor_cache.get_path(c)
+                typedef.line = self.cursor_cache.get_line(c)
                 self.add(c, typedef)
                 return
 
@@ -591,33 +797,34 @@ class DeclMap:
         if not name:
             raise Exception(f'no name')
         values = []
-        for child in c.get_children():
+        for child in self.cursor_cache.get_children(c):
             if child.kind == cindex.CursorKind.ENUM_CONSTANT_DECL:
                 values.append(EnumValue(child.spelling, child.enum_value))
             else:
                 raise Exception(f'{child.kind}')
         decl = Enum(name, values)
         self.parser.get_current_namespace().register_type(name, decl)
-        decl.file = pathlib.Path(c.location.file.name)
-        decl.line = c.location.line
+        decl.file = self.cursor_cache.get_path(c)
+        decl.line = self.cursor_cache.get_line(c)
         self.add(c, decl)
         return decl
 
-    def parse_function(self, c: cindex.Cursor) -> Function:
-        result = self.cindex_type_to_cpptypeinfo(c.result_type, c)
+    def parse_function(self, c: cindex.Cursor) -> Task[Function]:
+        result = yield self.cindex_type_to_cpptypeinfo(c.result_type, c)
 
         dll_export = False
         has_body = False
         params = []
-        for child in c.get_children():
+        for child in self.cursor_cache.get_children(c):
             if child.kind == cindex.CursorKind.PARM_DECL:
                 if child.type.kind == cindex.TypeKind.CONSTANTARRAY:
-                    param = self.cindex_type_to_cpptypeinfo(
+                    param = yield self.cindex_type_to_cpptypeinfo(
                         child.type.get_array_element_type(), child)
                     param = TypeRef(Pointer(param),
                                     child.type.is_const_qualified())
                 else:
-                    param = self.cindex_type_to_cpptypeinfo(child.type, child)
+                    param = yield self.cindex_type_to_cpptypeinfo(
+                        child.type, child)
                 # ToDo:
                 default_value = ''
                 params.append(Param(param, child.spelling, default_value))
@@ -659,13 +866,13 @@ class DeclMap:
         # affected platform option: -target x86_64-windows-msvc
         decl.mangled_name = c.mangled_name
         decl.extern_c = self.extern_c[-1]
-        decl.file = pathlib.Path(c.location.file.name)
-        decl.line = c.location.line
+        decl.file = self.cursor_cache.get_path(c)
+        decl.line = self.cursor_cache.get_line(c)
         decl.dll_export = dll_export
         decl.has_body = has_body
         return decl
 
-    def parse_field(self, c: cindex.Cursor) -> Field:
+    def parse_field(self, c: cindex.Cursor) -> Task[Field]:
         '''
         structのfieldを処理する。
         配列の処理に注意。
@@ -679,114 +886,181 @@ class DeclMap:
         #     raise Exception(f'struct {c.spelling}.{child.spelling}: offset error')
 
         field_type, stack = strip_nest_type(c.type)
-        primitive = get_primitive_type(field_type)
-        if primitive:
+        typeref = yield self.convert_type(field_type, stack, c)
+        if field_type.kind in PRIMITIVE_TYPE_MAP:
             # field
-            return Field(restore_nest_type(primitive, stack), c.spelling,
-                         offset)
-
-        decl = self.get_type_from_hash(field_type, c)
-        if decl:
-            return Field(restore_nest_type(decl, stack), c.spelling)
-
-        raise Exception()
+            return Field(typeref, c.spelling, offset)
+        return Field(typeref, c.spelling)
 
     def parse_struct(self, c: cindex.Cursor,
-                     struct_type: StructType) -> Struct:
+                     struct_type: StructType) -> Task[Struct]:
         if self.has(c):
             decl = self.get(c)
         else:
             name = c.spelling
             # print(f'{name}: {c.hash}')
             decl = Struct(name)
+            decl.file = self.cursor_cache.get_path(c)
             self.add(c, decl)
         decl.struct_type = struct_type
-        decl.file = pathlib.Path(c.location.file.name)
-        decl.line = c.location.line
+        decl.file = self.cursor_cache.get_path(c)
+        decl.line = self.cursor_cache.get_line(c)
+        self.index.update(decl)
         self.parser.push_namespace(decl.namespace)
-        for child in c.get_children():
-            if child.kind == cindex.CursorKind.FIELD_DECL:
-                field = self.parse_field(child)
-                decl.fields.append(field)
-
-            elif child.kind == cindex.CursorKind.UNION_DECL and not child.spelling:
-                # anonymous union
-                union = self.parse_struct(child, StructType.UNION)
-                field = Field(TypeRef(union, child.type.is_const_qualified()))
-                decl.fields.append(field)
-
-            elif child.kind == cindex.CursorKind.CXX_ACCESS_SPEC_DECL:
-                # public, private...
-                pass
-
-            elif child.kind == cindex.CursorKind.CXX_UNARY_EXPR:
-                # some_template<sizeof(char)>
-                pass
-
-            elif child.kind == cindex.CursorKind.UNEXPOSED_EXPR:
-                # some_template<1>
-                pass
-
-            elif child.kind in [
-                    cindex.CursorKind.STRUCT_DECL,
-                    cindex.CursorKind.UNION_DECL,
-                    cindex.CursorKind.TYPEDEF_DECL,
-                    cindex.CursorKind.FUNCTION_TEMPLATE,
-            ]:
-                # inner type
-                self.parse_cursor(child)
-
-            elif child.kind == cindex.CursorKind.ALIGNED_ATTR:
-                # __declspec(align(x))
-                # use newer llvm(9) and latest cindex
-                # https://github.com/llvm-mirror/clang/blob/master/bindings/python/clang/cindex.py
-                pass
-
-            elif child.kind == cindex.CursorKind.CXX_BASE_SPECIFIER:
-                # class some: public base_class
-                for x in child.get_children():
-                    if x.kind == cindex.CursorKind.TYPE_REF:
-                        base = self.get(x.referenced)
-                        if base:
-                            decl.base = TypeRef(base)
-                        else:
-                            raise Exception()
-                    else:
-                        raise Exception()
-
-            elif child.kind == cindex.CursorKind.CONSTRUCTOR:
-                pass
-
-            elif child.kind == cindex.CursorKind.DESTRUCTOR:
-                pass
+        for child in self.cursor_cache.get_children(c):
+            try:
+                handler = STRUCT_CHILD_HANDLERS.get(child.kind)
+                if handler:
+                    task = handler(self, decl, child)
+                    if task:
+                        yield task
+                elif child.kind not in IGNORE_STRUCT_CHILD_KINDS:
+                    tokens = self.token_cache.get_spellings(child)
+                    raise Exception(f'{child.kind}: {tokens}')
+            except Exception as ex:
+                if not self.keep_going:
+                    raise
+                # 残りの field, method は続ける
+                self.add_failure(child, ex)
 
-            elif child.kind == cindex.CursorKind.CXX_METHOD:
-                # children = [x for x in child.get_children()]
-                function = self.parse_function(child)
-                decl.methods.append(function)
+        self.parser.pop_namespace()
+        return decl
 
-            elif child.kind == cindex.CursorKind.CONVERSION_FUNCTION:
-                pass
+    def parse_struct_field(self, decl: Struct, c: cindex.Cursor) -> Task[None]:
+        field = yield self.parse_field(c)
+        decl.fields.append(field)
 
-            elif child.kind == cindex.CursorKind.UNEXPOSED_ATTR:
-                # __declspec(uuid(x))
-                tokens = [t for t in child.get_tokens()]
-                # c: cindex.Cursor = child
-                # http://clang-developers.42468.n3.nabble.com/source-code-string-from-SourceRange-td4032732.html
-
-                value = extract(child)
-                if value.startswith(d3d11_key):
-                    decl.iid = uuid.UUID(value[len(d3d11_key):-2])
-                elif value.startswith(d2d1_key):
-                    decl.iid = uuid.UUID(value[len(d2d1_key):-2])
-                elif value.startswith(dwrite_key):
-                    decl.iid = uuid.UUID(value[len(dwrite_key):-2])
+    def parse_struct_union(self, decl: Struct, c: cindex.Cursor) -> Task[None]:
+        if c.spelling:
+            # inner type
+            yield self._parse_cursor(c)
+            return
+        # anonymous union
+        union = yield self.parse_struct(c, StructType.UNION)
+        field = Field(TypeRef(union, c.type.is_const_qualified()))
+        decl.fields.append(field)
+
+    def parse_struct_inner_type(self, decl: Struct,
+                                c: cindex.Cursor) -> Task[None]:
+        yield self._parse_cursor(c)
+
+    def parse_struct_base(self, decl: Struct, c: cindex.Cursor) -> Task[None]:
+        # class some: public base_class
+        for x in self.cursor_cache.get_children(c):
+            if x.kind == cindex.CursorKind.TYPE_REF:
+                base = yield self.get_or_parse(x.referenced)
+                if base:
+                    decl.base = TypeRef(base)
                 else:
-                    print(value)
-
+                    raise Exception()
             else:
-                tokens = [t.spelling for t in child.get_tokens()]
                 raise Exception()
 
-        self.parser.pop_namespace()
-        return decl
+    def parse_struct_method(self, decl: Struct,
+                            c: cindex.Cursor) -> Task[None]:
+        function = yield self.parse_function(c)
+        decl.methods.append(function)
+
+    def parse_struct_attr(self, decl: Struct, c: cindex.Cursor) -> None:
+        # __declspec(uuid(x))
+        # http://clang-developers.42468.n3.nabble.com/source-code-string-from-SourceRange-td4032732.html
+        value = extract(c, self.source_reader)
+        if value.startswith(d3d11_key):
+            decl.iid = uuid.UUID(value[len(d3d11_key):-2])
+        elif value.startswith(d2d1_key):
+            decl.iid = uuid.UUID(value[len(d2d1_key):-2])
+        elif value.startswith(dwrite_key):
+            decl.iid = uuid.UUID(value[len(dwrite_key):-2])
+        else:
+            print(value)
+
+
+CursorHandler = Callable[[DeclMap, cindex.Cursor], Optional[Task[None]]]
+
+# namespace レベルの cursor
+CURSOR_HANDLERS: Dict[cindex.CursorKind, CursorHandler] = {
+    cindex.CursorKind.TRANSLATION_UNIT:
+    DeclMap.parse_translation_unit,
+    cindex.CursorKind.NAMESPACE:
+    DeclMap.parse_namespace,
+    cindex.CursorKind.UNEXPOSED_DECL:
+    DeclMap.parse_unexposed_decl,
+    cindex.CursorKind.UNION_DECL:
+    lambda self, c: self.parse_struct(c, StructType.UNION),
+    cindex.CursorKind.STRUCT_DECL:
+    lambda self, c: self.parse_struct(c, StructType.STRUCT),
+    cindex.CursorKind.CLASS_DECL:
+    lambda self, c: self.parse_struct(c, StructType.CLASS),
+    cindex.CursorKind.TYPEDEF_DECL:
+    DeclMap.parse_typedef,
+    cindex.CursorKind.FUNCTION_DECL:
+    DeclMap.parse_function_decl,
+    cindex.CursorKind.ENUM_DECL:
+    DeclMap.parse_enum_decl,
+    cindex.CursorKind.MACRO_DEFINITION:
+    DeclMap.parse_macro_definition,
+}
+
+if hasattr(cindex.CursorKind, 'LINKAGE_SPEC'):
+    # 新しい libclang では extern "C" {} が UNEXPOSED_DECL ではない
+    CURSOR_HANDLERS[
+        cindex.CursorKind.LINKAGE_SPEC] = DeclMap.parse_unexposed_decl
+
+IGNORE_CURSOR_KINDS: Set[cindex.CursorKind] = {
+    # static variable
+    cindex.CursorKind.VAR_DECL,
+    # enum_type hoge = 0;
+    cindex.CursorKind.ENUM_CONSTANT_DECL,
+    cindex.CursorKind.CXX_UNARY_EXPR,
+    cindex.CursorKind.UNEXPOSED_EXPR,
+    cindex.CursorKind.UNEXPOSED_ATTR,
+    cindex.CursorKind.USING_DECLARATION,
+    cindex.CursorKind.FUNCTION_TEMPLATE,
+    # parse_struct(c)
+    cindex.CursorKind.CLASS_TEMPLATE,
+    cindex.CursorKind.CLASS_TEMPLATE_PARTIAL_SPECIALIZATION,
+    cindex.CursorKind.MACRO_INSTANTIATION,
+    cindex.CursorKind.INCLUSION_DIRECTIVE,
+    cindex.CursorKind.STATIC_ASSERT,
+}
+
+# parse できなかったときに add_placeholder する。get_or_parse で引かれる
+PLACEHOLDER_CURSOR_KINDS: Set[cindex.CursorKind] = {
+    cindex.CursorKind.STRUCT_DECL,
+    cindex.CursorKind.UNION_DECL,
+    cindex.CursorKind.CLASS_DECL,
+    cindex.CursorKind.TYPEDEF_DECL,
+    cindex.CursorKind.ENUM_DECL,
+}
+
+StructChildHandler = Callable[[DeclMap, Struct, cindex.Cursor],
+                              Optional[Task[None]]]
+
+# struct の子供
+STRUCT_CHILD_HANDLERS: Dict[cindex.CursorKind, StructChildHandler] = {
+    cindex.CursorKind.FIELD_DECL: DeclMap.parse_struct_field,
+    cindex.CursorKind.UNION_DECL: DeclMap.parse_struct_union,
+    # inner type
+    cindex.CursorKind.STRUCT_DECL: DeclMap.parse_struct_inner_type,
+    cindex.CursorKind.TYPEDEF_DECL: DeclMap.parse_struct_inner_type,
+    cindex.CursorKind.FUNCTION_TEMPLATE: DeclMap.parse_struct_inner_type,
+    cindex.CursorKind.CXX_BASE_SPECIFIER: DeclMap.parse_struct_base,
+    cindex.CursorKind.CXX_METHOD: DeclMap.parse_struct_method,
+    cindex.CursorKind.UNEXPOSED_ATTR: DeclMap.parse_struct_attr,
+}
+
+IGNORE_STRUCT_CHILD_KINDS: Set[cindex.CursorKind] = {
+    # public, private...
+    cindex.CursorKind.CXX_ACCESS_SPEC_DECL,
+    # some_template<sizeof(char)>
+    cindex.CursorKind.CXX_UNARY_EXPR,
+    # some_template<1>
+    cindex.CursorKind.UNEXPOSED_EXPR,
+    # __declspec(align(x))
+    # use newer llvm(9) and latest cindex
+    # https://github.com/llvm-mirror/clang/blob/master/bindings/python/clang/cindex.py
+    cindex.CursorKind.ALIGNED_ATTR,
+    cindex.CursorKind.CONSTRUCTOR,
+    cindex.CursorKind.DESTRUCTOR,
+    cindex.CursorKind.CONVERSION_FUNCTION,
+}
@@ -0,0 +1,25 @@
+'''
+keep_going で parse を続けたときに、parse できなかった宣言を記録する
+'''
+import pathlib
+from typing import List, NamedTuple, Optional
+
+
+class ParseFailure(NamedTuple):
+    '''
+    kind: CursorKind の名前(FIELD_DECL など)
+    name: cursor の spelling
+    '''
+    kind: str
+    name: str
+    file: Optional[pathlib.Path]
+    line: int
+    message: str
+
+
+def format_failures(failures: List[ParseFailure]) -> str:
+    lines = []
+    for x in failures:
+        location = f'{x.file}:{x.line}' if x.file else '-'
+        lines.append(f'{location}: {x.kind} {x.name}: {x.message}')
+    return '\n'.join(lines)
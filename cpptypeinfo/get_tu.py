@@ -1,64 +1,151 @@
 import pathlib
-from typing import List, Optional
+from typing import List, Optional, Union, Dict
 import tempfile
 import os
 import contextlib
 from clang import cindex
+from .tu_cache import TUCache, hash_bytes, get_tmp_suffix
+from .include_graph import IncludeGraph
+from .session import ParseSession, DEFAULT_CLANG_DLL  # noqa
+from .profile import ParseProfile, get_profile
 
-DEFAULT_CLANG_DLL = pathlib.Path("C:/Program Files/LLVM/bin/libclang.dll")
-SET_DLL = False
+
+SEVERITY_NAMES = {
+    cindex.Diagnostic.Ignored: 'ignored',
+    cindex.Diagnostic.Note: 'note',
+    cindex.Diagnostic.Warning: 'warning',
+    cindex.Diagnostic.Error: 'error',
+    cindex.Diagnostic.Fatal: 'fatal',
+}
+
+
+class DiagnosticError(Exception):
+    '''
+    error, fatal の diagnostics があった
+    '''
+    def __init__(self, diagnostics: List[cindex.Diagnostic]) -> None:
+        super().__init__(summarize_diagnostics(diagnostics))
+        self.diagnostics = diagnostics
+
+
+def summarize_diagnostics(diagnostics: List[cindex.Diagnostic],
+                          limit: int = 5) -> str:
+    '''
+    ファイルごとにまとめる
+    '''
+    file_map: Dict[str, List[cindex.Diagnostic]] = {}
+    for d in diagnostics:
+        name = d.location.file.name if d.location.file else '<unknown>'
+        file_map.setdefault(name, []).append(d)
+
+    lines = [f'{len(diagnostics)} diagnostics in {len(file_map)} files']
+    for name, values in file_map.items():
+        lines.append(f'{name}: {len(values)}')
+        for d in values[:limit]:
+            lines.append(f'  {d.location.line}:{d.location.column}: '
+                         f'{SEVERITY_NAMES.get(d.severity, d.severity)}: '
+                         f'{d.spelling}')
+        if len(values) > limit:
+            lines.append(f'  ...')
+    return '\n'.join(lines)
+
+
+def check_diagnostics(tu: cindex.TranslationUnit,
+                      strict: bool = True) -> List[cindex.Diagnostic]:
+    '''
+    error 以上の diagnostics を返す。
+    strict なら AST をたどる前に DiagnosticError で中断する。
+    '''
+    errors = [
+        d for d in tu.diagnostics if d.severity >= cindex.Diagnostic.Error
+    ]
+    if errors and strict:
+        raise DiagnosticError(errors)
+    return errors
 
 
 def get_tu(path: pathlib.Path,
            include_path_list: List[pathlib.Path] = None,
            cpp_flags: List[str] = None,
            use_macro: bool = False,
-           dll: Optional[pathlib.Path] = None) -> cindex.TranslationUnit:
+           dll: Optional[pathlib.Path] = None,
+           cache_dir: Optional[pathlib.Path] = None,
+           pch: Optional[pathlib.Path] = None,
+           language: str = 'c++',
+           session: Optional[ParseSession] = None,
+           profile: Union[str, ParseProfile, None] = None,
+           source: Optional[str] = None,
+           strict: Optional[bool] = None) -> cindex.TranslationUnit:
     '''
     parse cpp source
-    '''
-    global SET_DLL
 
-    if not path.exists():
+    cache_dir を指定すると parse 結果を保存して、
+    header が変更されていなければ次回はそれを読み込む。
+
+    pch を指定すると -include-pch する。
+    pch を作るときは language='c++-header' にする。
+
+    session を省略すると、この呼び出しだけの session を作る。
+
+    profile で TranslationUnit の option を選ぶ。
+    use_macro は profile に加えて PARSE_DETAILED_PROCESSING_RECORD を付ける。
+
+    source を指定すると path のファイルを作らずに unsaved_files で渡す。
+    ファイルが無いと保存した ast を読めないので cache は使わない。
+
+    strict(省略時は session.strict)なら error があると DiagnosticError。
+    '''
+    if source is None and not path.exists():
         raise FileNotFoundError(str(path))
 
-    if not dll and DEFAULT_CLANG_DLL.exists():
-        dll = DEFAULT_CLANG_DLL
-    if not SET_DLL and dll:
-        cindex.Config.set_library_file(str(dll))
-        SET_DLL = True
-
-    index = cindex.Index.create()
-
-    kw = {'options': 0}
-    # kw['options'] |= cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
-    # macro
-    # kw['options'] |= cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD
-
-    cpp_args = [
-        '-x',
-        'c++',
-        '-target',
-        'x86_64-windows-msvc',
-        # '-fms-extensions',
-        # 'x86_64-unknown-windows-win32',
-        '-fms-compatibility-version=18',
-        '-fdeclspec',
-        '-fms-compatibility',
-        # '-fdelayed-template-parsing'
-        # '-fblocks',
-        '-D_MSC_VER=1923'
-    ]
-    if include_path_list is not None:
-        for i in include_path_list:
-            value = f'-I{str(i)}'
-            if value not in cpp_args:
-                cpp_args.append(value)
-    if cpp_flags:
-        for f in cpp_flags:
-            cpp_args.append(f)
+    if not session:
+        session = ParseSession(dll)
+    if not cache_dir:
+        cache_dir = session.cache_dir
+    index = session.index
+
+    kw = {'options': get_profile(profile).options}
+    if use_macro:
+        kw['options'] |= cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD
+
+    cpp_args = session.get_cpp_args(language, include_path_list, cpp_flags)
+    depends: List[pathlib.Path] = []
+    if pch:
+        cpp_args += ['-include-pch', str(pch)]
+        # pch が作り直されたら無効にする
+        depends.append(pch.with_suffix('.json'))
+
+    if strict is None:
+        strict = session.strict
+
+    if source is not None:
+        tu = index.parse(str(path),
+                         cpp_args,
+                         unsaved_files=[(str(path), source)],
+                         **kw)
+        check_diagnostics(tu, strict)
+        return tu
+
+    if not cache_dir:
+        tu = index.parse(str(path), cpp_args, **kw)
+        check_diagnostics(tu, strict)
+        return tu
 
-    return index.parse(str(path), cpp_args, **kw)
+    cache = TUCache(cache_dir)
+    src = path.read_bytes()
+    key = cache.get_key(path, src, cpp_args, kw['options'])
+    tu = cache.load(index, key)
+    if tu:
+        # is_valid で hash を確かめたので、manifest の graph を使う
+        tu.include_graph = cache.load_graph(key)
+        check_diagnostics(tu, strict)
+        return tu
+    tu = index.parse(str(path), cpp_args, **kw)
+    check_diagnostics(tu, strict)
+    graph = IncludeGraph.from_tu(tu)
+    cache.store(tu, key, src, depends, graph)
+    tu.include_graph = graph
+    return tu
 
 
 @contextlib.contextmanager
@@ -73,6 +160,31 @@ def tmp_from_source(src):
         os.unlink(tmp_name)
 
 
-def get_tu_from_source(src: str) -> cindex.TranslationUnit:
-    with tmp_from_source(src) as path:
-        return get_tu(path)
+def get_source_path(src: str) -> pathlib.Path:
+    '''
+    unsaved_files 用の名前。
+    内容が違えば名前も違うので、session の cache と衝突しない。
+    '''
+    return pathlib.Path(
+        tempfile.gettempdir()) / f'tmpheader_{hash_bytes(src.encode("utf-8"))}.h'
+
+
+def persist_source(src, cache_dir: pathlib.Path) -> pathlib.Path:
+    '''
+    TranslationUnit.save した ast は main file が無いと読み込めないので、
+    cache_dir に内容の hash を名前にして残す
+    '''
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / f'tmpheader_{hash_bytes(src.encode("utf-8"))}.h'
+    if not path.exists():
+        tmp = path.with_name(f'{path.name}.{get_tmp_suffix()}')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(src)
+        os.replace(tmp, path)
+    return path
+
+
+def get_tu_from_source(src: str,
+                       session: Optional[ParseSession] = None
+                       ) -> cindex.TranslationUnit:
+    return get_tu(get_source_path(src), session=session, source=src)
@@ -0,0 +1,182 @@
+'''
+TranslationUnit が読み込んだファイルの include 関係
+'''
+import pathlib
+import hashlib
+from typing import Dict, List, Set, Optional, Any, Tuple
+try:
+    from clang import cindex
+except ImportError:
+    # snapshot を読むだけなら libclang は要らない
+    pass
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def hash_file(path: pathlib.Path) -> Optional[str]:
+    try:
+        return hash_bytes(path.read_bytes())
+    except OSError:
+        return None
+
+
+def get_stamp(path: pathlib.Path) -> Optional[Tuple[int, int]]:
+    '''
+    (mtime, size)。読まずに変更を調べる
+    '''
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class IncludeGraph:
+    '''
+    edges: include したファイル => include されたファイル
+    stamps: parse したときの (mtime, size)(unsaved file は無し)
+    hashes: ファイルの内容の sha1。
+            SDK では読むだけで重いので、必要になったときに hash_files で作る。
+            stamp が parse したときと違うファイルは hash しない
+    '''
+    def __init__(self, main: Optional[pathlib.Path] = None) -> None:
+        self.main = main
+        self.edges: Dict[pathlib.Path, List[pathlib.Path]] = {}
+        self.stamps: Dict[pathlib.Path, Tuple[int, int]] = {}
+        self.hashes: Dict[pathlib.Path, str] = {}
+
+    @staticmethod
+    def from_tu(tu: 'cindex.TranslationUnit') -> 'IncludeGraph':
+        graph = IncludeGraph(pathlib.Path(tu.spelling))
+        graph.add_file(graph.main)
+        for include in tu.get_includes():
+            src = pathlib.Path(include.source.name)
+            dst = pathlib.Path(include.include.name)
+            graph.add_file(src)
+            graph.add_file(dst)
+            if dst not in graph.edges[src]:
+                graph.edges[src].append(dst)
+        return graph
+
+    def add_file(self, path: pathlib.Path) -> None:
+        if path in self.edges:
+            return
+        self.edges[path] = []
+        stamp = get_stamp(path)
+        if stamp:
+            self.stamps[path] = stamp
+
+    def hash_files(self) -> None:
+        '''
+        parse してから変わっていないファイルを hash する
+        '''
+        for path, stamp in self.stamps.items():
+            if path in self.hashes or get_stamp(path) != stamp:
+                continue
+            digest = hash_file(path)
+            if digest:
+                self.hashes[path] = digest
+
+    def is_changed(self, path: pathlib.Path) -> bool:
+        stamp = self.stamps.get(path)
+        if stamp and get_stamp(path) == stamp:
+            return False
+        digest = self.hashes.get(path)
+        if digest:
+            # touch しただけなら変わっていない
+            return hash_file(path) != digest
+        # parse したときの内容が分からない
+        return stamp is not None
+
+    def files(self) -> List[pathlib.Path]:
+        return list(self.edges.keys())
+
+    def includes_of(self, path: pathlib.Path) -> Set[pathlib.Path]:
+        '''
+        path が(間接的に) include するファイル
+        '''
+        found: Set[pathlib.Path] = set()
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            for x in self.edges.get(current, []):
+                if x not in found:
+                    found.add(x)
+                    stack.append(x)
+        return found
+
+    def includers_of(self, path: pathlib.Path) -> Set[pathlib.Path]:
+        '''
+        path を(間接的に) include するファイル
+        '''
+        reverse: Dict[pathlib.Path, List[pathlib.Path]] = {}
+        for src, dsts in self.edges.items():
+            for dst in dsts:
+                reverse.setdefault(dst, []).append(src)
+        found: Set[pathlib.Path] = set()
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            for x in reverse.get(current, []):
+                if x not in found:
+                    found.add(x)
+                    stack.append(x)
+        return found
+
+    def merge(self, other: 'IncludeGraph') -> None:
+        '''
+        別の TranslationUnit の include 関係を足す
+        '''
+        for src, dsts in other.edges.items():
+            edges = self.edges.setdefault(src, [])
+            for dst in dsts:
+                if dst not in edges:
+                    edges.append(dst)
+        for path, stamp in other.stamps.items():
+            self.stamps.setdefault(path, stamp)
+        for path, digest in other.hashes.items():
+            self.hashes.setdefault(path, digest)
+
+    def get_changed(self) -> List[pathlib.Path]:
+        '''
+        parse した後に内容が変わったファイル
+        '''
+        return [path for path in self.edges if self.is_changed(path)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        self.hash_files()
+        return {
+            'main': str(self.main) if self.main else None,
+            'edges': {
+                str(k): [str(x) for x in v]
+                for k, v in self.edges.items()
+            },
+            'stamps': {str(k): list(v)
+                       for k, v in self.stamps.items()},
+            'hashes': {str(k): v
+                       for k, v in self.hashes.items()},
+        }
+
+    @staticmethod
+    def from_dict(src: Dict[str, Any]) -> 'IncludeGraph':
+        main = src.get('main')
+        graph = IncludeGraph(pathlib.Path(main) if main else None)
+        for k, v in src['edges'].items():
+            graph.edges[pathlib.Path(k)] = [pathlib.Path(x) for x in v]
+        for k, v in src.get('stamps', {}).items():
+            graph.stamps[pathlib.Path(k)] = (v[0], v[1])
+        for k, v in src['hashes'].items():
+            graph.hashes[pathlib.Path(k)] = v
+        return graph
+
+
+def get_include_graph(tu: 'cindex.TranslationUnit') -> IncludeGraph:
+    '''
+    get_tu が cache から読んだ graph があれば、それを使う
+    '''
+    graph = getattr(tu, 'include_graph', None)
+    if graph:
+        return graph
+    return IncludeGraph.from_tu(tu)
@@ -283,19 +283,23 @@ def dlang_com_interface(d: TextIO, node: Struct) -> bool:
     return True
 
 
-def generate(parser: cpptypeinfo.TypeParser, decl_map: cpptypeinfo.DeclMap,
-             headers: List[pathlib.Path], dir: pathlib.Path,
-             module_list: List[str]) -> None:
+def generate(parser: cpptypeinfo.TypeParser,
+             decl_map: 'cpptypeinfo.DeclMap', headers: List[pathlib.Path],
+             dir: pathlib.Path,
+             module_list: List[str],
+             files: Optional[Set[pathlib.Path]] = None) -> None:
     '''
     write to 
 
     dir/module_name0/module_name1/.../module_name.d
 
     すべての com interface と __declspec(dllimport) な関数とそれの参照する型を出力する
+
+    files を指定した場合は、そのファイルに対応する .d だけを書き直す
     '''
 
     # clear folder
-    if dir.exists():
+    if files is None and dir.exists():
         print(f'clear {dir}')
         shutil.rmtree(dir)
         time.sleep(0.1)
@@ -364,30 +368,29 @@ def generate(parser: cpptypeinfo.TypeParser, decl_map: cpptypeinfo.DeclMap,
                         f.typeref.ref.typeref.ref, Struct):
                     register_struct(f.typeref.ref.typeref.ref, used)
 
-    for k, v in decl_map.decl_map.items():
-        if v.file in headers:
-            if isinstance(v, Struct):
-                register_struct(v, [])
-
-            elif isinstance(v, Enum):
-                register_enum_struct(v)
-
-            elif isinstance(v, Function):
-                # dll export
-                # if v.dll_export:
-                if True:
-                    # print(f'{v.file}: {v.get_exportname()}')
-                    source = get_or_create_source_map(v.file)
-                    source.add_export_function(v)
-                    # params
-                    for p in v.params:
-                        path = register_enum_struct(p.typeref.ref)
-                        if path:
-                            source.add_import(path)
-                    # return
-                    path = register_enum_struct(v.result.ref)
+    for v in decl_map.decls_in(*headers):
+        if isinstance(v, Struct):
+            register_struct(v, [])
+
+        elif isinstance(v, Enum):
+            register_enum_struct(v)
+
+        elif isinstance(v, Function):
+            # dll export
+            # if v.dll_export:
+            if True:
+                # print(f'{v.file}: {v.get_exportname()}')
+                source = get_or_create_source_map(v.file)
+                source.add_export_function(v)
+                # params
+                for p in v.params:
+                    path = register_enum_struct(p.typeref.ref)
                     if path:
                         source.add_import(path)
+                # return
+                path = register_enum_struct(v.result.ref)
+                if path:
+                    source.add_import(path)
 
     for m in decl_map.macro_definitions:
         if m.name == 'D3D11_SDK_VERSION':
@@ -403,6 +406,8 @@ def generate(parser: cpptypeinfo.TypeParser, decl_map: cpptypeinfo.DeclMap,
 
     # write each DLangSource
     for k, v in source_map.items():
+        if files is not None and k not in files:
+            continue
         v.generate(dir, module_name)
 
     # package.d
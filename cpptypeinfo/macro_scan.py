@@ -0,0 +1,120 @@
+'''
+PARSE_DETAILED_PROCESSING_RECORD を使わずに、
+指定した header の token から #define の定数を集める
+'''
+import bisect
+import pathlib
+from typing import List, Optional, Iterable, Set, Tuple
+from clang import cindex
+from .basictype import MacroDefinition
+from .token_table import TokenCache
+from .session import SourceReader
+
+# 定数ではない別名
+#define IID_ID3DBlob IID_ID3D10Blob
+#define INTERFACE ID3DInclude
+#define D2D1_INVALID_TAG ULONGLONG_MAX
+#define D2D1FORCEINLINE FORCEINLINE
+IGNORE_MACROS = [
+    ['IID_ID3DBlob', 'IID_ID3D10Blob'],
+    ['INTERFACE', 'ID3DInclude'],
+    ['D2D1_INVALID_TAG', 'ULONGLONG_MAX'],
+    ['D2D1FORCEINLINE', 'FORCEINLINE'],
+]
+
+
+def is_constant(tokens: List[str]) -> bool:
+    '''
+    tokens: name, value...
+    '''
+    if len(tokens) == 1:
+        # ex. #define __header__
+        return False
+    if tokens in IGNORE_MACROS:
+        return False
+    return True
+
+
+def get_line_starts(reader: SourceReader, path: pathlib.Path
+                    ) -> Tuple[List[int], List[int]]:
+    '''
+    行と、\\ で続く行をつなげた論理行の先頭の offset。
+    ファイルを copy せずに map したまま改行を探す。
+    '''
+    newlines = reader.find_all(path, b'\n')
+    continued = {x + 1 for x in reader.find_all(path, b'\\\n')}
+    continued |= {x + 2 for x in reader.find_all(path, b'\\\r\n')}
+    lines = [0] + [x + 1 for x in newlines]
+    logical_lines = [0] + [x + 1 for x in newlines if x not in continued]
+    return lines, logical_lines
+
+
+def scan_file(tu: cindex.TranslationUnit,
+              path: pathlib.Path,
+              token_cache: TokenCache,
+              names: Optional[Set[str]] = None) -> List[MacroDefinition]:
+    reader = token_cache.source_reader
+    try:
+        if reader.find(path, b'define') < 0:
+            return []
+    except OSError:
+        return []
+    table = token_cache.get_table(tu, path)
+    if not table:
+        return []
+    lines, logical_lines = get_line_starts(reader, path)
+
+    def get_logical_line(i: int) -> int:
+        return bisect.bisect_right(logical_lines, table.offsets[i])
+
+    macros: List[MacroDefinition] = []
+    count = len(table)
+    i = 0
+    while i + 2 < count:
+        if table.get_spelling(i) != '#' or table.get_spelling(
+                i + 1) != 'define':
+            i += 1
+            continue
+        line = get_logical_line(i)
+        if i > 0 and get_logical_line(i - 1) == line:
+            # 行の先頭ではない
+            i += 1
+            continue
+        end = i + 2
+        while end < count and get_logical_line(end) == line:
+            end += 1
+        name = table.get_spelling(i + 2)
+        next_offset = table.offsets[i + 2] + len(name)
+        is_function = (i + 3 < end and table.offsets[i + 3] == next_offset
+                       and table.get_spelling(i + 3) == '(')
+        if not is_function and (names is None or name in names):
+            tokens = [table.get_spelling(x) for x in range(i + 2, end)]
+            if is_constant(tokens):
+                macros.append(
+                    MacroDefinition(
+                        name, ' '.join(tokens[1:]), path,
+                        bisect.bisect_right(lines, table.offsets[i + 2])))
+        i = end
+    return macros
+
+
+def scan_macros(tu: cindex.TranslationUnit,
+                paths: Iterable[pathlib.Path],
+                token_cache: TokenCache,
+                names: Optional[Iterable[str]] = None) -> List[MacroDefinition]:
+    '''
+    paths の #define を token から集める。names があればその名前だけ。
+
+    preprocess しないので #if で無効な #define も含む。
+    同じ名前が複数あれば最初のものを使う。
+    '''
+    name_set = set(names) if names is not None else None
+    found: Set[str] = set()
+    macros: List[MacroDefinition] = []
+    for path in paths:
+        for macro in scan_file(tu, path, token_cache, name_set):
+            if macro.name in found:
+                continue
+            found.add(macro.name)
+            macros.append(macro)
+    return macros
@@ -0,0 +1,130 @@
+'''
+同じ header を複数の設定(define, target)で parse して比較する
+'''
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple, Dict, Optional, Union
+from .basictype import Type
+from .usertype import UserType, Struct, Enum, Function
+from .typeparser import TypeParser
+from .decl_map import DeclMap
+from .session import ParseSession
+from .profile import ParseProfile
+from .pch import PchPrefix
+from .cursor import parse_files
+
+
+class ParseConfig(NamedTuple):
+    '''
+    target を省略すると session の target
+    '''
+    name: str
+    cpp_flags: List[str] = []
+    target: Optional[str] = None
+
+    @staticmethod
+    def parse(src: str) -> 'ParseConfig':
+        '''
+        NAME[@TARGET]=FLAG,FLAG...
+        '''
+        head, _, flags = src.partition('=')
+        name, _, target = head.partition('@')
+        return ParseConfig(name, [x for x in flags.split(',') if x], target
+                           or None)
+
+
+def parse_matrix(*paths: pathlib.Path,
+                 configs: List[ParseConfig],
+                 includes=None,
+                 pch: Optional[PchPrefix] = None,
+                 session: Optional[ParseSession] = None,
+                 profile: Union[str, ParseProfile, None] = None,
+                 max_workers: Optional[int] = None) -> Dict[str, DeclMap]:
+    '''
+    configs をそれぞれ別の thread で parse する。
+    libclang の parse 中は GIL が外れる。
+
+    session の cache(TranslationUnit, pch, source) を共有する。
+    '''
+    if not session:
+        session = ParseSession()
+
+    def parse(config: ParseConfig) -> DeclMap:
+        derived = session.derive(config.target)
+        return parse_files(TypeParser(),
+                           *paths,
+                           includes=includes,
+                           cpp_flags=list(config.cpp_flags),
+                           pch=pch,
+                           session=derived,
+                           profile=profile)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        decl_maps = list(executor.map(parse, configs))
+    return {
+        config.name: decl_map
+        for config, decl_map in zip(configs, decl_maps)
+    }
+
+
+def get_name(usertype: Type) -> str:
+    if isinstance(usertype, Function):
+        return usertype.name
+    return getattr(usertype, 'type_name', '')
+
+
+def get_signature(usertype: UserType) -> str:
+    '''
+    設定ごとの違いを比較するための文字列
+    '''
+    if isinstance(usertype, Struct):
+        fields = ' '.join(f'{f.typeref} {f.name}@{f.offset};'
+                          for f in usertype.fields)
+        return f'{usertype.struct_type.value} {usertype.type_name}{{{fields}}}'
+    if isinstance(usertype, Enum):
+        values = ' '.join(f'{v.name}={v.value},' for v in usertype.values)
+        return f'enum {usertype.type_name}{{{values}}}'
+    # typedef, function
+    return str(usertype)
+
+
+class DeclDiff(NamedTuple):
+    '''
+    signatures: config name => signature(宣言が無い場合は None)
+    '''
+    name: str
+    signatures: Dict[str, Optional[str]]
+
+
+def diff_decl_maps(decl_maps: Dict[str, DeclMap]) -> List[DeclDiff]:
+    '''
+    設定によって違う宣言を返す
+    '''
+    table: Dict[str, Dict[str, str]] = {}
+    for config, decl_map in decl_maps.items():
+        for v in decl_map.decl_map.values():
+            name = get_name(v)
+            if not name:
+                continue
+            table.setdefault(name, {})[config] = get_signature(v)
+
+    diffs: List[DeclDiff] = []
+    for name, signatures in table.items():
+        values = [signatures.get(config) for config in decl_maps.keys()]
+        if all(x == values[0] for x in values):
+            continue
+        diffs.append(
+            DeclDiff(name, {
+                config: signatures.get(config)
+                for config in decl_maps.keys()
+            }))
+    return diffs
+
+
+def format_diffs(diffs: List[DeclDiff]) -> str:
+    lines = []
+    for diff in diffs:
+        lines.append(diff.name)
+        for config, signature in diff.signatures.items():
+            lines.append(f'  {config}: {signature or "(none)"}')
+    return '\n'.join(lines)
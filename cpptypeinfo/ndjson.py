@@ -0,0 +1,151 @@
+'''
+宣言を一行に一つの JSON(NDJSON)で書き出す
+
+{"id": "c:@S@Desc", "kind": "struct", "name": "Desc", "fields": [...]}
+
+他の宣言は id で参照する。参照先が後の行に出てくることもある。
+'''
+import json
+from typing import Any, Dict, Optional, Set, TextIO
+from .basictype import Type, TypeRef, MacroDefinition
+from .usertype import (UserType, Typedef, Pointer, Array, Struct, Function,
+                       Enum)
+from .decl_index import DeclIndex
+from .symbol_db import get_kind, get_decl_name
+
+
+class NdjsonWriter:
+    '''
+    on_decl を DeclMap.on_decl にすると、parse が終わった宣言から順に書き出す
+    '''
+    def __init__(self, out: TextIO) -> None:
+        self.out = out
+        self.index = DeclIndex()
+        # 書き出した宣言の id()
+        self.written: Set[int] = set()
+
+    def get_id(self, usertype: Any) -> Optional[str]:
+        key = self.index.get_key(usertype)
+        if key:
+            return key
+        i = self.index.positions.get(id(usertype))
+        if i is None:
+            return None
+        return f'#{i}'
+
+    def type_to_dict(self, t: Any) -> Dict[str, Any]:
+        if isinstance(t, TypeRef):
+            d = self.type_to_dict(t.ref)
+            if t.is_const:
+                d['const'] = True
+            return d
+        decl_id = self.get_id(t)
+        if decl_id and isinstance(t, (Struct, Enum, Typedef)):
+            return {'ref': decl_id}
+        if isinstance(t, Array):
+            return {'array': self.type_to_dict(t.typeref), 'length': t.length}
+        if isinstance(t, Pointer):
+            return {'pointer': self.type_to_dict(t.typeref)}
+        if isinstance(t, Function):
+            return {'function': self.function_to_dict(t)}
+        if isinstance(t, (Struct, Enum, Typedef)):
+            # 無名で登録されていない
+            return {'name': get_decl_name(t), 'kind': get_kind(t)}
+        if isinstance(t, Type):
+            return {'primitive': str(t)}
+        raise Exception(f'unknown type: {t}')
+
+    def function_to_dict(self, function: Function) -> Dict[str, Any]:
+        return {
+            'result':
+            self.type_to_dict(function.result),
+            'params': [{
+                'name': p.name,
+                'type': self.type_to_dict(p.typeref)
+            } for p in function.params],
+        }
+
+    def decl_to_dict(self, key: Optional[str],
+                     usertype: UserType) -> Dict[str, Any]:
+        d: Dict[str, Any] = {
+            'id': key or self.get_id(usertype),
+            'kind': get_kind(usertype),
+            'name': get_decl_name(usertype),
+        }
+        if usertype.file:
+            d['file'] = str(usertype.file)
+            d['line'] = usertype.line
+        if isinstance(usertype, Struct):
+            d['fields'] = [{
+                'name': f.name,
+                'type': self.type_to_dict(f.typeref),
+                'offset': f.offset
+            } for f in usertype.fields]
+            if usertype.base:
+                d['base'] = self.type_to_dict(usertype.base)
+            if usertype.iid:
+                d['iid'] = str(usertype.iid)
+            if usertype.methods:
+                d['methods'] = [
+                    dict(name=m.name, **self.function_to_dict(m))
+                    for m in usertype.methods
+                ]
+        elif isinstance(usertype, Enum):
+            d['values'] = [{
+                'name': v.name,
+                'value': v.value
+            } for v in usertype.values]
+        elif isinstance(usertype, Function):
+            d.update(self.function_to_dict(usertype))
+            d['mangled_name'] = usertype.mangled_name
+            d['extern_c'] = usertype.extern_c
+            d['dll_export'] = usertype.dll_export
+        elif isinstance(usertype, (Typedef, Pointer)):
+            d['type'] = self.type_to_dict(usertype.typeref)
+        else:
+            d['type'] = self.type_to_dict(usertype)
+        return d
+
+    def on_decl(self, index: DeclIndex, key: Optional[str],
+                usertype: UserType) -> None:
+        self.index = index
+        self.write(key, usertype)
+
+    def write(self, key: Optional[str], usertype: UserType) -> None:
+        if id(usertype) in self.written:
+            return
+        self.written.add(id(usertype))
+        self.out.write(
+            json.dumps(self.decl_to_dict(key, usertype), ensure_ascii=False))
+        self.out.write('\n')
+
+    def write_macro(self, macro: MacroDefinition) -> None:
+        self.out.write(
+            json.dumps(
+                {
+                    'kind': 'macro',
+                    'name': macro.name,
+                    'value': macro.value,
+                    'file': str(macro.file),
+                    'line': macro.line
+                },
+                ensure_ascii=False))
+        self.out.write('\n')
+
+    def write_rest(self, decl_map: Any) -> None:
+        '''
+        decl_map: DeclMap か Snapshot。
+        まだ書き出していない宣言と macro を書き出す
+        '''
+        self.index = decl_map.index
+        for key, v in zip(self.index.keys, self.index.decls):
+            self.write(key, v)
+        for m in decl_map.macro_definitions:
+            self.write_macro(m)
+
+
+def dump_ndjson(decl_map: Any, out: TextIO) -> None:
+    '''
+    decl_map: DeclMap か Snapshot
+    '''
+    NdjsonWriter(out).write_rest(decl_map)
@@ -0,0 +1,72 @@
+'''
+precompiled header
+
+毎回同じ順番で include される重い header(windows sdk など)を
+名前付きの prefix として宣言し、一度だけ .pch にする。
+'''
+import pathlib
+import tempfile
+from typing import List, NamedTuple, Optional
+from .tu_cache import TUCache
+from .get_tu import get_tu, persist_source
+from .session import ParseSession
+
+DEFAULT_PCH_DIR = pathlib.Path(tempfile.gettempdir()) / 'cpptypeinfo_pch'
+
+
+class PchPrefix(NamedTuple):
+    '''
+    name: pch file の名前
+    headers: include する順番に並べる
+    '''
+    name: str
+    headers: List[pathlib.Path]
+
+    def get_source(self) -> str:
+        return ''.join(f'#include <{x.name}>\n' for x in self.headers)
+
+    def get_cpp_flags(self, includes=None,
+                      cpp_flags: Optional[List[str]] = None) -> List[str]:
+        flags = list(cpp_flags) if cpp_flags else []
+        flags += [f'-I{x.parent}' for x in self.headers]
+        if includes:
+            flags += [f'-I{x}' for x in includes]
+        return flags
+
+    def build(self,
+              pch_dir: Optional[pathlib.Path] = None,
+              includes=None,
+              cpp_flags: Optional[List[str]] = None,
+              session: Optional[ParseSession] = None) -> pathlib.Path:
+        '''
+        pch を作る。
+        header が変更されていなければ前回の pch を返す。
+        '''
+        if not pch_dir:
+            pch_dir = DEFAULT_PCH_DIR
+        pch_dir = pch_dir / self.name
+        cache = TUCache(pch_dir, '.pch')
+        src = self.get_source()
+        path = persist_source(src, pch_dir)
+        if not session:
+            session = ParseSession()
+        cpp_args = self.get_cpp_flags(includes, cpp_flags)
+        # target, session の flag が違う pch は使えない
+        key = cache.get_key(path, src.encode('utf-8'),
+                            session.get_cpp_args('c++-header', None, cpp_args),
+                            0)
+        if not cache.is_valid(key):
+            tu = get_tu(path,
+                        cpp_flags=cpp_args,
+                        language='c++-header',
+                        session=session)
+            cache.store(tu, key, src.encode('utf-8'))
+            if not cache.is_valid(key):
+                raise Exception(f'fail to build pch: {self.name}')
+        return cache.get_path(key)
+
+    def strip(self, paths: List[pathlib.Path]) -> List[pathlib.Path]:
+        '''
+        pch に含まれる header を取り除く
+        '''
+        return [x for x in paths if x not in self.headers]
@@ -0,0 +1,49 @@
+from typing import NamedTuple, Dict, Union
+from clang import cindex
+
+
+class ParseProfile(NamedTuple):
+    '''
+    options: TranslationUnit の parse option。
+             PARSE_SKIP_FUNCTION_BODIES なら Function.has_body は常に False
+    use_macro: DeclMap が MACRO_DEFINITION を処理する
+    demand: 指定した header の宣言だけを parse し、
+            他のファイルの宣言は参照されたときに parse する
+    '''
+    name: str
+    options: int
+    use_macro: bool
+    demand: bool = False
+
+
+PARSE_PROFILES: Dict[str, ParseProfile] = {
+    x.name: x
+    for x in [
+        ParseProfile('default', 0, False),
+        # binding の生成には関数の body が要らない
+        ParseProfile('bindings-fast',
+                     cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES, False),
+        # SDK など巨大な header から、一部の header の binding を作る
+        ParseProfile('bindings-demand',
+                     cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES, False,
+                     True),
+        ParseProfile(
+            'with-macros',
+            cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
+            | cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD, True),
+        ParseProfile('full',
+                     cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD,
+                     True),
+    ]
+}
+
+
+def get_profile(profile: Union[str, ParseProfile, None]) -> ParseProfile:
+    if profile is None:
+        return PARSE_PROFILES['default']
+    if isinstance(profile, ParseProfile):
+        return profile
+    found = PARSE_PROFILES.get(profile)
+    if not found:
+        raise KeyError(f'unknown profile: {profile}')
+    return found
@@ -0,0 +1,237 @@
+import os
+import mmap
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Dict, Union
+from clang import cindex
+
+DEFAULT_CLANG_DLL = pathlib.Path("C:/Program Files/LLVM/bin/libclang.dll")
+
+DEFAULT_TARGET = 'x86_64-windows-msvc'
+
+DEFAULT_CPP_FLAGS = [
+    # '-fms-extensions',
+    # 'x86_64-unknown-windows-win32',
+    '-fms-compatibility-version=18',
+    '-fdeclspec',
+    '-fms-compatibility',
+    # '-fdelayed-template-parsing'
+    # '-fblocks',
+    '-D_MSC_VER=1923'
+]
+
+
+_library_lock = threading.Lock()
+
+
+def load_library(dll: Optional[pathlib.Path] = None) -> None:
+    '''
+    libclang は process で一度だけ読み込める
+    '''
+    with _library_lock:
+        if cindex.Config.loaded:
+            return
+        if not dll and DEFAULT_CLANG_DLL.exists():
+            dll = DEFAULT_CLANG_DLL
+        if dll:
+            cindex.Config.set_library_file(str(dll))
+        # load
+        cindex.conf.lib
+
+
+class SourceReader:
+    '''
+    ファイルを mmap して、必要な範囲だけ取り出す。
+    thread 間で共有できる。
+
+    map したままにするファイルの数(file descriptor)と大きさの合計を
+    max_files, max_bytes に制限し、古いものから閉じる。
+    set した unsaved file の内容は制限しない。
+    '''
+    def __init__(self,
+                 max_files: int = 64,
+                 max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._maps: 'OrderedDict[pathlib.Path, Union[mmap.mmap, bytes]]' = (
+            OrderedDict())
+        self._unsaved: Dict[pathlib.Path, bytes] = {}
+        self.mapped_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._maps) + len(self._unsaved)
+
+    def __contains__(self, path: pathlib.Path) -> bool:
+        return path in self._unsaved or path in self._maps
+
+    def _open(self, path: pathlib.Path) -> Union[mmap.mmap, bytes]:
+        data = self._unsaved.get(path)
+        if data is not None:
+            return data
+        m = self._maps.get(path)
+        if m is not None:
+            self._maps.move_to_end(path)
+            return m
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # 空のファイルは map できない
+                m = b''
+            else:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[path] = m
+        self.mapped_bytes += len(m)
+        self._evict()
+        return m
+
+    def _close(self, path: pathlib.Path) -> None:
+        m = self._maps.pop(path)
+        self.mapped_bytes -= len(m)
+        if isinstance(m, mmap.mmap):
+            m.close()
+
+    def _evict(self) -> None:
+        # 最後に開いたものは残す
+        while len(self._maps) > 1 and (len(self._maps) > self.max_files
+                                       or self.mapped_bytes > self.max_bytes):
+            self._close(next(iter(self._maps)))
+
+    def slice(self, path: pathlib.Path, start: int, end: int) -> bytes:
+        '''
+        [start, end) だけを copy する
+        '''
+        with self._lock:
+            return self._open(path)[start:end]
+
+    def find(self, path: pathlib.Path, sub: bytes, start: int = 0) -> int:
+        '''
+        copy せずに map したまま探す。無ければ -1
+        '''
+        with self._lock:
+            return self._open(path).find(sub, start)
+
+    def find_all(self, path: pathlib.Path, sub: bytes) -> List[int]:
+        with self._lock:
+            data = self._open(path)
+            found = []
+            pos = data.find(sub)
+            while pos >= 0:
+                found.append(pos)
+                pos = data.find(sub, pos + 1)
+            return found
+
+    def get_size(self, path: pathlib.Path) -> int:
+        with self._lock:
+            return len(self._open(path))
+
+    def set(self, path: pathlib.Path, data: bytes) -> None:
+        '''
+        unsaved file の内容を登録する
+        '''
+        with self._lock:
+            if path in self._maps:
+                self._close(path)
+            self._unsaved[path] = data
+
+    def pop(self, path: pathlib.Path) -> None:
+        '''
+        ファイルが更新されたので閉じる
+        '''
+        with self._lock:
+            if path in self._maps:
+                self._close(path)
+            self._unsaved.pop(path, None)
+
+    def release(self) -> None:
+        '''
+        map したファイルをすべて閉じる。unsaved file は残す。
+        '''
+        with self._lock:
+            while self._maps:
+                self._close(next(iter(self._maps)))
+
+    def clear(self) -> None:
+        self.release()
+        with self._lock:
+            self._unsaved.clear()
+
+
+class ParseSession:
+    '''
+    libclang の Index と parse の設定、cache を保持する。
+
+    with ParseSession() as session:
+        parse_files(parser, path, session=session)
+
+    で、抜けるときに cache を破棄する。
+
+    複数の thread から使える。
+    Index は thread ごとに作り、cache は lock して共有する。
+    '''
+    def __init__(self,
+                 dll: Optional[pathlib.Path] = None,
+                 target: str = DEFAULT_TARGET,
+                 cpp_flags: Optional[List[str]] = None,
+                 cache_dir: Optional[pathlib.Path] = None,
+                 strict: bool = False) -> None:
+        load_library(dll)
+        self.dll = dll
+        self._local = threading.local()
+        self.target = target
+        self.cpp_flags = list(
+            DEFAULT_CPP_FLAGS if cpp_flags is None else cpp_flags)
+        self.cache_dir = cache_dir
+        # error の diagnostics があれば AST をたどる前に中断する
+        self.strict = strict
+        # decl_map.extract, token_table 用
+        self.source_reader = SourceReader()
+
+    @property
+    def index(self) -> cindex.Index:
+        index = getattr(self._local, 'index', None)
+        if not index:
+            index = cindex.Index.create()
+            self._local.index = index
+        return index
+
+    def derive(self,
+               target: Optional[str] = None,
+               cpp_flags: Optional[List[str]] = None,
+               use_cache: bool = True) -> 'ParseSession':
+        '''
+        target, flags を変えた session を作る。
+        Index は別に作り、cache は共有する(use_cache=False なら使わない)。
+        '''
+        session = ParseSession(target=target if target else self.target,
+                               cpp_flags=self.cpp_flags
+                               if cpp_flags is None else cpp_flags,
+                               cache_dir=self.cache_dir
+                               if use_cache else None,
+                               strict=self.strict)
+        session.source_reader = self.source_reader
+        return session
+
+    def __enter__(self) -> 'ParseSession':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self.source_reader.clear()
+
+    def get_cpp_args(self,
+                     language: str = 'c++',
+                     include_path_list: List[pathlib.Path] = None,
+                     cpp_flags: List[str] = None) -> List[str]:
+        cpp_args = ['-x', language, '-target', self.target] + self.cpp_flags
+        if include_path_list is not None:
+            for i in include_path_list:
+                value = f'-I{str(i)}'
+                if value not in cpp_args:
+                    cpp_args.append(value)
+        if cpp_flags:
+            for f in cpp_flags:
+                cpp_args.append(f)
+        return cpp_args
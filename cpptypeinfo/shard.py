@@ -0,0 +1,223 @@
+'''
+header のリストを分割して複数の process で parse し、結果をまとめる
+'''
+import os
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Union, Set, Any
+from .basictype import TypeRef
+from .usertype import (UserType, Namespace, SingleTypeRef, Struct, Function,
+                       Field, Param)
+from .typeparser import TypeParser
+from .decl_map import DeclMap
+from .session import ParseSession
+from .profile import ParseProfile
+from .pch import PchPrefix
+from .cursor import parse_files
+
+
+def split_shards(paths: List[pathlib.Path],
+                 count: int) -> List[List[pathlib.Path]]:
+    '''
+    順番を保って count 個以下に分ける
+    '''
+    count = max(1, min(count, len(paths)))
+    size, rest = divmod(len(paths), count)
+    shards = []
+    pos = 0
+    for i in range(count):
+        end = pos + size + (1 if i < rest else 0)
+        shards.append(paths[pos:end])
+        pos = end
+    return shards
+
+
+def _parse_shard(settings: Dict[str, Any], paths: List[pathlib.Path],
+                 kw: Dict[str, Any]) -> DeclMap:
+    '''
+    worker process で実行する。
+    ParseSession は pickle できないので作り直す。
+    '''
+    session = ParseSession(**settings)
+    return parse_files(TypeParser(), *paths, session=session, **kw)
+
+
+class _Remapper:
+    '''
+    merge で重複した UserType への参照を、残す方に付け替える
+    '''
+    def __init__(self, remap: Dict[int, UserType]) -> None:
+        self.remap = remap
+        self.used: Set[int] = set()
+
+    def typeref(self, typeref: Optional[TypeRef]) -> Optional[TypeRef]:
+        if not typeref:
+            return typeref
+        found = self.remap.get(id(typeref.ref))
+        if found:
+            return TypeRef(found, typeref.is_const)
+        if isinstance(typeref.ref, UserType):
+            self.usertype(typeref.ref)
+        return typeref
+
+    def usertype(self, usertype: UserType) -> None:
+        if id(usertype) in self.used:
+            return
+        self.used.add(id(usertype))
+        if isinstance(usertype, SingleTypeRef):
+            usertype.typeref = self.typeref(usertype.typeref)
+        elif isinstance(usertype, Struct):
+            usertype.fields = [
+                Field(self.typeref(f.typeref), f.name, f.offset, f.value)
+                for f in usertype.fields
+            ]
+            usertype.base = self.typeref(usertype.base)
+            for m in usertype.methods:
+                self.usertype(m)
+        elif isinstance(usertype, Function):
+            usertype.result = self.typeref(usertype.result)
+            usertype.params = [
+                Param(self.typeref(p.typeref), p.name, p.value)
+                for p in usertype.params
+            ]
+
+    def namespace(self, dst: Namespace, src: Namespace) -> None:
+        '''
+        decl_map に無い型(typedef など)も namespace から付け替える
+        '''
+        for name, v in src.user_type_map.items():
+            if name not in dst.user_type_map:
+                found = self.remap.get(id(v))
+                if not found:
+                    self.usertype(v)
+                dst.register_type(name, found or v)
+        for f in src.functions:
+            if id(f) not in self.remap:
+                self.usertype(f)
+                dst.functions.append(f)
+        for child in src._children:
+            found = None
+            for x in dst._children:
+                if x.name == child.name and bool(x.struct) == bool(
+                        child.struct):
+                    found = x
+                    break
+            if found:
+                self.namespace(found, child)
+            else:
+                self.child_namespace(child)
+                dst.add_child(child)
+
+    def child_namespace(self, ns: Namespace) -> None:
+        for k, v in ns.user_type_map.items():
+            found = self.remap.get(id(v))
+            if not found:
+                self.usertype(v)
+            ns.user_type_map[k] = found or v
+        for f in ns.functions:
+            self.usertype(f)
+        for child in ns._children:
+            self.child_namespace(child)
+
+
+def merge_decl_maps(decl_maps: List[DeclMap]) -> DeclMap:
+    '''
+    key(USR) が同じ宣言を一つにまとめる。
+    先頭の DeclMap に破壊的に足しこむ。
+    '''
+    merged = decl_maps[0]
+    for decl_map in decl_maps[1:]:
+        remap: Dict[int, UserType] = {}
+        # 前方宣言しか無かった struct に定義をうつす
+        defined: List[Struct] = []
+        for key, v in decl_map.decl_map.items():
+            found = merged.decl_map.get(key)
+            if found is None:
+                continue
+            remap[id(v)] = found
+            if (isinstance(found, Struct) and isinstance(v, Struct)
+                    and found.is_forward_decl() and not v.is_forward_decl()):
+                defined.append(v)
+        # primitive の typedef は decl_map ではなく index にある
+        merged_keys = {k: i for i, k in enumerate(merged.index.keys) if k}
+        for v, key in zip(decl_map.index.decls, decl_map.index.keys):
+            i = merged_keys.get(key) if key else None
+            if i is not None and id(v) not in remap:
+                remap[id(v)] = merged.index.decls[i]
+        # typedef の key は参照先の型を指すことがあるので、remap が揃ってから足す
+        for key, v in decl_map.decl_map.items():
+            if key not in merged.decl_map:
+                merged.decl_map[key] = remap.get(id(v), v)
+
+        remapper = _Remapper(remap)
+        for v in decl_map.decl_map.values():
+            remapper.usertype(v)
+        merged.index.merge(decl_map.index, remap)
+        for v in defined:
+            found = remap[id(v)]
+            found.fields = v.fields
+            found.base = v.base
+            found.methods = v.methods
+            found.iid = v.iid
+            found.file = v.file
+            found.line = v.line
+            merged.index.update(found)
+        remapper.namespace(merged.parser.root_namespace,
+                           decl_map.parser.root_namespace)
+
+        for m in decl_map.macro_definitions:
+            if m not in merged.macro_definitions:
+                merged.macro_definitions.append(m)
+        merged.failures += decl_map.failures
+        for f in decl_map.files:
+            if f not in merged.files:
+                merged.files.append(f)
+        if decl_map.include_graph:
+            if merged.include_graph:
+                merged.include_graph.merge(decl_map.include_graph)
+            else:
+                merged.include_graph = decl_map.include_graph
+    return merged
+
+
+def parse_sharded(*paths: pathlib.Path,
+                  includes=None,
+                  cpp_flags=None,
+                  pch: Optional[PchPrefix] = None,
+                  session: Optional[ParseSession] = None,
+                  profile: Union[str, ParseProfile, None] = None,
+                  jobs: Optional[int] = None,
+                  macros: Union[bool, List[str]] = False,
+                  keep_going: bool = False) -> DeclMap:
+    '''
+    paths を jobs 個に分けて別の process で parse し、merge_decl_maps する。
+    libclang の parse が process の数だけ並列に走る。
+    '''
+    if not session:
+        session = ParseSession()
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    if pch:
+        # worker が同時に作らないように、先に作って cache しておく
+        pch.build(session.cache_dir, includes, cpp_flags, session)
+    settings = {
+        'dll': session.dll,
+        'target': session.target,
+        'cpp_flags': session.cpp_flags,
+        'cache_dir': session.cache_dir,
+        'strict': session.strict,
+    }
+    kw = {
+        'includes': includes,
+        'cpp_flags': cpp_flags,
+        'pch': pch,
+        'profile': profile,
+        'macros': macros,
+        'keep_going': keep_going,
+    }
+    shards = split_shards(list(paths), jobs)
+    with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+        decl_maps = list(
+            executor.map(_parse_shard, [settings] * len(shards), shards,
+                         [kw] * len(shards)))
+    return merge_decl_maps(decl_maps)
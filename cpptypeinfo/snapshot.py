@@ -0,0 +1,122 @@
+'''
+parse した型を保存し、libclang 無しで読み込む
+
+pickle で保存するので、型の共有(同じ Struct を参照する field など)はそのまま残る。
+include したファイルの hash が変わっていたら読み込まない。
+parse の設定(flags, profile...)から作った key が違っても読み込まない。
+'''
+import json
+import os
+import pickle
+import pathlib
+import threading
+import zlib
+from typing import Dict, List, Optional, Any
+from .basictype import MacroDefinition
+from .usertype import UserType
+from .typeparser import TypeParser
+from .include_graph import IncludeGraph, hash_bytes
+from .decl_index import DeclIndex, DeclQuery
+
+# 保存する class の構成を変えたら上げる
+SNAPSHOT_VERSION = 3
+
+
+class Snapshot(DeclQuery):
+    '''
+    DeclMap から libclang に依存するものを除いたもの。
+    generator には DeclMap の代わりに渡せる。
+    '''
+    def __init__(self,
+                 parser: TypeParser,
+                 decl_map: Dict[str, UserType],
+                 index: DeclIndex,
+                 macro_definitions: List[MacroDefinition],
+                 files: List[pathlib.Path],
+                 include_graph: Optional[IncludeGraph] = None) -> None:
+        self.parser = parser
+        self.decl_map = decl_map
+        self.index = index
+        self.macro_definitions = macro_definitions
+        self.files = files
+        self.include_graph = include_graph
+
+    @staticmethod
+    def from_decl_map(decl_map: Any) -> 'Snapshot':
+        '''
+        decl_map: DeclMap
+        '''
+        return Snapshot(decl_map.parser, decl_map.decl_map, decl_map.index,
+                        decl_map.macro_definitions, list(decl_map.files),
+                        decl_map.include_graph)
+
+    def resolve_typedef(self) -> None:
+        pass
+
+    def get_changed(self) -> List[pathlib.Path]:
+        '''
+        保存した後に内容が変わったファイル
+        '''
+        if not self.include_graph:
+            return []
+        return self.include_graph.get_changed()
+
+
+def get_snapshot_key(inputs: Dict[str, Any]) -> str:
+    '''
+    inputs: parse の入力(headers, cpp_flags, target, profile...)
+    '''
+    return hash_bytes(
+        json.dumps(inputs, sort_keys=True, default=str).encode('utf-8'))
+
+
+def save_snapshot(decl_map: Any,
+                  path: pathlib.Path,
+                  key: Optional[str] = None) -> None:
+    '''
+    decl_map: DeclMap か Snapshot
+    key: get_snapshot_key
+    '''
+    snapshot = decl_map if isinstance(
+        decl_map, Snapshot) else Snapshot.from_decl_map(decl_map)
+    if snapshot.include_graph:
+        # 読み込むときに比べる
+        snapshot.include_graph.hash_files()
+    data = zlib.compress(
+        pickle.dumps((SNAPSHOT_VERSION, key, snapshot),
+                     pickle.HIGHEST_PROTOCOL),
+        1)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(
+        f'{path.name}.{os.getpid()}.{threading.get_ident()}')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path: pathlib.Path,
+                  check: bool = True,
+                  files: Optional[List[pathlib.Path]] = None,
+                  key: Optional[str] = None) -> Optional[Snapshot]:
+    '''
+    無い、version が違う、check してファイルが変わっていたら None。
+    files があれば、すべて parse してある snapshot だけ返す。
+    key があれば、同じ key で保存した snapshot だけ返す。
+    '''
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    try:
+        version, saved_key, snapshot = pickle.loads(zlib.decompress(data))
+    except Exception:
+        # 壊れている、古い形式
+        return None
+    if version != SNAPSHOT_VERSION:
+        return None
+    if key is not None and saved_key != key:
+        return None
+    if files and any(f not in snapshot.files for f in files):
+        return None
+    if check and snapshot.get_changed():
+        return None
+    return snapshot
@@ -0,0 +1,283 @@
+'''
+宣言を SQLite に書き出して、libclang や型の graph を読み込まずに引く
+
+decls: 宣言(struct, enum, function, method...)
+names: 宣言を引く名前(typedef の名前を含む)
+fields, params, enum_values: 宣言の中身
+refs: 宣言から宣言への参照(field, param, result, base, typedef)
+'''
+import os
+import pathlib
+import sqlite3
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from .basictype import TypeRef
+from .usertype import (UserType, Typedef, Pointer, Array, Struct, Function,
+                       Enum)
+
+# table の構成を変えたら上げる
+SYMBOL_DB_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE meta(key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE decls(id INTEGER PRIMARY KEY, name TEXT, kind TEXT, file TEXT,
+                   line INTEGER, parent_id INTEGER, signature TEXT);
+CREATE TABLE names(name TEXT, qualified_name TEXT, decl_id INTEGER);
+CREATE TABLE fields(decl_id INTEGER, position INTEGER, name TEXT, type TEXT,
+                    type_id INTEGER, offset INTEGER);
+CREATE TABLE params(decl_id INTEGER, position INTEGER, name TEXT, type TEXT,
+                    type_id INTEGER);
+CREATE TABLE enum_values(decl_id INTEGER, name TEXT, value INTEGER);
+CREATE TABLE refs(from_id INTEGER, to_id INTEGER, role TEXT, detail TEXT);
+CREATE TABLE macros(name TEXT, value TEXT, file TEXT, line INTEGER);
+CREATE INDEX names_name ON names(name);
+CREATE INDEX names_qualified_name ON names(qualified_name);
+CREATE INDEX decls_parent_id ON decls(parent_id);
+CREATE INDEX fields_decl_id ON fields(decl_id, position);
+CREATE INDEX params_decl_id ON params(decl_id, position);
+CREATE INDEX enum_values_decl_id ON enum_values(decl_id);
+CREATE INDEX enum_values_name ON enum_values(name);
+CREATE INDEX refs_to_id ON refs(to_id);
+CREATE INDEX refs_from_id ON refs(from_id);
+CREATE INDEX macros_name ON macros(name);
+'''
+
+
+def get_kind(decl: Any) -> str:
+    if isinstance(decl, Struct):
+        return decl.struct_type.value
+    if isinstance(decl, Enum):
+        return 'enum'
+    if isinstance(decl, Function):
+        return 'function'
+    if isinstance(decl, Typedef):
+        return 'typedef'
+    if isinstance(decl, Array):
+        return 'array'
+    if isinstance(decl, Pointer):
+        return 'pointer'
+    return 'primitive'
+
+
+def get_decl_name(decl: Any) -> str:
+    if isinstance(decl, Function):
+        return decl.name
+    return getattr(decl, 'type_name', '') or str(decl)
+
+
+def strip_typeref(typeref: Optional[TypeRef]) -> Optional[UserType]:
+    '''
+    Pointer, Array を外した先の宣言
+    '''
+    if not typeref:
+        return None
+    current = typeref.ref
+    while isinstance(current, Pointer):
+        current = current.typeref.ref
+    if isinstance(current, UserType):
+        return current
+    return None
+
+
+class _Writer:
+    def __init__(self) -> None:
+        # id(宣言) => decls.id
+        self.ids: Dict[int, int] = {}
+        self.decls: List[Tuple] = []
+        self.names: List[Tuple] = []
+        self.fields: List[Tuple] = []
+        self.params: List[Tuple] = []
+        self.enum_values: List[Tuple] = []
+        self.refs: List[Tuple] = []
+
+    def add_decl(self, decl: Any, kind: str,
+                 parent_id: Optional[int]) -> int:
+        decl_id = len(self.decls) + 1
+        self.ids[id(decl)] = decl_id
+        file = getattr(decl, 'file', None)
+        self.decls.append(
+            (decl_id, get_decl_name(decl), kind,
+             str(file) if file else None, getattr(decl, 'line', -1),
+             parent_id, str(decl)))
+        return decl_id
+
+    def get_id(self, typeref: Optional[TypeRef]) -> Optional[int]:
+        decl = strip_typeref(typeref)
+        if decl is None:
+            return None
+        return self.ids.get(id(decl))
+
+    def add_ref(self, from_id: int, typeref: Optional[TypeRef], role: str,
+                detail: str) -> Optional[int]:
+        to_id = self.get_id(typeref)
+        if to_id is not None:
+            self.refs.append((from_id, to_id, role, detail))
+        return to_id
+
+    def add_function(self, decl_id: int, function: Function) -> None:
+        result = self.add_ref(decl_id, function.result, 'result', '')
+        self.params.append(
+            (decl_id, -1, '', str(function.result), result))
+        for i, p in enumerate(function.params):
+            type_id = self.add_ref(decl_id, p.typeref, 'param', p.name)
+            self.params.append((decl_id, i, p.name, str(p.typeref), type_id))
+
+    def add_members(self, decl: Any) -> None:
+        decl_id = self.ids[id(decl)]
+        if isinstance(decl, Struct):
+            for i, f in enumerate(decl.fields):
+                type_id = self.add_ref(decl_id, f.typeref, 'field', f.name)
+                self.fields.append((decl_id, i, f.name, str(f.typeref),
+                                    type_id, f.offset))
+            self.add_ref(decl_id, decl.base, 'base', '')
+            for m in decl.methods:
+                self.add_function(self.ids[id(m)], m)
+        elif isinstance(decl, Enum):
+            for v in decl.values:
+                self.enum_values.append((decl_id, v.name, v.value))
+        elif isinstance(decl, Function):
+            self.add_function(decl_id, decl)
+        elif isinstance(decl, (Typedef, Pointer)):
+            self.add_ref(decl_id, decl.typeref, 'typedef', '')
+
+
+def write_symbol_db(decl_map: Any, path: pathlib.Path) -> None:
+    '''
+    decl_map: DeclMap か Snapshot
+    '''
+    writer = _Writer()
+    index = decl_map.index
+    for decl in index.decls:
+        decl_id = writer.add_decl(decl, get_kind(decl), None)
+        name = get_decl_name(decl)
+        writer.names.append((name, name, decl_id))
+        if isinstance(decl, Struct):
+            for m in decl.methods:
+                writer.add_decl(m, 'method', decl_id)
+    for qualified_name, positions in index.by_name.items():
+        name = qualified_name.split('::')[-1]
+        for i in positions:
+            writer.names.append(
+                (name, qualified_name, writer.ids[id(index.decls[i])]))
+    for decl in index.decls:
+        writer.add_members(decl)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(
+        f'{path.name}.{os.getpid()}.{threading.get_ident()}')
+    if tmp.exists():
+        tmp.unlink()
+    with sqlite3.connect(str(tmp)) as db:
+        db.executescript(SCHEMA)
+        db.execute('INSERT INTO meta VALUES(?, ?)',
+                   ('version', str(SYMBOL_DB_VERSION)))
+        db.executemany('INSERT INTO decls VALUES(?, ?, ?, ?, ?, ?, ?)',
+                       writer.decls)
+        db.executemany('INSERT INTO names VALUES(?, ?, ?)',
+                       sorted(set(writer.names)))
+        db.executemany('INSERT INTO fields VALUES(?, ?, ?, ?, ?, ?)',
+                       writer.fields)
+        db.executemany('INSERT INTO params VALUES(?, ?, ?, ?, ?)',
+                       writer.params)
+        db.executemany('INSERT INTO enum_values VALUES(?, ?, ?)',
+                       writer.enum_values)
+        db.executemany('INSERT INTO refs VALUES(?, ?, ?, ?)', writer.refs)
+        db.executemany('INSERT INTO macros VALUES(?, ?, ?, ?)',
+                       [(m.name, m.value, str(m.file), m.line)
+                        for m in decl_map.macro_definitions])
+    db.close()
+    os.replace(tmp, path)
+
+
+class DeclRow(NamedTuple):
+    id: int
+    name: str
+    kind: str
+    file: Optional[str]
+    line: int
+    parent_id: Optional[int]
+    signature: str
+
+
+class FieldRow(NamedTuple):
+    position: int
+    name: str
+    type: str
+    offset: int
+
+
+class UsageRow(NamedTuple):
+    '''
+    decl が role(field, param...) として参照している
+    '''
+    decl: DeclRow
+    role: str
+    detail: str
+
+
+class EnumValueRow(NamedTuple):
+    enum: str
+    name: str
+    value: int
+
+
+def open_symbol_db(path: pathlib.Path) -> sqlite3.Connection:
+    '''
+    読み込み専用で開く
+    '''
+    db = sqlite3.connect(f'{path.absolute().as_uri()}?mode=ro', uri=True)
+    row = db.execute("SELECT value FROM meta WHERE key='version'").fetchone()
+    if not row or row[0] != str(SYMBOL_DB_VERSION):
+        db.close()
+        raise Exception(f'{path}: unknown symbol db version')
+    return db
+
+
+DECL_COLUMNS = 'd.id, d.name, d.kind, d.file, d.line, d.parent_id, d.signature'
+
+
+def find_decls(db: sqlite3.Connection, name: str) -> List[DeclRow]:
+    '''
+    name: 名前か ns::Struct のような修飾した名前
+    '''
+    rows = db.execute(
+        f'SELECT DISTINCT {DECL_COLUMNS} FROM names n '
+        'JOIN decls d ON d.id = n.decl_id '
+        'WHERE n.name = ? OR n.qualified_name = ? ORDER BY d.id',
+        (name, name)).fetchall()
+    return [DeclRow(*x) for x in rows]
+
+
+def find_enum_values(db: sqlite3.Connection,
+                     name: str) -> List[EnumValueRow]:
+    rows = db.execute(
+        'SELECT d.name, v.name, v.value FROM enum_values v '
+        'JOIN decls d ON d.id = v.decl_id WHERE v.name = ?',
+        (name, )).fetchall()
+    return [EnumValueRow(*x) for x in rows]
+
+
+def find_usages(db: sqlite3.Connection, name: str) -> List[UsageRow]:
+    '''
+    name の宣言を参照している宣言
+    '''
+    rows = db.execute(
+        f'SELECT DISTINCT {DECL_COLUMNS}, r.role, r.detail FROM names n '
+        'JOIN refs r ON r.to_id = n.decl_id '
+        'JOIN decls d ON d.id = r.from_id '
+        'WHERE n.name = ? OR n.qualified_name = ? ORDER BY d.id',
+        (name, name)).fetchall()
+    return [UsageRow(DeclRow(*x[:7]), x[7], x[8]) for x in rows]
+
+
+def get_layout(db: sqlite3.Connection, decl_id: int) -> List[FieldRow]:
+    rows = db.execute(
+        'SELECT position, name, type, offset FROM fields '
+        'WHERE decl_id = ? ORDER BY position', (decl_id, )).fetchall()
+    return [FieldRow(*x) for x in rows]
+
+
+def get_decl(db: sqlite3.Connection, decl_id: int) -> Optional[DeclRow]:
+    row = db.execute(f'SELECT {DECL_COLUMNS} FROM decls d WHERE d.id = ?',
+                     (decl_id, )).fetchone()
+    return DeclRow(*row) if row else None
@@ -0,0 +1,95 @@
+'''
+ファイルごとに一度だけ tokenize して、cursor の extent で引く
+'''
+import bisect
+import pathlib
+from typing import Dict, List, Optional
+from clang import cindex
+from .session import SourceReader
+
+
+class TokenTable:
+    '''
+    offsets: token の先頭の offset(昇順)
+    spelling は使うときに取り出す
+    '''
+    def __init__(self, tokens: List[cindex.Token]) -> None:
+        self.tokens = tokens
+        self.offsets = [t.location.offset for t in tokens]
+        self.spellings: List[Optional[str]] = [None] * len(tokens)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def get_spelling(self, i: int) -> str:
+        spelling = self.spellings[i]
+        if spelling is None:
+            spelling = self.tokens[i].spelling
+            self.spellings[i] = spelling
+        return spelling
+
+    def get_spellings(self,
+                      start: int,
+                      end: int,
+                      limit: Optional[int] = None) -> List[str]:
+        '''
+        [start, end) から始まる token
+        '''
+        begin = bisect.bisect_left(self.offsets, start)
+        last = bisect.bisect_left(self.offsets, end, begin)
+        if limit is not None:
+            last = min(last, begin + limit)
+        return [self.get_spelling(i) for i in range(begin, last)]
+
+
+def tokenize_file(tu: cindex.TranslationUnit, path: pathlib.Path,
+                  size: int) -> TokenTable:
+    f = cindex.File.from_name(tu, str(path))
+    extent = cindex.SourceRange.from_locations(
+        cindex.SourceLocation.from_offset(tu, f, 0),
+        cindex.SourceLocation.from_offset(tu, f, size))
+    return TokenTable(list(tu.get_tokens(extent=extent)))
+
+
+class TokenCache:
+    '''
+    TranslationUnit ごとに作る。
+    ファイルの大きさは SourceReader から得る。
+    '''
+    def __init__(self, source_reader: SourceReader) -> None:
+        self.source_reader = source_reader
+        self.tables: Dict[pathlib.Path, Optional[TokenTable]] = {}
+
+    def get_table(self, tu: cindex.TranslationUnit,
+                  path: pathlib.Path) -> Optional[TokenTable]:
+        if path in self.tables:
+            return self.tables[path]
+        try:
+            size = self.source_reader.get_size(path)
+            table: Optional[TokenTable] = tokenize_file(tu, path, size)
+        except OSError:
+            # 内容がわからない
+            table = None
+        self.tables[path] = table
+        return table
+
+    def get_spellings(self,
+                      c: cindex.Cursor,
+                      limit: Optional[int] = None) -> List[str]:
+        '''
+        c.get_tokens() の spelling
+        '''
+        extent = c.extent
+        start = extent.start
+        if start.file:
+            table = self.get_table(c.translation_unit,
+                                   pathlib.Path(start.file.name))
+            if table:
+                return table.get_spellings(start.offset, extent.end.offset,
+                                           limit)
+        spellings = []
+        for t in c.get_tokens():
+            if limit is not None and len(spellings) >= limit:
+                break
+            spellings.append(t.spelling)
+        return spellings
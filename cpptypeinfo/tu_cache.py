@@ -0,0 +1,157 @@
+'''
+TranslationUnit の永続キャッシュ
+
+TranslationUnit.save で保存し、Index.read で読み込む。
+key は main file の内容, cpp_args, options, libclang の version から作る。
+include された全ファイルの hash を manifest に記録し、読み込み時に検証する。
+'''
+import os
+import threading
+import json
+import pathlib
+from typing import List, Dict, Optional
+from clang import cindex
+from .include_graph import IncludeGraph, hash_bytes, hash_file
+
+CACHE_VERSION = 1
+
+_clang_version: Optional[str] = None
+
+
+def get_clang_version() -> str:
+    global _clang_version
+    if _clang_version is None:
+        f = cindex.conf.lib.clang_getClangVersion
+        f.argtypes = []
+        f.restype = cindex._CXString
+        f.errcheck = cindex._CXString.from_result
+        _clang_version = f()
+    return _clang_version
+
+
+def get_tmp_suffix() -> str:
+    '''
+    別の process, thread と書き込み途中の file がぶつからないようにする
+    '''
+    return f'{os.getpid()}.{threading.get_ident()}'
+
+
+def get_include_closure(tu: cindex.TranslationUnit) -> List[pathlib.Path]:
+    '''
+    TranslationUnit が読み込んだファイルの一覧
+    '''
+    files = [pathlib.Path(tu.spelling)]
+    for include in tu.get_includes():
+        path = pathlib.Path(include.include.name)
+        if path not in files:
+            files.append(path)
+    return files
+
+
+class TUCache:
+    '''
+    cache_dir/{key}.ast
+    cache_dir/{key}.json(manifest)
+    '''
+    def __init__(self, cache_dir: pathlib.Path, suffix: str = '.ast') -> None:
+        self.cache_dir = cache_dir
+        self.suffix = suffix
+
+    def get_path(self, key: str) -> pathlib.Path:
+        return self.cache_dir / f'{key}{self.suffix}'
+
+    def get_key(self, path: pathlib.Path, src: bytes, cpp_args: List[str],
+                options: int) -> str:
+        # 一時ファイルの名前は毎回変わるので、内容と場所で区別する
+        key = json.dumps([
+            CACHE_VERSION,
+            get_clang_version(),
+            str(path.parent),
+            hash_bytes(src),
+            cpp_args,
+            options,
+        ])
+        return hash_bytes(key.encode('utf-8'))
+
+    def is_valid(self, key: str) -> bool:
+        manifest_path = self.cache_dir / f'{key}.json'
+        if not manifest_path.exists() or not self.get_path(key).exists():
+            return False
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+        except ValueError:
+            return False
+        files: Dict[str, str] = manifest.get('files', {})
+        for name, digest in files.items():
+            if hash_file(pathlib.Path(name)) != digest:
+                # header updated
+                return False
+        return True
+
+    def load_graph(self, key: str) -> Optional[IncludeGraph]:
+        manifest_path = self.cache_dir / f'{key}.json'
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        graph = manifest.get('graph')
+        if not graph:
+            return None
+        return IncludeGraph.from_dict(graph)
+
+    def load(self, index: cindex.Index,
+             key: str) -> Optional[cindex.TranslationUnit]:
+        if not self.is_valid(key):
+            return None
+        try:
+            return index.read(str(self.get_path(key)))
+        except cindex.TranslationUnitLoadError:
+            return None
+
+    def store(self,
+              tu: cindex.TranslationUnit,
+              key: str,
+              main_src: bytes,
+              depends: Optional[List[pathlib.Path]] = None,
+              graph: Optional[IncludeGraph] = None) -> None:
+        '''
+        depends: include 以外に検証するファイル(pch など)
+        '''
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        main = pathlib.Path(tu.spelling)
+        if not graph:
+            graph = IncludeGraph.from_tu(tu)
+        graph.hash_files()
+        files: Dict[str, str] = {}
+        for path in graph.files() + (depends or []):
+            if path == main:
+                # main file は key に含まれている
+                continue
+            if path in graph.edges:
+                # parse した後に変わっていたら hash が無い
+                digest = graph.hashes.get(path)
+            else:
+                digest = hash_file(path)
+            if digest is None:
+                return
+            files[str(path)] = digest
+
+        ast_path = self.get_path(key)
+        manifest_path = self.cache_dir / f'{key}.json'
+        tmp_ast = self.cache_dir / f'{key}{self.suffix}.{get_tmp_suffix()}'
+        try:
+            tu.save(str(tmp_ast))
+        except cindex.TranslationUnitSaveError:
+            return
+        os.replace(tmp_ast, ast_path)
+
+        tmp_manifest = self.cache_dir / f'{key}.json.{get_tmp_suffix()}'
+        tmp_manifest.write_text(json.dumps({
+            'version': CACHE_VERSION,
+            'main': str(main),
+            'main_hash': hash_bytes(main_src),
+            'files': files,
+            'graph': graph.to_dict(),
+        }),
+                                encoding='utf-8')
+        os.replace(tmp_manifest, manifest_path)
@@ -408,3 +408,44 @@ class Enum(UserType):
 
     def __str__(self) -> str:
         return f'enum {self.type_name}'
+
+
+def get_references(usertype: UserType) -> List[UserType]:
+    '''
+    直接参照している UserType を返す。
+    Pointer, Array は取り外す。
+    '''
+    refs: List[UserType] = []
+
+    def push(typeref: Optional[TypeRef]) -> None:
+        if not typeref:
+            return
+        current = typeref.ref
+        while isinstance(current, Pointer):
+            current = current.typeref.ref
+        if not isinstance(current, UserType):
+            return
+        for x in refs:
+            if x is current:
+                return
+        refs.append(current)
+
+    def push_function(function: Function) -> None:
+        push(function.result)
+        for p in function.params:
+            push(p.typeref)
+
+    if isinstance(usertype, Pointer):
+        push(usertype.typeref)
+    elif isinstance(usertype, SingleTypeRef):
+        push(usertype.typeref)
+    elif isinstance(usertype, Struct):
+        for f in usertype.fields:
+            push(f.typeref)
+        if usertype.base:
+            push(usertype.base)
+        for m in usertype.methods:
+            push_function(m)
+    elif isinstance(usertype, Function):
+        push_function(usertype)
+    return refs
@@ -0,0 +1,114 @@
+'''
+clang_visitChildren で子をたどる。
+
+cindex.Cursor.get_children はすべての子を Python の Cursor にするが、
+ここでは callback の中で kind と file を見て、要らない子とその子孫を飛ばす。
+'''
+import ctypes
+import pathlib
+from typing import (List, Optional, Iterable, Iterator, Set, Dict, Tuple,
+                    Any)
+from clang import cindex
+
+# CXChildVisitResult
+CHILD_VISIT_BREAK = 0
+CHILD_VISIT_CONTINUE = 1
+CHILD_VISIT_RECURSE = 2
+
+
+class ChildFilter:
+    '''
+    skip_kinds: 返さない CursorKind
+    files: この file の子だけ返す(None ならすべて)
+    no_file: files を指定したときに、file の無い子も返す
+
+    visited: callback に来た子の数
+    kept: 返した子の数
+    '''
+    def __init__(self,
+                 skip_kinds: Iterable[cindex.CursorKind] = (),
+                 files: Optional[Iterable[pathlib.Path]] = None,
+                 no_file: bool = False) -> None:
+        self.skip_kinds: Set[int] = {x.value for x in skip_kinds}
+        self.files = set(files) if files is not None else None
+        self.no_file = no_file
+        # CXFile => files に含まれるか
+        self.handles: Dict[Optional[int], bool] = {}
+        self.visited = 0
+        self.kept = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        '''
+        CXFile は TranslationUnit の中でしか意味が無い
+        '''
+        state = self.__dict__.copy()
+        state['handles'] = {}
+        return state
+
+    def match_file(self, child: cindex.Cursor) -> bool:
+        if self.files is None:
+            return True
+        lib = cindex.conf.lib
+        f = cindex.c_object_p()
+        lib.clang_getInstantiationLocation(lib.clang_getCursorLocation(child),
+                                           ctypes.byref(f), None, None, None)
+        handle = ctypes.cast(f, ctypes.c_void_p).value
+        found = self.handles.get(handle)
+        if found is None:
+            if handle:
+                found = pathlib.Path(cindex.File(f).name) in self.files
+            else:
+                found = self.no_file
+            self.handles[handle] = found
+        return found
+
+    def match(self, child: cindex.Cursor) -> bool:
+        self.visited += 1
+        # Cursor.kind は CursorKind を引くので、数値のまま比べる
+        if child._kind_id in self.skip_kinds:
+            return False
+        if not self.match_file(child):
+            return False
+        self.kept += 1
+        return True
+
+
+def get_children(c: cindex.Cursor,
+                 child_filter: Optional[ChildFilter] = None
+                 ) -> List[cindex.Cursor]:
+    '''
+    child_filter に合う子だけを返す
+    '''
+    children: List[cindex.Cursor] = []
+
+    def visitor(child, parent, _) -> int:
+        if child_filter and not child_filter.match(child):
+            # 子孫もたどらない
+            return CHILD_VISIT_CONTINUE
+        child._tu = c._tu
+        children.append(child)
+        return CHILD_VISIT_CONTINUE
+
+    cindex.conf.lib.clang_visitChildren(
+        c, cindex.callbacks['cursor_visit'](visitor), children)
+    return children
+
+
+def walk(c: cindex.Cursor,
+         child_filter: Optional[ChildFilter] = None,
+         max_depth: Optional[int] = None
+         ) -> Iterator[Tuple[cindex.Cursor, int]]:
+    '''
+    c の子孫を preorder で返す(depth は c の子が 1)。
+    child_filter に合わない子と max_depth より深い子は、子孫ごと飛ばす。
+    '''
+    stack: List[Tuple[cindex.Cursor, int]] = [(c, 0)]
+    while stack:
+        current, depth = stack.pop()
+        if current is not c:
+            yield current, depth
+        if max_depth is not None and depth >= max_depth:
+            continue
+        children = get_children(current, child_filter)
+        for child in reversed(children):
+            stack.append((child, depth + 1))
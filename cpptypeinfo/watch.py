@@ -0,0 +1,132 @@
+'''
+header の変更を監視して TranslationUnit を reparse する
+'''
+import os
+import time
+import pathlib
+from typing import List, Optional, Union, Dict, Callable
+from clang import cindex
+from .typeparser import TypeParser
+from .decl_map import DeclMap
+from .session import ParseSession
+from .profile import ParseProfile, get_profile
+from .include_graph import IncludeGraph
+from .cursor import get_tu_from_files
+from .get_tu import check_diagnostics, DiagnosticError
+from .pch import PchPrefix
+
+# CXTranslationUnit_CreatePreambleOnFirstParse
+PARSE_CREATE_PREAMBLE_ON_FIRST_PARSE = 0x100
+
+# parser, decl_map, 変更の影響を受ける header
+OnUpdate = Callable[[TypeParser, DeclMap, List[pathlib.Path]], None]
+
+
+class Watcher:
+    '''
+    TranslationUnit を保持し、include した header が更新されたら
+    precompiled preamble を使って reparse する。
+    '''
+    def __init__(self,
+                 *paths: pathlib.Path,
+                 includes=None,
+                 cpp_flags=None,
+                 pch: Optional[PchPrefix] = None,
+                 session: Optional[ParseSession] = None,
+                 profile: Union[str, ParseProfile, None] = 'bindings-fast'):
+        self.paths = list(paths)
+        # reparse するので TranslationUnit の cache は使わない
+        self.session = (session if session else ParseSession()).derive(
+            use_cache=False)
+        profile = get_profile(profile)
+        self.profile = profile._replace(
+            options=profile.options
+            | cindex.TranslationUnit.PARSE_PRECOMPILED_PREAMBLE
+            | PARSE_CREATE_PREAMBLE_ON_FIRST_PARSE)
+        self.tu, self.main, self.source = get_tu_from_files(
+            *paths,
+            includes=includes,
+            cpp_flags=cpp_flags,
+            pch=pch,
+            session=self.session,
+            profile=self.profile)
+        self.graph = IncludeGraph.from_tu(self.tu)
+        self.mtimes = self.get_mtimes()
+
+    def get_mtimes(self) -> Dict[pathlib.Path, float]:
+        mtimes: Dict[pathlib.Path, float] = {}
+        for path in self.graph.files():
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                # unsaved file
+                pass
+        return mtimes
+
+    def get_changed(self) -> List[pathlib.Path]:
+        changed = []
+        for path, mtime in self.mtimes.items():
+            try:
+                if os.stat(path).st_mtime != mtime:
+                    changed.append(path)
+            except OSError:
+                changed.append(path)
+        return changed
+
+    def reparse(self, changed: List[pathlib.Path]) -> None:
+        for path in changed:
+            self.session.source_reader.pop(path)
+        unsaved = None
+        if self.source is not None:
+            unsaved = [(str(self.main), self.source)]
+        self.tu.reparse(unsaved)
+        self.graph = IncludeGraph.from_tu(self.tu)
+        # error でも、次に変更されるまでは reparse しない
+        self.mtimes = self.get_mtimes()
+        check_diagnostics(self.tu, self.session.strict)
+
+    def parse(self) -> DeclMap:
+        '''
+        reparse すると cursor が作り直されるので DeclMap も作り直す
+        '''
+        parser = TypeParser()
+        decl_map = DeclMap(parser, self.paths + [self.main], self.session,
+                           self.profile)
+        decl_map.include_graph = self.graph
+        decl_map.parse_cursor(self.tu.cursor)
+        return decl_map
+
+    def update(self) -> Optional[List[pathlib.Path]]:
+        changed = self.get_changed()
+        if not changed:
+            return None
+        self.reparse(changed)
+        return changed
+
+    def run(self,
+            on_update: OnUpdate,
+            interval: float = 0.5,
+            count: Optional[int] = None) -> None:
+        '''
+        count 回更新したら終わる(None なら終わらない)
+        '''
+        while count is None or count > 0:
+            time.sleep(interval)
+            try:
+                changed = self.update()
+            except DiagnosticError as ex:
+                # 編集途中かもしれないので、次の変更を待つ
+                print(ex)
+                continue
+            if not changed:
+                continue
+            decl_map = self.parse()
+            # changed を include している header も更新する
+            affected = set(changed)
+            for path in changed:
+                affected |= self.graph.includers_of(path)
+            on_update(decl_map.parser, decl_map, sorted(affected))
+            # map したままだと editor が保存できないことがある(Windows)
+            self.session.source_reader.release()
+            if count is not None:
+                count -= 1
@@ -0,0 +1,33 @@
+import unittest
+import cpptypeinfo
+from cpptypeinfo.cursor_cache import CursorCache
+
+SOURCE = '''
+typedef struct Vec { float x; float y; } Vec;
+typedef Vec Position;
+struct Line { Position begin; Position end; };
+'''
+
+
+class CursorCacheTest(unittest.TestCase):
+    def test_cache(self) -> None:
+        tu = cpptypeinfo.get_tu_from_source(SOURCE)
+        cache = CursorCache()
+        c = [x for x in tu.cursor.get_children()][0]
+        children = cache.get_children(c)
+        self.assertIs(children, cache.get_children(c))
+        self.assertEqual('Vec', cache.get_key(c)[-3:])
+        self.assertEqual(2, cache.get_line(c))
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(3, cache.misses)
+
+    def test_decl_map(self) -> None:
+        decl_map = cpptypeinfo.parse_source(cpptypeinfo.TypeParser(), SOURCE)
+        cache = decl_map.cursor_cache
+        self.assertGreater(cache.hits, 0)
+        self.assertGreater(cache.hit_rate(), 0)
+        self.assertIn('hits', str(cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
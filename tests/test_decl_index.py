@@ -0,0 +1,94 @@
+import unittest
+import pathlib
+import pickle
+import tempfile
+import cpptypeinfo
+from cpptypeinfo.usertype import Struct, Enum, Function, Typedef
+
+OTHER = '''
+#pragma once
+struct Forward;
+typedef enum Color { RED, GREEN } Color;
+typedef struct { int x; } Anonymous;
+'''
+
+A = '''
+#include "other.h"
+namespace ns {
+struct Outer
+{
+    struct Inner { int y; } inner;
+};
+}
+struct Forward { Color color; };
+typedef int Handle;
+void func(Handle handle);
+'''
+
+
+class DeclIndexTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.tmp.name)
+        (self.dir / 'other.h').write_text(OTHER)
+        (self.dir / 'a.h').write_text(A)
+        self.decl_map = cpptypeinfo.parse_files(cpptypeinfo.TypeParser(),
+                                                self.dir / 'a.h')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_file(self) -> None:
+        other = self.decl_map.decls_in(self.dir / 'other.h')
+        self.assertEqual(['Color', 'Anonymous'],
+                         [x.type_name for x in other])
+        self.assertEqual(['Color'], [
+            x.type_name
+            for x in self.decl_map.decls_in(self.dir / 'other.h', kind=Enum)
+        ])
+        # 前方宣言の後の定義
+        a = self.decl_map.decls_in(self.dir / 'a.h', kind=Struct)
+        self.assertEqual(['Forward', 'Outer', 'Inner'],
+                         [x.type_name for x in a])
+        # primitive の typedef は decl_map では primitive になっている
+        self.assertEqual(['Handle'], [
+            x.type_name
+            for x in self.decl_map.decls_in(self.dir / 'a.h', kind=Typedef)
+        ])
+        # 全体をたどった結果と同じ
+        files = {self.dir / 'a.h', self.dir / 'other.h'}
+        expected = []
+        for v in self.decl_map.decl_map.values():
+            if v.file in files and all(v is not x for x in expected):
+                expected.append(v)
+        self.assertEqual([id(x) for x in expected], [
+            id(x) for x in self.decl_map.decls_in(*files)
+            if not isinstance(x, Typedef)
+        ])
+
+    def test_kind(self) -> None:
+        self.assertEqual(['func'],
+                         [x.name for x in self.decl_map.decls_of(Function)])
+        self.assertEqual(['Color'],
+                         [x.type_name for x in self.decl_map.decls_of(Enum)])
+
+    def test_name(self) -> None:
+        inner = self.decl_map.decls_named('ns::Outer::Inner')
+        self.assertEqual(1, len(inner))
+        self.assertIsInstance(inner[0], Struct)
+        self.assertEqual([], self.decl_map.decls_named('Inner'))
+        self.assertEqual(1, len(self.decl_map.decls_named('Anonymous')))
+        self.assertEqual([], self.decl_map.decls_named('Color', Function))
+
+    def test_pickle(self) -> None:
+        loaded = pickle.loads(pickle.dumps(self.decl_map))
+        forward = loaded.decls_named('Forward')[0]
+        self.assertIs(loaded.decl_map[next(
+            k for k, v in loaded.decl_map.items() if v is forward)], forward)
+        # 読み込んだ後も登録できる
+        loaded.index.add(forward)
+        self.assertEqual(len(self.decl_map.index), len(loaded.index))
+
+
+if __name__ == '__main__':
+    unittest.main()
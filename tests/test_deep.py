@@ -0,0 +1,49 @@
+import unittest
+import pathlib
+import sys
+import tempfile
+import cpptypeinfo
+from cpptypeinfo.usertype import Struct, Typedef
+
+DEPTH = 3000
+
+
+class DeepTest(unittest.TestCase):
+    def test_typedef_chain(self) -> None:
+        '''
+        参照をたどる入れ子が Python の再帰の上限より深い
+        '''
+        self.assertLess(sys.getrecursionlimit(), DEPTH * 2)
+        with tempfile.TemporaryDirectory() as tmp:
+            dir = pathlib.Path(tmp)
+            lines = ['typedef int T0;']
+            for i in range(1, DEPTH + 1):
+                lines.append(f'typedef T{i-1} T{i};')
+            (dir / 'chain.h').write_text('\n'.join(lines))
+            (dir / 'a.h').write_text(
+                f'#include "chain.h"\nstruct A {{ T{DEPTH} value; }};\n')
+            decl_map = cpptypeinfo.parse_files(cpptypeinfo.TypeParser(),
+                                               dir / 'a.h',
+                                               profile='bindings-demand')
+
+        a = [
+            v for v in decl_map.decl_map.values() if isinstance(v, Struct)
+        ][0]
+        # typedef は短縮される
+        self.assertEqual(cpptypeinfo.Int32(), a.fields[0].typeref.ref)
+        typedefs = decl_map.parser.root_namespace.user_type_map
+        self.assertIsInstance(typedefs[f'T{DEPTH}'], Typedef)
+        self.assertIn('T0', typedefs)
+
+    def test_error(self) -> None:
+        '''
+        入れ子の task で起きた例外が伝わる
+        '''
+        parser = cpptypeinfo.TypeParser()
+        with self.assertRaises(NotImplementedError):
+            cpptypeinfo.parse_source(
+                parser, 'namespace n { template<typename T> using B = T; }')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import pathlib
+import tempfile
+import cpptypeinfo
+from cpptypeinfo.usertype import Struct
+
+OTHER = '''
+#pragma once
+struct Forward;
+typedef struct Used { int value; } Used;
+typedef int HANDLE;
+struct Unused { float value; };
+struct Forward { int x; };
+'''
+
+A = '''
+#include "other.h"
+struct A
+{
+    Used used;
+    HANDLE handle;
+    struct Forward *forward;
+};
+'''
+
+
+class DemandTest(unittest.TestCase):
+    def test_demand(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dir = pathlib.Path(tmp)
+            (dir / 'other.h').write_text(OTHER)
+            (dir / 'a.h').write_text(A)
+            decl_map = cpptypeinfo.parse_files(cpptypeinfo.TypeParser(),
+                                               dir / 'a.h',
+                                               profile='bindings-demand')
+
+        structs = {
+            v.type_name: v
+            for v in decl_map.decl_map.values() if isinstance(v, Struct)
+        }
+        self.assertIn('A', structs)
+        self.assertIn('Used', structs)
+        self.assertNotIn('Unused', structs)
+
+        a = structs['A']
+        self.assertIs(structs['Used'], a.fields[0].typeref.ref)
+        self.assertEqual(1, len(structs['Used'].fields))
+        # 前方宣言ではなく定義が parse される
+        forward = a.fields[2].typeref.ref.typeref.ref
+        self.assertEqual(1, len(forward.fields))
+
+    def test_source(self) -> None:
+        decl_map = cpptypeinfo.parse_source(cpptypeinfo.TypeParser(),
+                                            'struct A{ int x; };',
+                                            profile='bindings-demand')
+        self.assertEqual(['A'], [
+            v.type_name for v in decl_map.decl_map.values()
+            if isinstance(v, Struct)
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+import cpptypeinfo
+
+SOURCE = '''
+#include <not_exists.h>
+struct A
+{
+    int value;
+};
+'''
+
+
+class DiagnosticsTest(unittest.TestCase):
+    def test_strict(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        with cpptypeinfo.ParseSession(strict=True) as session:
+            with self.assertRaises(cpptypeinfo.DiagnosticError) as cm:
+                cpptypeinfo.parse_source(parser, SOURCE, session=session)
+        self.assertEqual(1, len(cm.exception.diagnostics))
+        self.assertIn('not_exists.h', str(cm.exception))
+
+    def test_not_strict(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        decl_map = cpptypeinfo.parse_source(parser, SOURCE)
+        self.assertEqual(1, len(decl_map.decl_map))
+
+
+if __name__ == '__main__':
+    unittest.main()
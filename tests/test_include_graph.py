@@ -0,0 +1,60 @@
+import unittest
+import os
+import pathlib
+import tempfile
+import cpptypeinfo
+from cpptypeinfo.include_graph import IncludeGraph
+
+
+class IncludeGraphTest(unittest.TestCase):
+    def test_graph(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dir = pathlib.Path(tmp)
+            a_h = dir / 'a.h'
+            a_h.write_text('#include "b.h"\nstruct A{ B b; };')
+            b_h = dir / 'b.h'
+            b_h.write_text('struct B{ int value; };')
+            c_h = dir / 'c.h'
+            c_h.write_text('struct C{ int value; };')
+
+            parser = cpptypeinfo.TypeParser()
+            decl_map = cpptypeinfo.parse_files(parser, a_h, c_h)
+            graph = decl_map.include_graph
+            self.assertEqual({b_h}, graph.includes_of(a_h))
+            self.assertIn(a_h, graph.includers_of(b_h))
+            self.assertNotIn(c_h, graph.includers_of(b_h))
+            # 必要になるまで hash しない
+            self.assertNotIn(b_h, graph.hashes)
+
+            structs = {
+                x.type_name: x
+                for x in decl_map.decl_map.values()
+            }
+            self.assertEqual({a_h, b_h},
+                             decl_map.headers_affecting(structs['A']))
+            self.assertEqual({b_h}, decl_map.headers_affecting(structs['B']))
+
+            affected = decl_map.decls_affected_by(b_h)
+            self.assertIn(structs['A'], affected)
+            self.assertIn(structs['B'], affected)
+            self.assertNotIn(structs['C'], affected)
+            self.assertNotIn(structs['B'], decl_map.decls_affected_by(a_h))
+
+            # parse した後の変更は、hash する前でも分かる
+            b_h.write_text('struct B{ float value; };')
+            self.assertEqual([b_h], graph.get_changed())
+            graph.hash_files()
+            self.assertNotIn(b_h, graph.hashes)
+            self.assertIn(a_h, graph.hashes)
+
+            # touch しただけなら変わっていない
+            stat = os.stat(a_h)
+            os.utime(a_h, (stat.st_atime, stat.st_mtime + 1))
+            self.assertEqual([b_h], graph.get_changed())
+
+            restored = IncludeGraph.from_dict(graph.to_dict())
+            self.assertEqual(graph.edges, restored.edges)
+
+
+if __name__ == '__main__':
+    unittest.main()
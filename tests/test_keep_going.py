@@ -0,0 +1,45 @@
+import unittest
+import cpptypeinfo
+from cpptypeinfo.usertype import Struct, Function
+
+SOURCE = '''
+template<class T> struct V { T x; };
+struct A { V<int> v; int y; };
+typedef decltype(1) D;
+namespace ns { struct B { D d; A a; }; }
+int f(A *a, int i);
+'''
+
+
+class KeepGoingTest(unittest.TestCase):
+    def test_raise(self) -> None:
+        with self.assertRaises(Exception):
+            cpptypeinfo.parse_source(cpptypeinfo.TypeParser(), SOURCE)
+
+    def test_keep_going(self) -> None:
+        decl_map = cpptypeinfo.parse_source(cpptypeinfo.TypeParser(),
+                                            SOURCE,
+                                            keep_going=True)
+        self.assertEqual([('FIELD_DECL', 'v', 3), ('TYPEDEF_DECL', 'D', 4)],
+                         [(x.kind, x.name, x.line)
+                          for x in decl_map.failures])
+        a = decl_map.decls_named('A')[0]
+        # 失敗した field は placeholder にして、残りの field も parse する
+        self.assertEqual(['v', 'y'], [x.name for x in a.fields])
+        self.assertEqual('V<int>', a.fields[0].typeref.ref.type_name)
+        # 失敗した typedef の代わりに中身の無い struct を登録する
+        d = decl_map.decls_named('D')[0]
+        self.assertIsInstance(d, Struct)
+        self.assertTrue(d.is_forward_decl())
+        b = decl_map.decls_named('ns::B')[0]
+        self.assertIs(d, b.fields[0].typeref.ref)
+        self.assertIs(a, b.fields[1].typeref.ref)
+        # 後の宣言も parse する
+        self.assertEqual(['f'],
+                         [x.name for x in decl_map.decls_of(Function)])
+        self.assertIn('TYPEDEF_DECL D',
+                      cpptypeinfo.format_failures(decl_map.failures))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import cpptypeinfo
+
+SOURCE = '''#define VERSION 7
+#define MAX(a, b) ((a) > (b) ? (a) : (b))
+#define FLAGS (1 | \\
+               2)
+#define INTERFACE ID3DInclude
+#define __header__
+  #  define INDENT 0x10
+int x; // #define COMMENT 1
+struct A { int x; };
+'''
+
+
+class MacroScanTest(unittest.TestCase):
+    def test_scan(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        decl_map = cpptypeinfo.parse_source(parser,
+                                            SOURCE,
+                                            profile='bindings-fast',
+                                            macros=True)
+        macros = [(x.name, x.value, x.line)
+                  for x in decl_map.macro_definitions]
+        self.assertEqual([
+            ('VERSION', '7', 1),
+            ('FLAGS', '( 1 | 2 )', 3),
+            ('INDENT', '0x10', 7),
+        ], macros)
+        # 宣言も parse する
+        self.assertIn('A', [
+            getattr(x, 'type_name', None) for x in decl_map.decl_map.values()
+        ])
+
+    def test_crlf(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        decl_map = cpptypeinfo.parse_source(parser,
+                                            SOURCE.replace('\n', '\r\n'),
+                                            profile='bindings-fast',
+                                            macros=True)
+        self.assertEqual([('VERSION', 1), ('FLAGS', 3), ('INDENT', 7)],
+                         [(x.name, x.line)
+                          for x in decl_map.macro_definitions])
+
+    def test_names(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        decl_map = cpptypeinfo.parse_source(parser,
+                                            SOURCE,
+                                            profile='bindings-fast',
+                                            macros=['FLAGS'])
+        self.assertEqual(['FLAGS'],
+                         [x.name for x in decl_map.macro_definitions])
+
+    def test_same_as_detailed_record(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        decl_map = cpptypeinfo.parse_source(parser,
+                                            SOURCE,
+                                            profile='with-macros',
+                                            macros=True)
+        # 重複しない
+        names = [x.name for x in decl_map.macro_definitions]
+        self.assertEqual(len(set(names)), len(names))
+        self.assertIn('VERSION', names)
+
+
+if __name__ == '__main__':
+    unittest.main()
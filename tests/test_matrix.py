@@ -0,0 +1,79 @@
+import unittest
+import pathlib
+import tempfile
+import cpptypeinfo
+
+SOURCE = '''
+struct A
+{
+    void *p;
+    int value;
+};
+#ifdef USE_B
+struct B
+{
+    int value;
+};
+#endif
+struct C
+{
+    int value;
+};
+'''
+
+LONG = '''
+struct L { long x; unsigned long y; wchar_t c; };
+struct I { int x; };
+'''
+
+
+class MatrixTest(unittest.TestCase):
+    def test_config(self) -> None:
+        config = cpptypeinfo.ParseConfig.parse(
+            'x86@i686-pc-windows-msvc=-DA,-DB')
+        self.assertEqual('x86', config.name)
+        self.assertEqual('i686-pc-windows-msvc', config.target)
+        self.assertEqual(['-DA', '-DB'], config.cpp_flags)
+
+    def test_matrix(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            header = pathlib.Path(tmp) / 'a.h'
+            header.write_text(SOURCE)
+
+            configs = [
+                cpptypeinfo.ParseConfig('x64'),
+                cpptypeinfo.ParseConfig('x86', ['-DUSE_B'],
+                                        'i686-pc-windows-msvc'),
+            ]
+            decl_maps = cpptypeinfo.parse_matrix(header, configs=configs)
+            self.assertEqual(['x64', 'x86'], list(decl_maps.keys()))
+
+            diffs = {
+                x.name: x
+                for x in cpptypeinfo.diff_decl_maps(decl_maps)
+            }
+            self.assertEqual({'A', 'B'}, set(diffs.keys()))
+            self.assertIsNone(diffs['B'].signatures['x64'])
+            self.assertIn('@8', diffs['A'].signatures['x64'])
+            self.assertIn('@4', diffs['A'].signatures['x86'])
+
+
+    def test_target_size(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            header = pathlib.Path(tmp) / 'a.h'
+            header.write_text(LONG)
+
+            configs = [
+                cpptypeinfo.ParseConfig('win'),
+                cpptypeinfo.ParseConfig('lin', [], 'x86_64-linux-gnu'),
+            ]
+            decl_maps = cpptypeinfo.parse_matrix(header, configs=configs)
+            diffs = cpptypeinfo.diff_decl_maps(decl_maps)
+            self.assertEqual(['L'], [x.name for x in diffs])
+            self.assertEqual(
+                'struct L{Int64 x@0; UInt64 y@8; UInt32 c@16;}',
+                diffs[0].signatures['lin'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import io
+import json
+import pathlib
+import tempfile
+import cpptypeinfo
+
+SOURCE = '''
+#define VERSION 3
+struct Texture;
+struct Device
+{
+    virtual int CreateTexture(struct Texture **texture) = 0;
+};
+typedef enum FORMAT { FORMAT_UNKNOWN = 0, FORMAT_R8 = 61 } FORMAT;
+struct Texture { FORMAT format; int width; };
+'''
+
+
+class NdjsonTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp.name) / 'a.h'
+        self.path.write_text(SOURCE)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def parse(self) -> list:
+        out = io.StringIO()
+        writer = cpptypeinfo.NdjsonWriter(out)
+        decl_map = cpptypeinfo.parse_files(cpptypeinfo.TypeParser(),
+                                           self.path,
+                                           macros=True,
+                                           on_decl=writer.on_decl)
+        # parse 中に書いている
+        self.assertNotEqual('', out.getvalue())
+        writer.write_rest(decl_map)
+        self.decl_map = decl_map
+        return [json.loads(x) for x in out.getvalue().splitlines()]
+
+    def test_stream(self) -> None:
+        lines = self.parse()
+        ids = [x['id'] for x in lines if 'id' in x]
+        self.assertEqual(len(ids), len(set(ids)))
+        by_name = {x['name']: x for x in lines}
+        # 前方宣言は定義してから書く
+        texture = by_name['Texture']
+        self.assertEqual(['format', 'width'],
+                         [x['name'] for x in texture['fields']])
+        self.assertEqual(by_name['FORMAT']['id'],
+                         texture['fields'][0]['type']['ref'])
+        method = by_name['Device']['methods'][0]
+        self.assertEqual(
+            texture['id'],
+            method['params'][0]['type']['pointer']['pointer']['ref'])
+        self.assertEqual([('FORMAT_UNKNOWN', 0), ('FORMAT_R8', 61)],
+                         [(x['name'], x['value'])
+                          for x in by_name['FORMAT']['values']])
+        self.assertEqual({
+            'kind': 'macro',
+            'name': 'VERSION',
+            'value': '3',
+            'file': str(self.path),
+            'line': 2
+        }, lines[-1])
+
+    def test_primitive_typedef(self) -> None:
+        out = io.StringIO()
+        decl_map = cpptypeinfo.parse_source(cpptypeinfo.TypeParser(),
+                                            'typedef int A; typedef int B;')
+        cpptypeinfo.dump_ndjson(decl_map, out)
+        lines = [json.loads(x) for x in out.getvalue().splitlines()]
+        # 同じ primitive の typedef も一つずつ書く
+        self.assertEqual([('typedef', 'A', {
+            'primitive': 'Int32'
+        }), ('typedef', 'B', {
+            'primitive': 'Int32'
+        })], [(x['kind'], x['name'], x['type']) for x in lines])
+        self.assertEqual(['A'],
+                         [x.type_name for x in decl_map.decls_named('A')])
+
+    def test_snapshot(self) -> None:
+        lines = self.parse()
+        snapshot_path = pathlib.Path(self.tmp.name) / 'a.bin'
+        cpptypeinfo.save_snapshot(self.decl_map, snapshot_path)
+        snapshot = cpptypeinfo.load_snapshot(snapshot_path)
+        out = io.StringIO()
+        cpptypeinfo.dump_ndjson(snapshot, out)
+        loaded = [json.loads(x) for x in out.getvalue().splitlines()]
+        key = lambda x: (x['kind'], x.get('id'), x['name'])  # noqa
+        self.assertEqual(sorted(lines, key=key), sorted(loaded, key=key))
+
+
+if __name__ == '__main__':
+    unittest.main()
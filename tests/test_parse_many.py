@@ -0,0 +1,45 @@
+import unittest
+import pathlib
+import tempfile
+import threading
+import cpptypeinfo
+from cpptypeinfo.usertype import Struct
+
+
+class ParseManyTest(unittest.TestCase):
+    def test_parse_many(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            header_sets = []
+            for i in range(8):
+                header = pathlib.Path(tmp) / f'h{i}.h'
+                fields = ''.join(f'int f{j};' for j in range(i + 1))
+                header.write_text(f'struct S{i}{{ {fields} }};')
+                header_sets.append([header])
+
+            with cpptypeinfo.ParseSession(
+                    cache_dir=pathlib.Path(tmp) / 'cache') as session:
+                decl_maps = cpptypeinfo.parse_many(header_sets,
+                                                   session=session,
+                                                   max_workers=4)
+
+        self.assertEqual(8, len(decl_maps))
+        for i, decl_map in enumerate(decl_maps):
+            structs = [
+                x for x in decl_map.decl_map.values()
+                if isinstance(x, Struct)
+            ]
+            self.assertEqual(f'S{i}', structs[0].type_name)
+            self.assertEqual(i + 1, len(structs[0].fields))
+
+    def test_index_per_thread(self) -> None:
+        session = cpptypeinfo.ParseSession()
+        indices = []
+        t = threading.Thread(target=lambda: indices.append(session.index))
+        t.start()
+        t.join()
+        self.assertIs(session.index, session.index)
+        self.assertIsNot(session.index, indices[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import pathlib
+import cpptypeinfo
+from cpptypeinfo.usertype import Struct
+
+
+class ParseSourcesTest(unittest.TestCase):
+    def test_unsaved(self) -> None:
+        tu = cpptypeinfo.get_tu_from_source('int x=123;')
+        # no temporary file
+        self.assertFalse(pathlib.Path(tu.spelling).exists())
+        children = [x for x in tu.cursor.get_children()]
+        self.assertEqual('x', children[0].spelling)
+
+    def test_batch(self) -> None:
+        decl_maps = cpptypeinfo.parse_sources([
+            'struct A{ int a; };',
+            'struct A{ float a; float b; };',
+            'typedef int B;',
+        ])
+        self.assertEqual(3, len(decl_maps))
+
+        a0 = [x for x in decl_maps[0].decl_map.values()][0]
+        a1 = [x for x in decl_maps[1].decl_map.values()][0]
+        self.assertIsInstance(a0, Struct)
+        self.assertEqual(1, len(a0.fields))
+        self.assertEqual(2, len(a1.fields))
+        self.assertIsNot(decl_maps[0].parser, decl_maps[1].parser)
+
+        self.assertIn('B', decl_maps[2].parser.root_namespace.user_type_map)
+
+    def test_release_source(self) -> None:
+        session = cpptypeinfo.ParseSession()
+        cpptypeinfo.parse_sources(['struct A{ int a; };', 'typedef int B;'],
+                                  session=session)
+        # parse した source は session に残さない
+        self.assertEqual(0, len(session.source_reader))
+
+        # 失敗しても残さない
+        session = cpptypeinfo.ParseSession(strict=True)
+        with self.assertRaises(cpptypeinfo.DiagnosticError):
+            cpptypeinfo.parse_source(cpptypeinfo.TypeParser(),
+                                     'struct A{ unknown a; };',
+                                     session=session)
+        self.assertEqual(0, len(session.source_reader))
+
+
+if __name__ == '__main__':
+    unittest.main()
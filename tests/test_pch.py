@@ -0,0 +1,75 @@
+import unittest
+import pathlib
+import tempfile
+import cpptypeinfo
+
+PREFIX = '''#pragma once
+struct A
+{
+    int value;
+};
+typedef A B;
+'''
+
+SOURCE = '''#pragma once
+struct C
+{
+    B b;
+};
+'''
+
+
+class PchTest(unittest.TestCase):
+    def test_pch(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dir = pathlib.Path(tmp)
+            prefix_h = dir / 'prefix.h'
+            prefix_h.write_text(PREFIX)
+            source_h = dir / 'source.h'
+            source_h.write_text(SOURCE)
+            pch = cpptypeinfo.PchPrefix('test', [prefix_h])
+
+            pch_path = pch.build(dir / 'cache')
+            self.assertTrue(pch_path.exists())
+            # reuse
+            self.assertEqual(pch_path, pch.build(dir / 'cache'))
+
+            parser = cpptypeinfo.TypeParser()
+            decl_map = cpptypeinfo.parse_files(parser,
+                                               prefix_h,
+                                               source_h,
+                                               cache_dir=dir / 'cache',
+                                               pch=pch)
+            structs = {
+                x.type_name: x
+                for x in decl_map.decl_map.values()
+                if isinstance(x, cpptypeinfo.usertype.Struct)
+            }
+            self.assertIn('A', structs)
+            self.assertEqual(structs['A'], structs['C'].fields[0].typeref.ref)
+
+    def test_target(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dir = pathlib.Path(tmp)
+            prefix_h = dir / 'prefix.h'
+            prefix_h.write_text(PREFIX)
+            source_h = dir / 'source.h'
+            source_h.write_text(SOURCE)
+            pch = cpptypeinfo.PchPrefix('test', [prefix_h])
+
+            x64 = pch.build(dir / 'cache')
+            session = cpptypeinfo.ParseSession(target='i686-pc-windows-msvc')
+            x86 = pch.build(dir / 'cache', session=session)
+            self.assertNotEqual(x64, x86)
+            decl_map = cpptypeinfo.parse_files(cpptypeinfo.TypeParser(),
+                                               prefix_h,
+                                               source_h,
+                                               cache_dir=dir / 'cache',
+                                               pch=pch,
+                                               session=session)
+            self.assertEqual(['A'],
+                             [x.type_name for x in decl_map.decls_named('A')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+import cpptypeinfo
+from cpptypeinfo.usertype import Struct
+
+
+class PrimitiveTest(unittest.TestCase):
+    def test_interned(self) -> None:
+        decl_map = cpptypeinfo.parse_source(
+            cpptypeinfo.TypeParser(),
+            'struct A { int a; int b; const int c; float d; };')
+        a = [
+            v for v in decl_map.decl_map.values() if isinstance(v, Struct)
+        ][0]
+        self.assertIs(a.fields[0].typeref, a.fields[1].typeref)
+        self.assertEqual(cpptypeinfo.Int32(), a.fields[2].typeref.ref)
+        self.assertTrue(a.fields[2].typeref.is_const)
+        self.assertIsNot(a.fields[0].typeref, a.fields[2].typeref)
+        self.assertEqual(cpptypeinfo.Float(), a.fields[3].typeref.ref)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import cpptypeinfo
+
+SOURCE = '''
+#define VERSION 7
+inline int func(int a)
+{
+    return a + 1;
+}
+'''
+
+
+class ProfileTest(unittest.TestCase):
+    def test_bindings_fast(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        decl_map = cpptypeinfo.parse_source(parser,
+                                            SOURCE,
+                                            profile='bindings-fast')
+        func = parser.root_namespace.functions[0]
+        self.assertEqual('func', func.name)
+        self.assertFalse(func.has_body)
+        self.assertEqual(0, len(decl_map.macro_definitions))
+
+    def test_full(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        decl_map = cpptypeinfo.parse_source(parser, SOURCE, profile='full')
+        func = parser.root_namespace.functions[0]
+        self.assertTrue(func.has_body)
+        macros = [(x.name, x.value) for x in decl_map.macro_definitions]
+        self.assertIn(('VERSION', '7'), macros)
+
+    def test_unknown(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        with self.assertRaises(KeyError):
+            cpptypeinfo.parse_source(parser, SOURCE, profile='unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import pathlib
+import cpptypeinfo
+
+SOURCE = '''
+struct A
+{
+    void *p;
+    int value;
+};
+'''
+
+
+class SessionTest(unittest.TestCase):
+    def test_target(self) -> None:
+        with cpptypeinfo.ParseSession() as session:
+            parser = cpptypeinfo.TypeParser()
+            decl_map = cpptypeinfo.parse_source(parser,
+                                                SOURCE,
+                                                session=session)
+            a = [x for x in decl_map.decl_map.values()][0]
+            self.assertEqual(8, a.fields[1].offset)
+
+        with cpptypeinfo.ParseSession(target='i686-pc-windows-msvc') as session:
+            parser = cpptypeinfo.TypeParser()
+            decl_map = cpptypeinfo.parse_source(parser,
+                                                SOURCE,
+                                                session=session)
+            a = [x for x in decl_map.decl_map.values()][0]
+            self.assertEqual(4, a.fields[1].offset)
+
+    def test_clear(self) -> None:
+        session = cpptypeinfo.ParseSession()
+        with session:
+            session.source_reader.set(pathlib.Path('dummy'), b'')
+        self.assertEqual(0, len(session.source_reader))
+
+
+if __name__ == '__main__':
+    unittest.main()
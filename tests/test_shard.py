@@ -0,0 +1,120 @@
+import unittest
+import pathlib
+import pickle
+import tempfile
+import cpptypeinfo
+from cpptypeinfo.usertype import Struct, Enum, Pointer, Typedef
+from cpptypeinfo.shard import split_shards
+
+COMMON = '''
+#pragma once
+typedef struct GUID { unsigned long Data1; } GUID;
+enum FORMAT { FORMAT_UNKNOWN, FORMAT_R8 };
+typedef int HANDLE;
+'''
+
+A = '''
+#include "common.h"
+struct A { GUID id; FORMAT format; };
+'''
+
+B = '''
+#include "common.h"
+struct B { GUID *id; FORMAT format; };
+'''
+
+TYPEDEF = '''
+#include "common.h"
+typedef GUID MyGuid;
+struct C { MyGuid id; };
+'''
+
+
+def find(decl_map, t, name):
+    for v in decl_map.decl_map.values():
+        if isinstance(v, t) and v.type_name == name:
+            return v
+
+
+class ShardTest(unittest.TestCase):
+    def test_split(self) -> None:
+        paths = [pathlib.Path(f'{i}.h') for i in range(5)]
+        shards = split_shards(paths, 2)
+        self.assertEqual(2, len(shards))
+        self.assertEqual(paths, shards[0] + shards[1])
+        self.assertEqual(1, len(split_shards(paths[:1], 4)))
+
+    def test_usr_key(self) -> None:
+        decl_map = cpptypeinfo.parse_source(cpptypeinfo.TypeParser(),
+                                            'struct S{ int a; };')
+        self.assertIn('c:@S@S', decl_map.decl_map)
+
+    def test_sharded(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dir = pathlib.Path(tmp)
+            (dir / 'common.h').write_text(COMMON)
+            (dir / 'a.h').write_text(A)
+            (dir / 'b.h').write_text(B)
+
+            decl_map = cpptypeinfo.parse_sharded(dir / 'a.h',
+                                                 dir / 'b.h',
+                                                 jobs=2)
+
+        a = find(decl_map, Struct, 'A')
+        b = find(decl_map, Struct, 'B')
+        self.assertIsNotNone(a)
+        self.assertIsNotNone(b)
+        # 共通の型は一つにまとまる
+        guids = {
+            id(v): v
+            for v in decl_map.decl_map.values()
+            if isinstance(v, Struct) and v.type_name == 'GUID'
+        }
+        self.assertEqual(1, len(guids))
+        guid = list(guids.values())[0]
+        self.assertIs(guid, a.fields[0].typeref.ref)
+        b_id = b.fields[0].typeref.ref
+        self.assertIsInstance(b_id, Pointer)
+        self.assertIs(guid, b_id.typeref.ref)
+        self.assertIs(a.fields[1].typeref.ref, b.fields[1].typeref.ref)
+        self.assertIsInstance(find(decl_map, Enum, 'FORMAT'), Enum)
+        # index も一つにまとまる
+        self.assertEqual([guid], decl_map.decls_named('GUID'))
+        handle = decl_map.decls_named('HANDLE')
+        self.assertEqual(1, len(handle))
+        self.assertIs(handle[0],
+                      decl_map.parser.root_namespace.user_type_map['HANDLE'])
+
+    def test_sharded_typedef(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dir = pathlib.Path(tmp)
+            (dir / 'common.h').write_text(COMMON)
+            (dir / 'a.h').write_text(A)
+            (dir / 'b.h').write_text(TYPEDEF)
+
+            decl_map = cpptypeinfo.parse_sharded(dir / 'a.h',
+                                                 dir / 'b.h',
+                                                 jobs=2)
+
+        guid = find(decl_map, Struct, 'GUID')
+        self.assertIs(guid, find(decl_map, Struct, 'A').fields[0].typeref.ref)
+        # 後の shard にしか無い key も、まとめた方の型を指す
+        my_guid = [
+            v for k, v in decl_map.decl_map.items() if k.endswith('@MyGuid')
+        ]
+        self.assertEqual([guid], my_guid)
+        typedef = decl_map.parser.root_namespace.user_type_map['MyGuid']
+        self.assertIsInstance(typedef, Typedef)
+        self.assertIs(guid, typedef.typeref.ref)
+        self.assertIs(guid, find(decl_map, Struct, 'C').fields[0].typeref.ref)
+
+    def test_pickle(self) -> None:
+        decl_map = cpptypeinfo.parse_source(cpptypeinfo.TypeParser(),
+                                            'struct S{ int a; };')
+        loaded = pickle.loads(pickle.dumps(decl_map))
+        self.assertEqual(1, len(loaded.decl_map))
+        self.assertIsNotNone(loaded.source_reader)
+
+
+if __name__ == '__main__':
+    unittest.main()
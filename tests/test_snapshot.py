@@ -0,0 +1,141 @@
+import unittest
+import pathlib
+import pickle
+import subprocess
+import sys
+import tempfile
+import zlib
+import cpptypeinfo
+from cpptypeinfo.usertype import Struct, Pointer
+
+COMMON = '''
+#pragma once
+typedef struct GUID { unsigned long Data1; } GUID;
+'''
+
+A = '''
+#include "common.h"
+#define VERSION 7
+struct A
+{
+    GUID id;
+    GUID *ids;
+};
+'''
+
+LOAD = '''
+import sys
+import pathlib
+sys.modules['clang'] = None
+import cpptypeinfo
+snapshot = cpptypeinfo.load_snapshot(pathlib.Path(sys.argv[1]))
+print(cpptypeinfo.HAS_LIBCLANG, snapshot.decls_named('A')[0].type_name)
+'''
+
+CLI = '''
+import sys
+sys.modules['clang'] = None
+from cpptypeinfo import cli
+cli.main()
+'''
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.tmp.name)
+        (self.dir / 'common.h').write_text(COMMON)
+        (self.dir / 'a.h').write_text(A)
+        self.decl_map = cpptypeinfo.parse_files(cpptypeinfo.TypeParser(),
+                                                self.dir / 'a.h',
+                                                macros=True)
+        self.path = self.dir / 'snapshot/a.bin'
+        cpptypeinfo.save_snapshot(self.decl_map, self.path)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_load(self) -> None:
+        snapshot = cpptypeinfo.load_snapshot(self.path,
+                                             files=[self.dir / 'a.h'])
+        self.assertIsNotNone(snapshot)
+        a = snapshot.decls_named('A', Struct)[0]
+        guid = snapshot.decls_named('GUID', Struct)[0]
+        # 共有していた型は共有したまま
+        self.assertIs(guid, a.fields[0].typeref.ref)
+        ids = a.fields[1].typeref.ref
+        self.assertIsInstance(ids, Pointer)
+        self.assertIs(guid, ids.typeref.ref)
+        self.assertEqual(len(self.decl_map.decl_map), len(snapshot.decl_map))
+        self.assertEqual(['VERSION'],
+                         [x.name for x in snapshot.macro_definitions])
+        self.assertIn('GUID', snapshot.parser.root_namespace.user_type_map)
+
+    def test_invalidate(self) -> None:
+        self.assertIsNone(
+            cpptypeinfo.load_snapshot(self.path, files=[self.dir / 'b.h']))
+        (self.dir / 'common.h').write_text(COMMON + 'struct B { int x; };\n')
+        self.assertIsNone(cpptypeinfo.load_snapshot(self.path))
+        self.assertIsNotNone(cpptypeinfo.load_snapshot(self.path, check=False))
+
+    def test_changed_before_save(self) -> None:
+        decl_map = cpptypeinfo.parse_files(cpptypeinfo.TypeParser(),
+                                           self.dir / 'a.h')
+        (self.dir / 'common.h').write_text(COMMON + 'struct B { int x; };\n')
+        cpptypeinfo.save_snapshot(decl_map, self.path)
+        # parse した後の変更を、保存したときの内容として記録しない
+        self.assertIsNone(cpptypeinfo.load_snapshot(self.path))
+
+    def test_version(self) -> None:
+        snapshot = cpptypeinfo.load_snapshot(self.path)
+        self.path.write_bytes(
+            zlib.compress(pickle.dumps((0, None, snapshot))))
+        self.assertIsNone(cpptypeinfo.load_snapshot(self.path))
+        self.path.write_bytes(b'broken')
+        self.assertIsNone(cpptypeinfo.load_snapshot(self.path))
+
+    def test_key(self) -> None:
+        key = cpptypeinfo.get_snapshot_key({'profile': 'default'})
+        cpptypeinfo.save_snapshot(self.decl_map, self.path, key)
+        self.assertIsNotNone(cpptypeinfo.load_snapshot(self.path, key=key))
+        # 違う設定で parse した snapshot は使わない
+        other = cpptypeinfo.get_snapshot_key({'profile': 'with-macros'})
+        self.assertIsNone(cpptypeinfo.load_snapshot(self.path, key=other))
+
+    def test_without_libclang(self) -> None:
+        root = pathlib.Path(__file__).parent.parent
+        output = subprocess.check_output(
+            [sys.executable, '-c', LOAD, str(self.path)], cwd=root)
+        self.assertEqual('False A', output.decode('utf-8').strip())
+
+    def test_cli_without_libclang(self) -> None:
+        root = pathlib.Path(__file__).parent.parent
+        snapshot = self.dir / 'cli.bin'
+        args = [
+            'dump', '--header',
+            str(self.dir / 'a.h'), '--snapshot',
+            str(snapshot), '-o'
+        ]
+        subprocess.check_call(
+            [sys.executable, '-m', 'cpptypeinfo.cli'] + args +
+            [str(self.dir / 'a.ndjson')],
+            cwd=root)
+        subprocess.check_call([sys.executable, '-c', CLI] + args +
+                              [str(self.dir / 'b.ndjson')],
+                              cwd=root)
+        self.assertEqual((self.dir / 'a.ndjson').read_text(),
+                         (self.dir / 'b.ndjson').read_text())
+        subprocess.check_output([sys.executable, '-c', CLI, 'gen', '--help'],
+                                cwd=root)
+        # snapshot が使えなければ parse できない
+        result = subprocess.run([sys.executable, '-c', CLI] + args[:-3] +
+                                ['--macros', '-o',
+                                 str(self.dir / 'c.ndjson')],
+                                cwd=root,
+                                stderr=subprocess.PIPE)
+        self.assertNotEqual(0, result.returncode)
+        self.assertIn(b'libclang is required', result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
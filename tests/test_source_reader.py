@@ -0,0 +1,77 @@
+import unittest
+import pathlib
+import tempfile
+from cpptypeinfo.session import SourceReader
+
+
+class SourceReaderTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.tmp.name)
+        self.paths = []
+        for i in range(3):
+            path = self.dir / f'{i}.h'
+            path.write_bytes(f'struct S{i} {{ int value; }};'.encode('ascii'))
+            self.paths.append(path)
+        self.empty = self.dir / 'empty.h'
+        self.empty.write_bytes(b'')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_slice(self) -> None:
+        reader = SourceReader()
+        self.assertEqual(b'S0', reader.slice(self.paths[0], 7, 9))
+        self.assertEqual(25, reader.get_size(self.paths[0]))
+        self.assertEqual(0, reader.get_size(self.empty))
+        self.assertEqual(b'', reader.slice(self.empty, 0, 10))
+        reader.clear()
+        self.assertEqual(0, len(reader))
+
+    def test_find(self) -> None:
+        reader = SourceReader()
+        self.assertEqual(7, reader.find(self.paths[0], b'S0'))
+        self.assertEqual(-1, reader.find(self.paths[0], b'define'))
+        self.assertEqual([3, 19], reader.find_all(self.paths[0], b'u'))
+        self.assertEqual([], reader.find_all(self.empty, b'\n'))
+
+    def test_max_files(self) -> None:
+        reader = SourceReader(max_files=2)
+        for path in self.paths:
+            reader.slice(path, 0, 6)
+        self.assertEqual(2, len(reader))
+        # 古いものから閉じる
+        self.assertNotIn(self.paths[0], reader)
+        self.assertIn(self.paths[2], reader)
+        # 閉じたものは開き直す
+        self.assertEqual(b'S0', reader.slice(self.paths[0], 7, 9))
+        reader.release()
+
+    def test_max_bytes(self) -> None:
+        reader = SourceReader(max_bytes=40)
+        reader.slice(self.paths[0], 0, 6)
+        reader.slice(self.paths[1], 0, 6)
+        self.assertEqual(1, len(reader))
+        self.assertEqual(25, reader.mapped_bytes)
+        reader.release()
+        self.assertEqual(0, reader.mapped_bytes)
+
+    def test_unsaved(self) -> None:
+        reader = SourceReader(max_files=1)
+        path = self.dir / 'unsaved.h'
+        reader.set(path, b'int x;')
+        reader.slice(self.paths[0], 0, 6)
+        reader.slice(self.paths[1], 0, 6)
+        # unsaved file は閉じない
+        reader.release()
+        self.assertEqual(b'x', reader.slice(path, 4, 5))
+        # file より unsaved を優先する
+        reader.set(self.paths[0], b'int y;')
+        self.assertEqual(b'y', reader.slice(self.paths[0], 4, 5))
+        reader.pop(self.paths[0])
+        self.assertEqual(b'S0', reader.slice(self.paths[0], 7, 9))
+        reader.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
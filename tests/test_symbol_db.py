@@ -0,0 +1,103 @@
+import unittest
+import pathlib
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import cpptypeinfo
+
+SOURCE = '''
+typedef enum FORMAT { FORMAT_UNKNOWN = 0, FORMAT_R8 = 61 } FORMAT;
+typedef struct Desc { int width; int height; FORMAT format; } Desc;
+struct Device
+{
+    virtual int CreateTexture(const Desc *desc, struct Texture **texture) = 0;
+};
+struct Texture { Desc desc; };
+struct Texture2 : public Texture { int mips; };
+typedef int HANDLE;
+namespace ns { int CreateDevice(Device **device, HANDLE handle); }
+'''
+
+QUERY = '''
+import sys
+sys.modules['clang'] = None
+from cpptypeinfo import cli
+cli.main()
+'''
+
+
+class SymbolDbTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp.name) / 'index.db'
+        decl_map = cpptypeinfo.parse_source(cpptypeinfo.TypeParser(), SOURCE)
+        cpptypeinfo.write_symbol_db(decl_map, self.path)
+        self.db = cpptypeinfo.open_symbol_db(self.path)
+
+    def tearDown(self) -> None:
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_name(self) -> None:
+        decls = cpptypeinfo.find_decls(self.db, 'ns::CreateDevice')
+        self.assertEqual(['function'], [x.kind for x in decls])
+        self.assertEqual(decls, cpptypeinfo.find_decls(self.db,
+                                                       'CreateDevice'))
+        # typedef の名前でも引ける
+        self.assertEqual([('typedef', 'HANDLE')], [
+            (x.kind, x.name)
+            for x in cpptypeinfo.find_decls(self.db, 'HANDLE')
+        ])
+        values = cpptypeinfo.find_enum_values(self.db, 'FORMAT_R8')
+        self.assertEqual([('FORMAT', 'FORMAT_R8', 61)], values)
+        self.assertEqual([], cpptypeinfo.find_decls(self.db, 'Unknown'))
+
+    def test_usage(self) -> None:
+        usages = cpptypeinfo.find_usages(self.db, 'Device')
+        self.assertEqual([('CreateDevice', 'param', 'device')],
+                         [(x.decl.name, x.role, x.detail) for x in usages])
+        usages = cpptypeinfo.find_usages(self.db, 'Desc')
+        self.assertEqual([('CreateTexture', 'method', 'param', 'desc'),
+                          ('Texture', 'struct', 'field', 'desc')],
+                         sorted((x.decl.name, x.decl.kind, x.role, x.detail)
+                                for x in usages))
+        method = [x.decl for x in usages if x.decl.kind == 'method'][0]
+        self.assertEqual('Device', cpptypeinfo.symbol_db.get_decl(
+            self.db, method.parent_id).name)
+
+    def test_base(self) -> None:
+        usages = cpptypeinfo.find_usages(self.db, 'Texture')
+        self.assertIn(('Texture2', 'base', ''),
+                      [(x.decl.name, x.role, x.detail) for x in usages])
+
+    def test_layout(self) -> None:
+        desc = cpptypeinfo.find_decls(self.db, 'Desc')[0]
+        layout = cpptypeinfo.get_layout(self.db, desc.id)
+        self.assertEqual([('width', 0), ('height', 4)],
+                         [(x.name, x.offset) for x in layout][:2])
+        self.assertEqual('enum FORMAT', layout[2].type)
+
+    def test_without_libclang(self) -> None:
+        root = pathlib.Path(__file__).parent.parent
+        output = subprocess.check_output(
+            [sys.executable, '-c', QUERY, 'query',
+             str(self.path), 'name', 'Desc'],
+            cwd=root)
+        self.assertIn('struct Desc', output.decode('utf-8'))
+        subprocess.check_output(
+            [sys.executable, '-c', QUERY, 'query', '--help'], cwd=root)
+
+    def test_version(self) -> None:
+        # 読み込み専用
+        with self.assertRaises(sqlite3.OperationalError):
+            self.db.execute("UPDATE meta SET value = '0'")
+        with sqlite3.connect(str(self.path)) as db:
+            db.execute("UPDATE meta SET value = '0'")
+        db.close()
+        with self.assertRaises(Exception):
+            cpptypeinfo.open_symbol_db(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
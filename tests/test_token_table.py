@@ -0,0 +1,45 @@
+import unittest
+import cpptypeinfo
+from cpptypeinfo.get_tu import get_source_path
+from cpptypeinfo.session import SourceReader
+from cpptypeinfo.token_table import TokenCache
+
+SOURCE = '''#define VERSION 7
+#define MAX(a, b) ((a) > (b) ? (a) : (b))
+extern "C" {
+struct A { int x; };
+void func(int a);
+}
+'''
+
+
+class TokenTableTest(unittest.TestCase):
+    def test_same_as_get_tokens(self) -> None:
+        path = get_source_path(SOURCE)
+        tu = cpptypeinfo.get_tu(path, source=SOURCE, profile='with-macros')
+        source_reader = SourceReader()
+        source_reader.set(path, SOURCE.encode('utf-8'))
+        cache = TokenCache(source_reader)
+        count = 0
+        for c in tu.cursor.walk_preorder():
+            if not c.location.file or c.kind.is_translation_unit():
+                continue
+            expected = [t.spelling for t in c.get_tokens()]
+            self.assertEqual(expected, cache.get_spellings(c), c.kind)
+            self.assertEqual(expected[:2], cache.get_spellings(c, 2))
+            count += 1
+        self.assertGreater(count, 5)
+        # 一度だけ tokenize する
+        self.assertEqual(1, len(cache.tables))
+
+    def test_decl_map(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        decl_map = cpptypeinfo.parse_source(parser,
+                                            SOURCE,
+                                            profile='with-macros')
+        macros = [(x.name, x.value) for x in decl_map.macro_definitions]
+        self.assertEqual([('VERSION', '7')], macros)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import pathlib
+import tempfile
+from clang import cindex
+import cpptypeinfo
+from cpptypeinfo.tu_cache import TUCache
+
+SOURCE = '''
+struct A
+{
+    int value;
+};
+'''
+
+
+class TUCacheTest(unittest.TestCase):
+    def test_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dir = pathlib.Path(tmp)
+            header = dir / 'a.h'
+            header.write_text(SOURCE)
+            cache_dir = dir / 'cache'
+
+            parser = cpptypeinfo.TypeParser()
+            cpptypeinfo.parse_files(parser, header, cache_dir=cache_dir)
+            manifests = [x for x in cache_dir.glob('*.json')]
+            self.assertEqual(1, len(manifests))
+            key = manifests[0].stem
+
+            cache = TUCache(cache_dir)
+            index = cindex.Index.create()
+            tu = cache.load(index, key)
+            self.assertIsNotNone(tu)
+            files = [pathlib.Path(x.include.name) for x in tu.get_includes()]
+            self.assertIn(header, files)
+
+            # header updated
+            header.write_text(SOURCE + 'struct B{};')
+            self.assertIsNone(cache.load(index, key))
+
+            parser = cpptypeinfo.TypeParser()
+            decl_map = cpptypeinfo.parse_files(parser,
+                                               header,
+                                               cache_dir=cache_dir)
+            names = [x.type_name for x in decl_map.decl_map.values()]
+            self.assertIn('B', names)
+            self.assertIsNotNone(cache.load(index, key))
+
+            # cache から読んだときは manifest の graph を使う
+            decl_map = cpptypeinfo.parse_files(cpptypeinfo.TypeParser(),
+                                               header,
+                                               cache_dir=cache_dir)
+            self.assertIn(header, decl_map.include_graph.hashes)
+            self.assertEqual([], decl_map.include_graph.get_changed())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import cpptypeinfo
+from cpptypeinfo.usertype import Pointer, Struct
+
+SOURCE = '''
+struct ImVec2 { float x; float y; };
+typedef unsigned int ImU32;
+void AddLine(const ImVec2 *a, const ImVec2 *b, ImU32 col, const char *label);
+void AddText(const ImVec2 *pos, ImU32 col, const char *text);
+struct ImDrawCmd { ImVec2 clip; ImVec2 *pos; ImU32 col; };
+'''
+
+
+class TypeMemoTest(unittest.TestCase):
+    def test_shared(self) -> None:
+        parser = cpptypeinfo.TypeParser()
+        decl_map = cpptypeinfo.parse_source(parser, SOURCE)
+        add_line, add_text = parser.root_namespace.functions
+        self.assertIs(add_line.params[0].typeref, add_line.params[1].typeref)
+        self.assertIs(add_line.params[0].typeref, add_text.params[0].typeref)
+        self.assertIs(add_line.params[3].typeref, add_text.params[2].typeref)
+        self.assertIs(add_line.params[2].typeref, add_text.params[1].typeref)
+        self.assertGreaterEqual(decl_map.type_memo_hits, 3)
+
+        vec = add_line.params[0].typeref.ref
+        self.assertIsInstance(vec, Pointer)
+        self.assertIsInstance(vec.typeref.ref, Struct)
+        self.assertTrue(vec.typeref.is_const)
+
+        cmd = [
+            v for v in decl_map.decl_map.values()
+            if isinstance(v, Struct) and v.type_name == 'ImDrawCmd'
+        ][0]
+        self.assertIs(vec.typeref.ref, cmd.fields[0].typeref.ref)
+        # const の有無は区別する
+        self.assertFalse(cmd.fields[1].typeref.ref.typeref.is_const)
+        # primitive の field だけ offset がある
+        self.assertEqual(-1, cmd.fields[0].offset)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import pathlib
+import tempfile
+import cpptypeinfo
+from clang import cindex
+from cpptypeinfo.visitor import ChildFilter, get_children, walk
+
+SOURCE = '''
+struct A { int x; };
+static int value = 0;
+namespace n { int f(int a); }
+'''
+
+OTHER = ''.join(f'struct Other{i} {{ int x; }};\n' for i in range(100))
+
+MAIN = '''
+#include "other.h"
+struct Main { Other0 other; };
+'''
+
+
+class VisitorTest(unittest.TestCase):
+    def test_get_children(self) -> None:
+        tu = cpptypeinfo.get_tu_from_source(SOURCE)
+        expected = [(x.kind, x.spelling) for x in tu.cursor.get_children()]
+        self.assertEqual(expected, [(x.kind, x.spelling)
+                                    for x in get_children(tu.cursor)])
+
+        child_filter = ChildFilter([cindex.CursorKind.VAR_DECL])
+        children = get_children(tu.cursor, child_filter)
+        self.assertEqual(['A', 'n'], [x.spelling for x in children])
+        self.assertEqual(3, child_filter.visited)
+        self.assertEqual(2, child_filter.kept)
+        # translation unit に紐づく
+        self.assertEqual(2, children[0].location.line)
+
+    def test_walk(self) -> None:
+        tu = cpptypeinfo.get_tu_from_source(SOURCE)
+        self.assertEqual([('A', 1), ('x', 2), ('value', 1), ('n', 1),
+                          ('f', 2), ('a', 3)],
+                         [(x.spelling, depth) for x, depth in walk(tu.cursor)
+                          if x.spelling])
+        self.assertEqual(['A', 'value', 'n'], [
+            x.spelling for x, _ in walk(tu.cursor, max_depth=1)
+        ])
+
+    def test_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            dir = pathlib.Path(tmp)
+            (dir / 'other.h').write_text(OTHER)
+            (dir / 'main.h').write_text(MAIN)
+            tu = cpptypeinfo.get_tu(dir / 'main.h')
+            child_filter = ChildFilter(files=[dir / 'main.h'])
+            children = get_children(tu.cursor, child_filter)
+            self.assertEqual(['Main'], [x.spelling for x in children])
+            self.assertEqual(101, child_filter.visited)
+
+            decl_map = cpptypeinfo.parse_files(cpptypeinfo.TypeParser(),
+                                               dir / 'main.h',
+                                               profile='bindings-demand')
+        # 指定した header の宣言だけ Cursor にする
+        self.assertEqual(1, decl_map.top_filter.kept)
+        names = [
+            getattr(x, 'type_name', None) for x in decl_map.decl_map.values()
+        ]
+        self.assertIn('Other0', names)
+        self.assertNotIn('Other1', names)
+
+
+if __name__ == '__main__':
+    unittest.main()
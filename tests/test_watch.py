@@ -0,0 +1,67 @@
+import unittest
+import os
+import pathlib
+import tempfile
+import cpptypeinfo
+
+
+class WatchTest(unittest.TestCase):
+    def test_reparse(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            header = pathlib.Path(tmp) / 'a.h'
+            header.write_text('struct A{ int a; };')
+            watcher = cpptypeinfo.Watcher(header)
+            self.assertIsNone(watcher.update())
+
+            decl_map = watcher.parse()
+            a = [x for x in decl_map.decl_map.values()][0]
+            self.assertEqual(1, len(a.fields))
+
+            header.write_text('struct A{ int a; int b; };')
+            stat = os.stat(header)
+            os.utime(header, (stat.st_atime, stat.st_mtime + 1))
+            self.assertEqual([header], watcher.update())
+
+            decl_map = watcher.parse()
+            a = [x for x in decl_map.decl_map.values()][0]
+            self.assertEqual(2, len(a.fields))
+
+    def test_strict(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            header = pathlib.Path(tmp) / 'a.h'
+            header.write_text('struct A{ int a; };')
+            session = cpptypeinfo.ParseSession(strict=True)
+            watcher = cpptypeinfo.Watcher(header, session=session)
+
+            header.write_text('struct A{ int a; unknown b; };')
+            stat = os.stat(header)
+            os.utime(header, (stat.st_atime, stat.st_mtime + 1))
+            with self.assertRaises(cpptypeinfo.DiagnosticError):
+                watcher.update()
+            # 壊れたままなら reparse しない
+            self.assertIsNone(watcher.update())
+
+            header.write_text('struct A{ int a; int b; };')
+            os.utime(header, (stat.st_atime, stat.st_mtime + 2))
+            self.assertEqual([header], watcher.update())
+
+    def test_no_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            header = pathlib.Path(tmp) / 'a.h'
+            header.write_text('struct A{ int a; };')
+            cache_dir = pathlib.Path(tmp) / 'cache'
+            session = cpptypeinfo.ParseSession(cache_dir=cache_dir)
+            watcher = cpptypeinfo.Watcher(header, session=session)
+            self.assertEqual([], list(cache_dir.glob('**/*.ast')))
+
+            header.write_text('struct A{ int a; int b; };')
+            stat = os.stat(header)
+            os.utime(header, (stat.st_atime, stat.st_mtime + 1))
+            self.assertEqual([header], watcher.update())
+            decl_map = watcher.parse()
+            a = [x for x in decl_map.decl_map.values()][0]
+            self.assertEqual(2, len(a.fields))
+
+
+if __name__ == '__main__':
+    unittest.main()